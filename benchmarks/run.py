@@ -0,0 +1,437 @@
+"""Benchmarks of avatar generators.
+
+Every case is run in a separate process, which reports throughput,
+latency percentiles and the peak memory of rendering over the memory
+of the process before it.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare baseline.json
+    python benchmarks/run.py --results results.json --compare baseline.json
+
+The comparison exits with status 1 if the median latency or the peak
+memory of a case is worse than in the baseline by more than --threshold.
+
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import PIL  # noqa: E402 isort:skip
+
+import pyavagen  # noqa: E402 isort:skip
+from pyavagen.version import __version__  # noqa: E402 isort:skip
+
+
+SIZES = (32, 128, 512, 2048)
+SQUARES_ON_AXIS = (3, 8, 32)
+BLUR_RADIUSES = (0, 1, 8, 32)
+FORMATS = ('png', 'webp', 'jpeg')
+THRESHOLD_DEFAULT = 0.1
+MIN_TIME_DEFAULT = 1.0
+MIN_TIME_QUICK = 0.1
+MAX_ITERATIONS = 1000
+PERCENTILES = (50, 90, 99)
+IMPORT_CASE = 'import'
+IMPORT_STATEMENTS = (
+    ('import/pyavagen', 'import pyavagen'),
+    (
+        'import/pyavagen+first_render',
+        'import pyavagen\n'
+        'pyavagen.Avatar(pyavagen.CHAR_SQUARE_AVATAR, size=128, '
+        'string="User").generate_bytes()',
+    ),
+)
+# Every iteration of an import case starts an interpreter.
+IMPORT_MAX_ITERATIONS = 50
+# Prints the time of a statement in a new interpreter and the resident
+# memory it added. ru_maxrss of a child process on Linux includes the peak
+# of the parent before exec, so the current memory is read from /proc.
+IMPORT_SCRIPT = """
+import resource, os, sys, time
+
+
+def get_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # macOS reports ru_maxrss in bytes.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+rss = get_rss()
+start = time.perf_counter()
+exec(sys.argv[1])
+print(time.perf_counter() - start, get_rss() - rss)
+"""
+
+
+def get_cases():
+    """Returns an ordered list of (name, avatar type, kwargs, format).
+
+    Cases without a format measure generate, the rest generate_bytes.
+    Cases of IMPORT_CASE type have a statement instead of kwargs, they
+    measure cold starts: the statement in a new interpreter.
+
+    """
+
+    cases = [
+        (name, IMPORT_CASE, statement, None)
+        for name, statement in IMPORT_STATEMENTS
+    ]
+    avatar_types = (
+        pyavagen.SQUARE_AVATAR,
+        pyavagen.CHAR_AVATAR,
+        pyavagen.CHAR_SQUARE_AVATAR,
+    )
+
+    for avatar_type in avatar_types:
+        for size in SIZES:
+            cases.append((
+                '{type}/size={size}'.format(type=avatar_type, size=size),
+                avatar_type,
+                {'size': size},
+                None,
+            ))
+
+    for engine in ('classic', 'transform'):
+        for squares_on_axis in SQUARES_ON_AXIS:
+            cases.append((
+                'square/size=512/squares_on_axis={n}/engine={engine}'.format(
+                    n=squares_on_axis,
+                    engine=engine,
+                ),
+                pyavagen.SQUARE_AVATAR,
+                {
+                    'size': 512,
+                    'squares_on_axis': squares_on_axis,
+                    'render_engine': engine,
+                },
+                None,
+            ))
+
+    for blur_method in ('exact', 'reduced'):
+        for blur_radius in BLUR_RADIUSES:
+            cases.append((
+                'square/size=512/blur_radius={r}/blur_method={m}'.format(
+                    r=blur_radius,
+                    m=blur_method,
+                ),
+                pyavagen.SQUARE_AVATAR,
+                {
+                    'size': 512,
+                    'blur_radius': blur_radius,
+                    'blur_method': blur_method,
+                },
+                None,
+            ))
+
+    for avatar_type in (pyavagen.CHAR_AVATAR, pyavagen.CHAR_SQUARE_AVATAR):
+        cases.append((
+            '{type}/size=512/font_outline=True'.format(type=avatar_type),
+            avatar_type,
+            {'size': 512, 'font_outline': True},
+            None,
+        ))
+
+    for format in FORMATS:
+        for avatar_type in (pyavagen.CHAR_AVATAR, pyavagen.SQUARE_AVATAR):
+            cases.append((
+                '{type}/size=256/format={format}'.format(
+                    type=avatar_type,
+                    format=format,
+                ),
+                avatar_type,
+                {'size': 256},
+                format,
+            ))
+
+    return cases
+
+
+def get_maxrss():
+    """Returns the peak resident memory of the process in bytes."""
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS reports bytes.
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def get_percentile(sorted_values, percent):
+    """Returns a percentile of sorted values by the nearest rank."""
+
+    index = max(0, int(round(percent / 100 * len(sorted_values))) - 1)
+
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def run_case(avatar_type, kwargs, format, min_time):
+    """Runs a case and returns a dict of results.
+
+    Avatars of every iteration have different seeds and strings, so
+    results don't depend on a single random layout.
+
+    """
+
+    def render(i):
+        avatar_kwargs = dict(kwargs, seed=i)
+
+        if avatar_type != pyavagen.SQUARE_AVATAR:
+            avatar_kwargs['string'] = 'User {i}'.format(i=i)
+
+        avatar = pyavagen.Avatar(avatar_type, **avatar_kwargs)
+
+        if format is None:
+            avatar.generate()
+        else:
+            avatar.generate_bytes(format)
+
+    # Generators and Pillow are imported lazily, they aren't a part of
+    # the memory of rendering.
+    import pyavagen.generators  # noqa: F401
+
+    initial_rss = get_maxrss()
+    # Warm up loads fonts and fills caches.
+    render(-1)
+    latencies = []
+    started = time.perf_counter()
+
+    while len(latencies) < MAX_ITERATIONS:
+        i = len(latencies)
+        start = time.perf_counter()
+        render(i)
+        latencies.append(time.perf_counter() - start)
+
+        if time.perf_counter() - started >= min_time and i >= 2:
+            break
+
+    total = time.perf_counter() - started
+
+    return get_results(latencies, total, get_maxrss() - initial_rss)
+
+
+def run_import_case(statement, min_time):
+    """Runs a statement in new interpreters and returns a dict of results.
+
+    Latencies don't include the startup of the interpreter, the peak memory
+    is the largest resident memory added by the statement.
+
+    """
+
+    latencies = []
+    peak_memory = 0
+    started = time.perf_counter()
+
+    while len(latencies) < IMPORT_MAX_ITERATIONS:
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT, statement],
+            cwd=ROOT,
+        )
+        elapsed, memory = output.split()
+        latencies.append(float(elapsed))
+        peak_memory = max(peak_memory, int(memory))
+
+        if time.perf_counter() - started >= min_time and len(latencies) > 2:
+            break
+
+    return get_results(latencies, sum(latencies), peak_memory)
+
+
+def get_results(latencies, total, peak_memory):
+    """Returns a dict of results of latencies in seconds."""
+
+    latencies = sorted(latencies)
+    results = {
+        'iterations': len(latencies),
+        'throughput': len(latencies) / total,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'peak_memory': max(0, peak_memory),
+    }
+
+    for percent in PERCENTILES:
+        results['p{percent}_ms'.format(percent=percent)] = (
+            get_percentile(latencies, percent) * 1000
+        )
+
+    return results
+
+
+def run_case_in_process(args):
+    """Runs a case in a new process, so peak memory isn't shared."""
+
+    context = multiprocessing.get_context('spawn')
+
+    with context.Pool(1) as pool:
+        return pool.apply(run_case, args)
+
+
+def get_meta():
+    return {
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'pyavagen': __version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run(cases, min_time, pattern=None, stream=sys.stderr):
+    """Runs cases and returns a dict of meta data and results."""
+
+    results = {}
+
+    for name, avatar_type, kwargs, format in cases:
+        if pattern and pattern not in name:
+            continue
+
+        if avatar_type == IMPORT_CASE:
+            results[name] = run_import_case(kwargs, min_time)
+        else:
+            results[name] = run_case_in_process(
+                (avatar_type, kwargs, format, min_time)
+            )
+
+        stream.write(
+            '{name:<60} {p50:>10.2f} ms {throughput:>10.1f}/s '
+            '{memory:>8.1f} MiB\n'.format(
+                name=name,
+                p50=results[name]['p50_ms'],
+                throughput=results[name]['throughput'],
+                memory=results[name]['peak_memory'] / 2 ** 20,
+            )
+        )
+
+    return {'meta': get_meta(), 'results': results}
+
+
+def compare(baseline, current, threshold=THRESHOLD_DEFAULT):
+    """Compares results with a baseline.
+
+    Returns a list of (case name, metric, baseline value, current value,
+    ratio, is regression) of cases present in both results. Memory
+    differences smaller than 1 MiB aren't regressions, they are
+    within the resolution of the peak memory.
+
+    """
+
+    rows = []
+
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+
+        if base is None:
+            continue
+
+        for metric in ('p50_ms', 'peak_memory'):
+            before, after = base[metric], result[metric]
+            if before:
+                ratio = after / before
+            else:
+                ratio = float('inf') if after else 1.0
+
+            regression = ratio > 1 + threshold
+
+            if metric == 'peak_memory' and after - before < 2 ** 20:
+                regression = False
+
+            rows.append((name, metric, before, after, ratio, regression))
+
+    return rows
+
+
+def print_comparison(rows, stream=sys.stdout):
+    for name, metric, before, after, ratio, regression in rows:
+        if metric == 'peak_memory':
+            metric = 'peak_mib'
+            before, after = before / 2 ** 20, after / 2 ** 20
+
+        stream.write(
+            '{flag} {name:<60} {metric:<12} {before:>12.2f} '
+            '{after:>12.2f} {ratio:>7.2f}x\n'.format(
+                flag='!' if regression else ' ',
+                name=name,
+                metric=metric,
+                before=before,
+                after=after,
+                ratio=ratio,
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmarks of avatar generators.',
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='write results to a JSON file.',
+    )
+    parser.add_argument(
+        '--compare', metavar='BASELINE',
+        help='compare results with a baseline JSON file.',
+    )
+    parser.add_argument(
+        '--results',
+        help="JSON file of results to compare, cases aren't run.",
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=THRESHOLD_DEFAULT,
+        help='allowed relative slowdown, default 0.1 (10%%).',
+    )
+    parser.add_argument(
+        '-k', '--filter',
+        help='run only cases which names contain the string.',
+    )
+    parser.add_argument(
+        '--min-time', type=float, default=MIN_TIME_DEFAULT,
+        help='minimum measured time of a case in seconds, default 1.',
+    )
+    parser.add_argument(
+        '--quick', action='store_true',
+        help='measure every case for 0.1 seconds.',
+    )
+    args = parser.parse_args(argv)
+
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        current = run(
+            get_cases(),
+            MIN_TIME_QUICK if args.quick else args.min_time,
+            args.filter,
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        rows = compare(baseline, current, args.threshold)
+        print_comparison(rows)
+
+        if any([row[-1] for row in rows]):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,26 +1,106 @@
-from pyavagen.generators import (
-    COLOR_LIST_FLAT,
-    COLOR_LIST_MATERIAL,
-    CharAvatar,
-    CharSquareAvatar,
-    SquareAvatar
-)
+import importlib
+from collections.abc import MutableMapping
+from types import MappingProxyType
+
+from pyavagen.palettes import COLOR_LIST_FLAT, COLOR_LIST_MATERIAL, Palette
 from pyavagen.version import *  # noqa
 
 
-__all__ = [
+__all__ = [  # noqa: F405
     'Avatar',
+    'AvatarTemplate',
     'SQUARE_AVATAR',
     'CHAR_SQUARE_AVATAR',
     'CHAR_AVATAR',
     'COLOR_LIST_MATERIAL',
     'COLOR_LIST_FLAT',
+    'Palette',
+    'SquareAvatar',
+    'CharAvatar',
+    'CharSquareAvatar',
 ]
 
 SQUARE_AVATAR = 'square'
 CHAR_AVATAR = 'char'
 CHAR_SQUARE_AVATAR = 'char_square'
 
+# Generators import Pillow, so they are imported on first access.
+LAZY_ATTRIBUTES = {
+    'SquareAvatar': 'pyavagen.generators:SquareAvatar',
+    'CharAvatar': 'pyavagen.generators:CharAvatar',
+    'CharSquareAvatar': 'pyavagen.generators:CharSquareAvatar',
+}
+
+
+def import_string(path):
+    """Returns an object of a 'module:attribute' path."""
+
+    module_name, name = path.split(':')
+
+    return getattr(importlib.import_module(module_name), name)
+
+
+def __getattr__(name):
+    path = LAZY_ATTRIBUTES.get(name)
+
+    if path is None:
+        raise AttributeError(
+            'module {module!r} has no attribute {name!r}'.format(
+                module=__name__,
+                name=name,
+            )
+        )
+
+    value = import_string(path)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_ATTRIBUTES))
+
+
+class LazyAvatarMap(MutableMapping):
+    """Map of avatar types and avatar classes.
+
+    Classes can be set by 'module:attribute' paths, then they are imported
+    on first access.
+
+    """
+
+    def __init__(self, items):
+        self._items = dict(items)
+
+    def __getitem__(self, avatar_type):
+        value = self._items[avatar_type]
+
+        if isinstance(value, str):
+            value = self._items[avatar_type] = import_string(value)
+
+        return value
+
+    def __setitem__(self, avatar_type, value):
+        self._items[avatar_type] = value
+
+    def __delitem__(self, avatar_type):
+        del self._items[avatar_type]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, avatar_type):
+        return avatar_type in self._items
+
+    def __repr__(self):
+        return '{name}({items!r})'.format(
+            name=type(self).__name__,
+            items=self._items,
+        )
+
 
 class Avatar(object):
 
@@ -32,23 +112,161 @@ class Avatar(object):
 
     """
 
-    AVATAR_MAP = {
-        SQUARE_AVATAR: SquareAvatar,
-        CHAR_AVATAR: CharAvatar,
-        CHAR_SQUARE_AVATAR: CharSquareAvatar,
-    }
+    AVATAR_MAP = LazyAvatarMap({
+        SQUARE_AVATAR: LAZY_ATTRIBUTES['SquareAvatar'],
+        CHAR_AVATAR: LAZY_ATTRIBUTES['CharAvatar'],
+        CHAR_SQUARE_AVATAR: LAZY_ATTRIBUTES['CharSquareAvatar'],
+    })
 
     def __init__(self, avatar_type, **kwargs):
 
-        self.avatar_class = self.AVATAR_MAP.get(avatar_type, None)
+        self.template = AvatarTemplate(avatar_type, **kwargs)
+        self.template.avatar_class.check_required_fields(self.template.values)
+        self.kwargs = kwargs
+        self._avatar = None
 
-        if not self.avatar_class:
-            raise AttributeError('The passed avatar type not found.')
+    @property
+    def avatar_class(self):
+        """
+        An object of the avatar class. It's created on first access,
+        so an image isn't allocated until it's generated.
+        """
 
-        self.avatar_class = self.avatar_class(**kwargs)
-        self.kwargs = kwargs
+        if self._avatar is None:
+            self._avatar = self.template.create()
+
+        return self._avatar
 
     def generate(self):
         """Implements calling an generate method in specified avatar_class."""
 
         return self.avatar_class.generate()
+
+    def generate_bytes(self, *args, **kwargs):
+        """
+        Implements calling an generate_bytes method in specified
+        avatar_class.
+        """
+
+        return self.avatar_class.generate_bytes(*args, **kwargs)
+
+    def generate_to(self, *args, **kwargs):
+        """
+        Implements calling an generate_to method in specified avatar_class.
+        """
+
+        return self.avatar_class.generate_to(*args, **kwargs)
+
+    def generate_svg(self):
+        """
+        Implements calling an generate_svg method in specified avatar_class.
+        """
+
+        return self.avatar_class.generate_svg()
+
+    def agenerate(self, executor=None):
+        """
+        Returns a coroutine, which generates an avatar in an executor without
+        blocking the event loop. See pyavagen.aio.agenerate for arguments.
+        """
+
+        from pyavagen.aio import agenerate
+
+        return agenerate(self, executor)
+
+    @staticmethod
+    def generate_many(specs, **kwargs):
+        """Renders avatars of passed specs in a process pool.
+
+        See pyavagen.batch.generate_many for arguments.
+
+        """
+
+        from pyavagen.batch import generate_many
+
+        return generate_many(specs, **kwargs)
+
+
+class AvatarTemplate(object):
+    """Immutable set of validated arguments of an avatar.
+
+    Arguments are validated once, and every render creates a new avatar
+    from them without validation. Only arguments passed to a render
+    are validated.
+
+        template = AvatarTemplate(CHAR_AVATAR, size=128, font_outline=True)
+        img = template.render(string='Paul', seed='Paul')
+
+    Args:
+        avatar_type: type of an avatar from Avatar.AVATAR_MAP.
+        kwargs: keyword arguments of the avatar class.
+
+    """
+
+    __slots__ = ('avatar_type', 'avatar_class', 'values')
+
+    def __init__(self, avatar_type, **kwargs):
+        avatar_class = Avatar.AVATAR_MAP.get(avatar_type, None)
+
+        if not avatar_class:
+            raise AttributeError('The passed avatar type not found.')
+
+        values = avatar_class.clean_fields(kwargs)
+
+        # A color list can be changed in place, a palette can't.
+        if 'color_list' in values:
+            values['color_list'] = Palette.from_colors(values['color_list'])
+
+        avatar_class.check_fields(values)
+
+        object.__setattr__(self, 'avatar_type', avatar_type)
+        object.__setattr__(self, 'avatar_class', avatar_class)
+        object.__setattr__(self, 'values', MappingProxyType(values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('AvatarTemplate is immutable.')
+
+    def __repr__(self):
+        return '{name}({avatar_type!r}, {values!r})'.format(
+            name=type(self).__name__,
+            avatar_type=self.avatar_type,
+            values=dict(self.values),
+        )
+
+    def create(self, **kwargs):
+        """
+        Returns a new object of the avatar class with arguments of the
+        template replaced by passed ones. Raises TypeError if required
+        arguments, e.g. size or string, are missing.
+        """
+
+        avatar_class = self.avatar_class
+        values = dict(self.values)
+
+        if kwargs:
+            fields = avatar_class._fields
+            unknown = set(kwargs) - set(fields)
+
+            if unknown:
+                raise TypeError(
+                    'Unexpected arguments: {names}.'.format(
+                        names=', '.join(sorted(unknown)),
+                    )
+                )
+
+            for name, value in kwargs.items():
+                values[name] = fields[name].clean(value)
+
+            avatar_class.check_fields(values)
+
+        avatar_class.check_required_fields(values)
+
+        return avatar_class.from_clean_values(values)
+
+    def render(self, **kwargs):
+        """
+        Generates an image with arguments of the template replaced by passed
+        ones, e.g. string and seed, and returns the PIL.Image.Image object.
+        """
+
+        return self.create(**kwargs).generate()
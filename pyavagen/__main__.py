@@ -0,0 +1,6 @@
+import sys
+
+from pyavagen.cli import main
+
+
+sys.exit(main())
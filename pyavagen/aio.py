@@ -0,0 +1,144 @@
+import asyncio
+import functools
+
+import pyavagen
+
+
+class RendererOverloaded(RuntimeError):
+    """Raised when the queue of a renderer is full."""
+
+
+def get_spec_key(avatar_type, kwargs):
+    """Returns a hashable key of an avatar type and its keyword arguments."""
+
+    def freeze(value):
+        if isinstance(value, (list, tuple)):
+            return tuple([freeze(v) for v in value])
+        return value
+
+    return avatar_type, tuple(sorted(
+        [(name, freeze(value)) for name, value in kwargs.items()]
+    ))
+
+
+async def agenerate(avatar, executor=None):
+    """Generates an avatar in an executor without blocking the event loop.
+
+    Args:
+        avatar: pyavagen.Avatar or an avatar generator object.
+        executor: concurrent.futures executor. If it's None that the
+            default executor of the event loop is used.
+
+    """
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(executor, avatar.generate)
+
+
+def generate(avatar_type, kwargs):
+    """Generates an avatar. Used as a callable for executors."""
+
+    return pyavagen.Avatar(avatar_type, **kwargs).generate()
+
+
+class AsyncAvatarRenderer(object):
+    """Renders avatars in an executor without blocking the event loop.
+
+    Concurrent renders of the same avatar type and arguments share a single
+    render and get the same PIL.Image.Image object, which must not be
+    changed in place. Coalescing makes sense for seeded avatars only.
+
+    Args:
+        executor: concurrent.futures executor. If it's None that the default
+            executor of the event loop is used.
+        max_concurrency: maximum number of renders running at once.
+        max_queue: maximum number of renders waiting for a running slot.
+            If the queue is full that RendererOverloaded is raised.
+            If it's None that the queue is unbounded.
+
+    """
+
+    MAX_CONCURRENCY_DEFAULT = 4
+    MAX_QUEUE_DEFAULT = 100
+
+    def __init__(self, executor=None, max_concurrency=MAX_CONCURRENCY_DEFAULT,
+                 max_queue=MAX_QUEUE_DEFAULT):
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must not be less 1')
+
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = None
+        self._renders = {}
+        self._waiters = {}
+
+    def __len__(self):
+        """Returns number of running and queued renders."""
+
+        return len(self._renders)
+
+    def _get_semaphore(self):
+        # Created on first use, so it belongs to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _render(self, avatar_type, kwargs):
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self.executor,
+                functools.partial(generate, avatar_type, kwargs),
+            )
+
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # A running render can't be stopped, so its slot is held
+                # until it's done and concurrency stays bounded.
+                await asyncio.wait([future])
+                raise
+
+    def _forget(self, key, render):
+        if self._renders.get(key) is render:
+            del self._renders[key]
+        self._waiters.pop(render, None)
+
+    async def render(self, avatar_type, **kwargs):
+        """Renders an avatar and returns the PIL.Image.Image object.
+
+        Cancellation of a caller doesn't affect other callers of the same
+        render. The render itself is cancelled when all its callers are.
+
+        """
+
+        key = get_spec_key(avatar_type, kwargs)
+        render = self._renders.get(key)
+
+        if render is None:
+            if (
+                self.max_queue is not None and
+                len(self._renders) >= self.max_concurrency + self.max_queue
+            ):
+                raise RendererOverloaded('The render queue is full.')
+
+            render = asyncio.ensure_future(self._render(avatar_type, kwargs))
+            render.add_done_callback(
+                functools.partial(self._forget, key)
+            )
+            self._renders[key] = render
+            self._waiters[render] = 0
+
+        self._waiters[render] += 1
+
+        try:
+            return await asyncio.shield(render)
+        except asyncio.CancelledError:
+            if render in self._waiters:
+                self._waiters[render] -= 1
+
+                if not self._waiters[render]:
+                    render.cancel()
+            raise
@@ -0,0 +1,172 @@
+"""Sprite sheets of avatars for list views.
+
+Avatars are rendered on a single image, which is encoded once, and their
+coordinates are returned as a map for CSS sprites:
+
+    sheet = generate_sheet(avatars, names=['paul', 'john'], columns=10)
+    sheet.data  # encoded image
+    get_sprites_json(sheet)  # {"width": ..., "sprites": {"paul": ...}}
+
+"""
+
+import collections
+import json
+import math
+
+from PIL import Image
+
+from pyavagen.instrumentation import span
+from pyavagen.utils import encode_image, get_format
+
+
+FORMAT_DEFAULT = 'png'
+
+SpriteSheet = collections.namedtuple(
+    'SpriteSheet',
+    ['data', 'format', 'width', 'height', 'sprites'],
+)
+SpriteSheet.__doc__ = """Encoded sprite sheet.
+
+    data: encoded image.
+    format: format of the image.
+    width: width of the image.
+    height: height of the image.
+    sprites: OrderedDict of names and dicts with x, y, width and height
+        of avatars on the image.
+
+"""
+
+
+def get_avatar(avatar):
+    """Returns an avatar generator object of pyavagen.Avatar or itself."""
+
+    return getattr(avatar, 'avatar_class', avatar)
+
+
+def get_layout(sizes, columns=None, padding=0):
+    """Places squares of passed sizes in rows.
+
+    Args:
+        sizes: list of sizes of squares.
+        columns: number of squares in a row. By default rows and columns
+            are about equal.
+        padding: space between squares.
+
+    Returns (width, height, list of (x, y) of squares).
+
+    """
+
+    if columns is None:
+        columns = max(1, int(math.ceil(math.sqrt(len(sizes)))))
+
+    if columns < 1:
+        raise ValueError('columns must not be less 1')
+
+    if padding < 0:
+        raise ValueError('padding must not be less 0')
+
+    positions = []
+    width = height = 0
+
+    for row_start in range(0, len(sizes), columns):
+        row_sizes = sizes[row_start:row_start + columns]
+        y = height + padding if row_start else 0
+        x = 0
+
+        for size in row_sizes:
+            positions.append((x, y))
+            x += size + padding
+
+        width = max(width, x - padding)
+        height = y + max(row_sizes)
+
+    return width, height, positions
+
+
+def render_sheet(avatars, names=None, columns=None, padding=0):
+    """Renders avatars on a single RGB image.
+
+    Args:
+        avatars: list of pyavagen.Avatar or avatar generator objects.
+        names: list of names of avatars in the map. Indexes by default.
+        columns: number of avatars in a row.
+        padding: space between avatars.
+
+    Returns (PIL.Image.Image object, OrderedDict of sprites).
+
+    """
+
+    avatars = [get_avatar(avatar) for avatar in avatars]
+
+    if not avatars:
+        raise ValueError('avatars must not be empty')
+
+    if names is None:
+        names = [str(i) for i in range(len(avatars))]
+
+    if len(names) != len(avatars):
+        raise ValueError('names must have the same length as avatars')
+
+    if len(set(names)) != len(names):
+        raise ValueError('names must be unique')
+
+    sizes = [avatar.size for avatar in avatars]
+    width, height, positions = get_layout(sizes, columns, padding)
+    sprites = collections.OrderedDict()
+
+    with span('render_sheet'):
+        img = Image.new('RGB', (width, height))
+
+        for name, avatar, position in zip(names, avatars, positions):
+            avatar.render_into(img, position)
+            sprites[name] = {
+                'x': position[0],
+                'y': position[1],
+                'width': avatar.size,
+                'height': avatar.size,
+            }
+
+    return img, sprites
+
+
+def generate_sheet(avatars, names=None, columns=None, padding=0,
+                   format=FORMAT_DEFAULT, quality=None, optimize=None,
+                   **options):
+    """Renders avatars on a single image and returns SpriteSheet.
+
+    See render_sheet for arguments of the sheet and
+    pyavagen.utils.encode_image for arguments of encoding.
+
+    """
+
+    img, sprites = render_sheet(avatars, names, columns, padding)
+
+    with span('encode_sheet'):
+        data = encode_image(img, format, quality, optimize, **options)
+
+    return SpriteSheet(
+        data=data,
+        format=get_format(format),
+        width=img.width,
+        height=img.height,
+        sprites=sprites,
+    )
+
+
+def get_sprites_json(sheet):
+    """Returns a JSON map of the size of a sheet and its sprites.
+
+    An avatar is shown by CSS as a background of the sheet:
+
+        width: {width}px;
+        height: {height}px;
+        background: url(sheet.png) -{x}px -{y}px;
+
+    """
+
+    return json.dumps({
+        'format': sheet.format,
+        'width': sheet.width,
+        'height': sheet.height,
+        'sprites': sheet.sprites,
+    })
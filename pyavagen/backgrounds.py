@@ -0,0 +1,270 @@
+"""Bank of pre-rendered backgrounds of char square avatars.
+
+Backgrounds of CharSquareAvatar don't depend on a string, so they can be
+rendered once and shared. A bank keeps several variants of backgrounds
+for every set of arguments of squares, a variant is selected by a hash
+of the string, so the same string always gets the same background:
+
+    CharSquareAvatar.background_bank = BackgroundBank(variants=32)
+
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pyavagen
+from pyavagen.generators import SquareAvatar
+from pyavagen.instrumentation import span
+
+
+class BackgroundBank(object):
+    """Thread-safe bank of pre-rendered backgrounds of squares.
+
+    Backgrounds are kept by arguments of squares: size, color_list,
+    squares_on_axis, blur_radius, etc. A missing variant is rendered
+    when it's requested, and other variants of its arguments are rendered
+    in the executor if all variants fit max_bytes. If backgrounds exceed
+    max_bytes that backgrounds of the least recently used arguments are
+    dropped, variants of the same arguments don't replace each other.
+
+    Args:
+        variants: number of backgrounds for a set of arguments.
+        max_bytes: maximum total size of backgrounds in bytes.
+        executor: concurrent.futures executor for filling. By default
+            a thread pool with a single thread.
+        max_pending: maximum number of sets of arguments queued for
+            filling, other ones aren't filled in the executor.
+
+    """
+
+    VARIANTS_DEFAULT = 16
+    MAX_BYTES_DEFAULT = 64 * 1024 * 1024
+    MAX_PENDING_DEFAULT = 4
+    # Pillow stores every pixel of RGB images in 4 bytes.
+    PIXEL_BYTES = 4
+    # Fields of squares which don't change backgrounds of char squares.
+    IGNORED_FIELDS = ('seed', 'palette_mode')
+
+    def __init__(self, variants=VARIANTS_DEFAULT, max_bytes=MAX_BYTES_DEFAULT,
+                 executor=None, max_pending=MAX_PENDING_DEFAULT):
+        if variants < 1:
+            raise ValueError('variants must not be less 1')
+
+        if max_bytes < 0:
+            raise ValueError('max_bytes must not be less 0')
+
+        if max_pending < 0:
+            raise ValueError('max_pending must not be less 0')
+
+        self.variants = variants
+        self.max_bytes = max_bytes
+        self.executor = executor
+        self.max_pending = max_pending
+        self.renders = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        # Dicts of variant indexes and images by keys.
+        self._backgrounds = OrderedDict()
+        self._filling = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum([
+                len(backgrounds) for backgrounds in self._backgrounds.values()
+            ])
+
+    def get_key(self, values):
+        """
+        Returns a key of arguments of squares of a dict of values of fields.
+        Random arguments must not be set yet, so the key of an avatar
+        is taken before prepare.
+        """
+
+        key = []
+
+        for name in sorted(SquareAvatar._fields):
+            if name in self.IGNORED_FIELDS:
+                continue
+
+            value = values[name]
+
+            if isinstance(value, list):
+                value = tuple(value)
+
+            key.append((name, value))
+
+        return tuple(key)
+
+    def get_index(self, string):
+        """Returns an index of a variant of a string."""
+
+        return zlib.crc32(string.encode('utf-8')) % self.variants
+
+    def get_avatar(self, key, index):
+        """Returns SquareAvatar of a variant of a background of a key."""
+
+        values = dict(key)
+        values.update(seed=index, palette_mode=False)
+
+        return SquareAvatar.from_clean_values(values)
+
+    def render(self, key, index):
+        """Renders a variant of a background of a key."""
+
+        with self._lock:
+            self.renders += 1
+
+        with span('bank_render'):
+            return self.get_avatar(key, index).generate()
+
+    def get_nbytes(self, img):
+        width, height = img.size
+
+        return width * height * self.PIXEL_BYTES
+
+    def get(self, key, string):
+        """
+        Returns a copy of the background of a string, which can be drawn on.
+        """
+
+        index = self.get_index(string)
+
+        with self._lock:
+            backgrounds = self._backgrounds.get(key)
+            img = backgrounds.get(index) if backgrounds else None
+
+            if img is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._backgrounds.move_to_end(key)
+
+        if img is None:
+            img = self.render(key, index)
+            self.set(key, index, img)
+
+            # Variants that don't fit together would replace each other.
+            if self.get_nbytes(img) * self.variants <= self.max_bytes:
+                self.fill_async(key)
+
+        return img.copy()
+
+    def set(self, key, index, img):
+        """
+        Keeps a variant of a background, dropping backgrounds of the least
+        recently used other keys. Returns False if it isn't kept.
+        """
+
+        nbytes = self.get_nbytes(img)
+
+        with self._lock:
+            backgrounds = self._backgrounds.get(key, {})
+            old_img = backgrounds.get(index)
+            old_nbytes = self.get_nbytes(old_img) if old_img else 0
+            key_nbytes = nbytes - old_nbytes + sum([
+                self.get_nbytes(other) for other in backgrounds.values()
+            ])
+
+            # Variants of the key aren't dropped for the new one.
+            if key_nbytes > self.max_bytes:
+                return False
+
+            backgrounds[index] = img
+            self._backgrounds[key] = backgrounds
+            self._backgrounds.move_to_end(key)
+            self._size += nbytes - old_nbytes
+
+            # The key is the most recent one and fits max_bytes, so only
+            # other keys are dropped.
+            while self._size > self.max_bytes:
+                oldest_key = next(iter(self._backgrounds))
+                oldest = self._backgrounds[oldest_key]
+                _, evicted = oldest.popitem()
+                self._size -= self.get_nbytes(evicted)
+                self.evictions += 1
+
+                if not oldest:
+                    del self._backgrounds[oldest_key]
+
+            return True
+
+    def fill(self, key):
+        """Renders all missing variants of a key."""
+
+        for index in range(self.variants):
+            with self._lock:
+                backgrounds = self._backgrounds.get(key)
+
+                if backgrounds is not None and index in backgrounds:
+                    continue
+
+            if not self.set(key, index, self.render(key, index)):
+                return
+
+    def fill_async(self, key):
+        """
+        Renders missing variants of a key in the executor and returns
+        a future. A key is filled once at a time. Returns None if
+        max_pending keys are already queued.
+        """
+
+        with self._lock:
+            future = self._filling.get(key)
+
+            if future is not None:
+                return future
+
+            if len(self._filling) >= self.max_pending:
+                return None
+
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1)
+
+            future = self.executor.submit(self.fill, key)
+            self._filling[key] = future
+
+        future.add_done_callback(lambda _: self._filled(key))
+
+        return future
+
+    def _filled(self, key):
+        with self._lock:
+            self._filling.pop(key, None)
+
+    def prefill(self, **kwargs):
+        """
+        Renders all variants of backgrounds of passed arguments of squares,
+        e.g. at application startup. Returns the key of the arguments.
+        """
+
+        template = pyavagen.AvatarTemplate(pyavagen.SQUARE_AVATAR, **kwargs)
+        key = self.get_key(template.values)
+        self.fill(key)
+
+        return key
+
+    def clear(self):
+        """Drops all backgrounds and resets counters."""
+
+        with self._lock:
+            self._backgrounds.clear()
+            self._size = 0
+            self.renders = self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Returns a dict with counters and the current size."""
+
+        with self._lock:
+            return {
+                'renders': self.renders,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': self._size,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,151 @@
+import collections
+import multiprocessing
+import os
+import uuid
+
+import pyavagen
+from pyavagen.utils import get_format
+
+
+FORMAT_DEFAULT = 'png'
+TEMP_SUFFIX = '.tmp'
+
+BatchResult = collections.namedtuple(
+    'BatchResult',
+    ['index', 'spec', 'data', 'path', 'error'],
+)
+BatchResult.__doc__ = """Result of rendering of a single spec.
+
+    index: index of the spec in passed specs.
+    spec: the spec.
+    data: encoded image if output directory isn't passed else None.
+    path: path of written image if output directory is passed else None.
+    error: description of an error if rendering failed else None.
+
+"""
+
+
+def check_filename(filename):
+    """
+    Raises ValueError if a file name has directories, so a spec can't
+    write outside of the output directory, e.g. by '../' or an absolute
+    path.
+    """
+
+    if (
+        os.path.basename(filename) != filename or
+        filename in ('.', '..') or
+        os.sep in filename or
+        (os.altsep and os.altsep in filename)
+    ):
+        raise ValueError(
+            'filename must be a name of a file without directories.'
+        )
+
+
+def get_filename(index, spec, format):
+    """Returns a file name for a rendered spec."""
+
+    filename = spec.get('filename')
+
+    if filename:
+        check_filename(filename)
+        return filename
+
+    return '{index}.{ext}'.format(index=index, ext=get_format(format))
+
+
+def write_file(path, data):
+    """
+    Writes data to a file atomically, so an interrupted batch doesn't
+    leave incomplete images.
+    """
+
+    temp_path = '{path}.{uid}{suffix}'.format(
+        path=path,
+        uid=uuid.uuid4().hex,
+        suffix=TEMP_SUFFIX,
+    )
+
+    try:
+        with open(temp_path, 'xb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def render_spec(task):
+    """Renders a single spec and returns BatchResult.
+
+    Every exception is reported in the result, so a bad spec doesn't
+    stop the rest of a batch.
+
+    """
+
+    index, spec, format, output_dir = task
+    data = path = error = None
+
+    try:
+        kwargs = dict(spec)
+        kwargs.pop('filename', None)
+
+        if output_dir is not None:
+            path = os.path.join(output_dir, get_filename(index, spec, format))
+
+        data = pyavagen.Avatar(**kwargs).generate_bytes(format)
+
+        if path is not None:
+            write_file(path, data)
+            data = None
+    except Exception as e:
+        data = path = None
+        error = '{name}: {e}'.format(name=type(e).__name__, e=e)
+
+    return BatchResult(index, spec, data, path, error)
+
+
+def generate_many(specs, workers=None, chunksize=1, ordered=True,
+                  output_dir=None, format=FORMAT_DEFAULT):
+    """Renders avatars in parallel processes.
+
+    Args:
+        specs: iterable of dicts of keyword arguments of Avatar, including
+            avatar_type. An optional 'filename' key sets a file name
+            of an image in output_dir.
+        workers: number of processes. Defaults to the number of CPUs.
+            If it's 1 that avatars are rendered in the current process.
+        chunksize: number of specs sent to a process at once.
+        ordered: yield results in order of specs or as they complete.
+        output_dir: directory for rendered images. If it's None that
+            encoded images are returned in results. Specs with file names
+            with directories fail with ValueError.
+        format: image format, e.g. 'png', 'webp' or 'jpeg'.
+
+    Yields BatchResult for every spec.
+
+    """
+
+    if workers is not None and workers < 1:
+        raise ValueError('workers must not be less 1')
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    tasks = (
+        (index, spec, format, output_dir)
+        for index, spec in enumerate(specs)
+    )
+
+    if workers == 1:
+        for task in tasks:
+            yield render_spec(task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+
+        for result in imap(render_spec, tasks, chunksize):
+            yield result
@@ -0,0 +1,440 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from pyavagen.instrumentation import span
+from pyavagen.utils import get_format
+from pyavagen.version import __version__
+
+
+class LRUCache(object):
+    """Bounded thread-safe LRU cache.
+
+    Values of missing keys are created by the load method.
+
+    Args:
+        maxsize: maximum number of values kept in the cache.
+
+    """
+
+    MAXSIZE_DEFAULT = 64
+
+    def __init__(self, maxsize=MAXSIZE_DEFAULT):
+        if maxsize < 1:
+            raise ValueError('maxsize must not be less 1')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def load(self, *key):
+        """Returns a new value for a key."""
+
+        raise NotImplementedError
+
+    def get(self, *key):
+        """Returns a value for a key from the cache or loads it."""
+
+        with self._lock:
+            try:
+                value = self._values[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return value
+
+        # The value is loaded outside the lock, so a slow load doesn't block
+        # threads that ask for other keys.
+        value = self.load(*key)
+
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        """Removes all values from the cache and resets counters."""
+
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns a dict with hits, misses, current size and maxsize."""
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._values),
+                'maxsize': self.maxsize,
+            }
+
+
+class FontCache(LRUCache):
+    """LRU cache of loaded fonts.
+
+    Fonts are keyed by (font path, size), so every font file is opened and
+    parsed once per size instead of once per generated avatar.
+
+    """
+
+    def load(self, font, size):
+        return ImageFont.truetype(font=font, size=size)
+
+    def get(self, font, size):
+        """Returns a loaded ImageFont.FreeTypeFont object for font and size."""
+
+        return super(FontCache, self).get(font, size)
+
+    def preload(self, font, sizes):
+        """Loads the font in passed sizes, e.g. at application startup."""
+
+        for size in sizes:
+            self.get(font, size)
+
+
+GlyphMask = namedtuple(
+    'GlyphMask',
+    ['mask', 'outline_mask', 'padding', 'text_size', 'text_offset'],
+)
+GlyphMask.__doc__ = """Rendered text.
+
+    mask: 'L' image with the text.
+    outline_mask: 'L' image with the outline of the text or None.
+    padding: padding of the text in masks.
+    text_size: (width, height) of the text.
+    text_offset: (x, y) offset of the text.
+
+"""
+
+
+class GlyphMaskCache(LRUCache):
+    """LRU cache of alpha masks of texts.
+
+    Masks are keyed by (font path, size, text, outline, start). A text is
+    composited on an image by Image.paste with a mask and a color, so it's
+    rasterized once per key. An outline is built by a single dilation
+    of the mask with a 3x3 max filter.
+
+    Args:
+        maxsize: maximum number of masks kept in the cache.
+        fonts: FontCache of fonts of texts.
+
+    """
+
+    MAXSIZE_DEFAULT = 1024
+
+    def __init__(self, maxsize=MAXSIZE_DEFAULT, fonts=None):
+        super(GlyphMaskCache, self).__init__(maxsize)
+        self.fonts = fonts if fonts is not None else font_cache
+
+    def load(self, font, size, text, outline, start):
+        with span('font'):
+            font_object = self.fonts.get(font, size)
+
+        with span('measure'):
+            # The same as getsize and getoffset of Pillow before 10.
+            offset_x, offset_y, text_width, text_height = (
+                font_object.getbbox(text)
+            )
+
+        padding = 1 if outline else 0
+
+        with span('draw_text'):
+            # A text at a fractional position can be a pixel wider.
+            mask = Image.new(
+                mode='L',
+                size=(
+                    text_width + 2 * padding + (1 if start[0] else 0),
+                    text_height + 2 * padding + (1 if start[1] else 0),
+                ),
+            )
+            ImageDraw.Draw(mask).text(
+                xy=(padding + start[0], padding + start[1]),
+                text=text,
+                font=font_object,
+                fill=255,
+            )
+
+        outline_mask = None
+
+        if outline:
+            with span('outline'):
+                outline_mask = mask.filter(ImageFilter.MaxFilter(3))
+
+        return GlyphMask(
+            mask=mask,
+            outline_mask=outline_mask,
+            padding=padding,
+            text_size=(text_width, text_height),
+            text_offset=(offset_x, offset_y),
+        )
+
+    def get(self, font, size, text, outline, start=(0, 0)):
+        """Returns GlyphMask of a text.
+
+        start is the fractional part of the position of the text, FreeType
+        renders a text with subpixel precision like ImageDraw.text does.
+
+        """
+
+        return super(GlyphMaskCache, self).get(
+            font,
+            size,
+            text,
+            outline,
+            tuple(start),
+        )
+
+
+font_cache = FontCache()
+glyph_cache = GlyphMaskCache()
+
+
+class RenderCache(object):
+    """Persistent cache of encoded avatars on local disk.
+
+    Images are stored in files named by a hash of the avatar class, values
+    of all fields, the image format and the package version. Files are
+    written atomically, so the cache directory can be shared by several
+    processes. When the total size of the cache exceeds max_size, the least
+    recently used files are removed until it's LOW_WATER_RATIO of max_size,
+    so the directory isn't scanned on every write of a full cache.
+    Temporary files of interrupted writes are removed on scans.
+
+    Avatars without a seed are random, so they are never cached.
+
+    Args:
+        directory: cache directory. Created if it doesn't exist.
+        max_size: maximum total size of cached files in bytes.
+        format: image format, e.g. 'png', 'webp' or 'jpeg'.
+
+    """
+
+    MAX_SIZE_DEFAULT = 256 * 1024 * 1024
+    FORMAT_DEFAULT = 'png'
+    TEMP_SUFFIX = '.tmp'
+    LOW_WATER_RATIO = 0.9
+    # Temporary files older than it are left by interrupted writes.
+    TEMP_MAX_AGE = 60 * 60
+
+    def __init__(self, directory, max_size=MAX_SIZE_DEFAULT,
+                 format=FORMAT_DEFAULT):
+        if max_size < 0:
+            raise ValueError('max_size must not be less 0')
+
+        self.directory = directory
+        self.max_size = max_size
+        self.format = format
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum([size for _, _, size in self._scan()])
+
+    def get_key(self, avatar):
+        """Returns a key of an avatar or None if it can't be cached.
+
+        Args:
+            avatar: pyavagen.Avatar or an avatar generator object.
+
+        """
+
+        avatar = getattr(avatar, 'avatar_class', avatar)
+        values = avatar.get_field_values()
+
+        if values.get('seed') is None:
+            return None
+
+        default_font = getattr(avatar, 'DEFAULT_FONT', None)
+
+        # The default font is installed with the package, so its path
+        # differs between environments.
+        if default_font and values.get('font') == default_font:
+            values['font'] = os.path.basename(default_font)
+
+        normalized = json.dumps(
+            [type(avatar).__name__, values, self.format, __version__],
+            sort_keys=True,
+        )
+
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def get_path(self, key):
+        """Returns a path of a cached file of a key."""
+
+        return os.path.join(
+            self.directory,
+            key[:2],
+            '{key}.{ext}'.format(key=key, ext=get_format(self.format)),
+        )
+
+    def get(self, key):
+        """Returns cached bytes of a key or None."""
+
+        path = self.get_path(key)
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # The modification time is used as the last access time.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return data
+
+    def set(self, key, data):
+        """Writes bytes of a key to the cache atomically."""
+
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path),
+            suffix=self.TEMP_SUFFIX,
+        )
+
+        try:
+            old_size = os.stat(path).st_size
+        except FileNotFoundError:
+            old_size = 0
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        with self._lock:
+            self._size += len(data) - old_size
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def fetch(self, avatar):
+        """Returns encoded image of an avatar from the cache.
+
+        If the avatar isn't cached that it's generated and written
+        to the cache.
+
+        """
+
+        key = self.get_key(avatar)
+
+        if key is None:
+            with self._lock:
+                self.bypasses += 1
+            return avatar.generate_bytes(self.format)
+
+        data = self.get(key)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if data is None:
+            data = avatar.generate_bytes(self.format)
+            self.set(key, data)
+
+        return data
+
+    def _scan(self):
+        """
+        Returns a list of (mtime, path, size) of cached files and removes
+        temporary files older than TEMP_MAX_AGE.
+        """
+
+        files = []
+        temp_deadline = time.time() - self.TEMP_MAX_AGE
+
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+
+                try:
+                    stat = os.stat(path)
+
+                    if name.endswith(self.TEMP_SUFFIX):
+                        if stat.st_mtime < temp_deadline:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+
+                files.append((stat.st_mtime, path, stat.st_size))
+
+        return files
+
+    def _evict(self):
+        # Other processes write to the same directory, so the real size
+        # is taken from disk.
+        files = sorted(self._scan())
+        self._size = sum([size for _, _, size in files])
+        low_water = self.max_size * self.LOW_WATER_RATIO
+
+        if self._size <= self.max_size:
+            return
+
+        for _, path, size in files:
+            if self._size <= low_water:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            self._size -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Removes all cached files and resets counters."""
+
+        with self._lock:
+            for _, path, _ in self._scan():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+            self._size = 0
+            self.hits = self.misses = self.bypasses = self.evictions = 0
+
+    def stats(self):
+        """Returns a dict with counters and the current size of the cache."""
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions,
+                'size': self._size,
+                'max_size': self.max_size,
+            }
@@ -0,0 +1,498 @@
+"""Command line interface for bulk generation of avatars.
+
+    pyavagen users.csv -o avatars.zip --workers 8 --format webp
+
+"""
+
+import argparse
+import collections
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+
+import pyavagen
+from pyavagen.batch import TEMP_SUFFIX, check_filename, generate_many
+from pyavagen.utils import get_format, parse_argument
+
+
+INPUT_FORMATS = ('csv', 'jsonl')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz')
+# Columns of specs which aren't arguments of avatars.
+SPEC_COLUMNS = ('name', 'type', 'filename')
+PROGRESS_INTERVAL = 0.5
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='pyavagen',
+        description=(
+            'Renders avatars of specs from a CSV or JSONL file in parallel '
+            'processes. Existing images are skipped, so an interrupted run '
+            'can be resumed.'
+        ),
+    )
+    parser.add_argument(
+        'input',
+        help='CSV or JSONL file of specs, "-" for stdin. Columns: name, '
+             'type, size, seed, filename and arguments of avatars, e.g. '
+             'color_list (separated by ";"), background_color, font_color.',
+    )
+    parser.add_argument(
+        '-o', '--output', required=True,
+        help='output directory or .zip, .tar, .tar.gz archive.',
+    )
+    parser.add_argument(
+        '--input-format', choices=INPUT_FORMATS,
+        help='format of the input. By default it is taken from the input '
+             'file extension.',
+    )
+    parser.add_argument(
+        '-f', '--format', default='png',
+        help='image format: png, webp, jpeg or svg. Default png.',
+    )
+    parser.add_argument(
+        '-t', '--type', default=pyavagen.CHAR_AVATAR,
+        choices=sorted(pyavagen.Avatar.AVATAR_MAP),
+        help='avatar type of specs without type. Default char.',
+    )
+    parser.add_argument(
+        '-s', '--size', type=int, default=128,
+        help='size of specs without size. Default 128.',
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int,
+        help='number of processes. Default number of CPUs.',
+    )
+    parser.add_argument(
+        '--chunksize', type=int, default=16,
+        help='number of specs sent to a process at once. Default 16.',
+    )
+    parser.add_argument(
+        '--manifest',
+        help='path of the JSONL manifest of results. '
+             'Default OUTPUT.manifest.jsonl.',
+    )
+    parser.add_argument(
+        '--overwrite', action='store_true',
+        help='render specs with existing images again.',
+    )
+    parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help="don't show progress.",
+    )
+
+    return parser
+
+
+def get_input_format(path, input_format=None):
+    """Returns a format of input specs by the path extension."""
+
+    if input_format:
+        return input_format
+
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+
+    if ext in ('json', 'ndjson'):
+        return 'jsonl'
+
+    if ext not in INPUT_FORMATS:
+        raise ValueError(
+            'Unknown format of {path}, pass --input-format.'.format(path=path)
+        )
+
+    return ext
+
+
+def get_archive_format(path):
+    """Returns 'zip' or 'tar' for archive paths and None for directories."""
+
+    lower_path = path.lower()
+
+    for ext in ARCHIVE_EXTENSIONS:
+        if lower_path.endswith(ext):
+            return 'zip' if ext == '.zip' else 'tar'
+
+    return None
+
+
+def check_columns(columns):
+    """
+    Raises ValueError if columns of CSV input aren't columns of specs
+    or arguments of avatars.
+    """
+
+    known_columns = set(SPEC_COLUMNS)
+
+    for avatar_class in pyavagen.Avatar.AVATAR_MAP.values():
+        known_columns.update(avatar_class._fields)
+
+    unknown_columns = [
+        column for column in columns
+        if column and column.strip() not in known_columns
+    ]
+
+    if unknown_columns:
+        raise ValueError('Unknown columns: {columns}.'.format(
+            columns=', '.join(unknown_columns),
+        ))
+
+
+def read_rows(fileobj, input_format):
+    """
+    Returns an iterator of (line number, dict of a row, error) of CSV
+    or JSONL input. error is a description of an invalid row or None.
+
+    Raises ValueError if CSV input has unknown columns, so they are
+    reported once before any row is read.
+    """
+
+    if input_format == 'csv':
+        reader = csv.DictReader(fileobj)
+        check_columns(reader.fieldnames or [])
+
+        return _read_csv_rows(reader)
+
+    return _read_jsonl_rows(fileobj)
+
+
+def _read_csv_rows(reader):
+    for row in reader:
+        yield reader.line_num, dict([
+            (column.strip(), value.strip())
+            for column, value in row.items()
+            if column and value and value.strip()
+        ]), None
+
+
+def _read_jsonl_rows(fileobj):
+    for line_num, line in enumerate(fileobj, 1):
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_num, {}, 'ValueError: {e}'.format(e=e)
+            continue
+
+        if not isinstance(row, dict):
+            yield line_num, {}, 'ValueError: a row must be an object.'
+            continue
+
+        yield line_num, row, None
+
+
+def get_filename(spec, format):
+    """
+    Returns a file name of a spec. It's made from the name and a hash
+    of the spec, so it's the same for the same spec in every run.
+    """
+
+    filename = spec.get('filename')
+
+    if filename:
+        check_filename(filename)
+        return filename
+
+    slug = re.sub(r'[^\w.-]+', '_', spec.get('string') or '').strip('._')
+    digest = hashlib.sha1(
+        json.dumps(spec, sort_keys=True).encode('utf-8')
+    ).hexdigest()[:8]
+
+    return '{slug}{digest}.{ext}'.format(
+        slug=slug[:64] + '-' if slug else '',
+        digest=digest,
+        ext=get_format(format),
+    )
+
+
+def make_spec(row, avatar_type, size):
+    """Returns a spec of Avatar for a row of input.
+
+    name is passed as string of char avatars and as seed, unless seed
+    is set, so an avatar is the same in every run.
+
+    """
+
+    spec = dict([
+        (column, parse_argument(column, value))
+        for column, value in row.items()
+    ])
+    name = spec.pop('name', None)
+    spec['avatar_type'] = spec.pop('type', None) or avatar_type
+    spec.setdefault('size', size)
+
+    if name is not None:
+        avatar_class = pyavagen.Avatar.AVATAR_MAP.get(spec['avatar_type'])
+
+        if avatar_class is None or 'string' in avatar_class._fields:
+            spec.setdefault('string', str(name))
+
+        spec.setdefault('seed', str(name))
+
+    return spec
+
+
+def write_archive(path, archive_format, directory, names):
+    """
+    Writes files of a directory with passed names and other members of
+    an existing archive to a new archive, which replaces the existing one
+    atomically.
+    """
+
+    replaced = set(names)
+    temp_path = '{path}.{uid}{suffix}'.format(
+        path=path,
+        uid=uuid.uuid4().hex,
+        suffix=TEMP_SUFFIX,
+    )
+
+    try:
+        if archive_format == 'zip':
+            with zipfile.ZipFile(temp_path, 'w') as archive:
+                if os.path.exists(path):
+                    with zipfile.ZipFile(path) as existing:
+                        for info in existing.infolist():
+                            if info.filename not in replaced:
+                                archive.writestr(info, existing.read(info))
+
+                for name in names:
+                    archive.write(os.path.join(directory, name), name)
+        else:
+            mode = 'w:gz' if not path.lower().endswith('.tar') else 'w'
+
+            with tarfile.open(temp_path, mode) as archive:
+                if os.path.exists(path):
+                    with tarfile.open(path) as existing:
+                        for info in existing.getmembers():
+                            if info.name not in replaced:
+                                archive.addfile(
+                                    info,
+                                    existing.extractfile(info),
+                                )
+
+                for name in names:
+                    archive.add(os.path.join(directory, name), name)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def get_archive_names(path, archive_format):
+    """Returns a set of member names of an existing archive."""
+
+    if not os.path.exists(path):
+        return set()
+
+    if archive_format == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            return set(archive.namelist())
+
+    with tarfile.open(path) as archive:
+        return set(archive.getnames())
+
+
+class Manifest(object):
+    """
+    Writes entries of results to a JSONL file as they come, so a crashed
+    run keeps entries of processed specs. Counts statuses of entries.
+    It's thread-safe, because specs are read in a thread of the pool.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.statuses = collections.Counter()
+        self._lock = threading.Lock()
+
+    def write(self, entry):
+        with self._lock:
+            self.fileobj.write(json.dumps(entry, sort_keys=True) + '\n')
+            self.fileobj.flush()
+            self.statuses[entry['status']] += 1
+
+
+class Progress(object):
+    """
+    Shows the number of processed specs and the rate on a stream.
+    Specs are read while they are rendered, so the total isn't known.
+    """
+
+    def __init__(self, stream=None, interval=PROGRESS_INTERVAL):
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.started = self.shown = time.monotonic()
+
+    def update(self, error=False):
+        self.done += 1
+        self.errors += bool(error)
+        now = time.monotonic()
+
+        if now - self.shown >= self.interval:
+            self.shown = now
+            self.show(now)
+
+    def show(self, now):
+        if self.stream is None:
+            return
+
+        elapsed = max(now - self.started, 1e-9)
+        self.stream.write(
+            '\r{done} rendered, {errors} errors, '
+            '{rate:.1f} avatars/s'.format(
+                done=self.done,
+                errors=self.errors,
+                rate=self.done / elapsed,
+            )
+        )
+        self.stream.flush()
+
+    def finish(self):
+        if self.stream is not None and self.done:
+            self.show(time.monotonic())
+            self.stream.write('\n')
+
+
+def read_specs(rows, args, existing, manifest, pending):
+    """
+    Yields specs of rows to render. Entries of invalid rows and rows
+    with existing images are written to the manifest, entries of yielded
+    specs are kept in pending by indexes of specs until they are rendered.
+    """
+
+    index = 0
+
+    for line_num, row, error in rows:
+        entry = {'line': line_num, 'name': row.get('name')}
+
+        if error:
+            entry.update(status='error', error=error)
+            manifest.write(entry)
+            continue
+
+        try:
+            spec = make_spec(row, args.type, args.size)
+            spec['filename'] = get_filename(spec, args.format)
+        except ValueError as e:
+            entry.update(status='error', error='ValueError: {e}'.format(
+                e=e,
+            ))
+            manifest.write(entry)
+            continue
+
+        entry['file'] = spec['filename']
+
+        if spec['filename'] in existing and not args.overwrite:
+            entry['status'] = 'skipped'
+            manifest.write(entry)
+            continue
+
+        pending[index] = entry
+        index += 1
+
+        yield spec
+
+
+def main(argv=None):
+    """Runs the command line interface and returns the exit status."""
+
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must not be less 1')
+
+    try:
+        input_format = get_input_format(args.input, args.input_format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = os.path.normpath(args.output)
+    archive_format = get_archive_format(output)
+    # Images of archives are rendered to a staging directory first, so
+    # an interrupted run leaves them on disk for the next one.
+    output_dir = output + '.parts' if archive_format else output
+    manifest_path = args.manifest or output + '.manifest.jsonl'
+    os.makedirs(output_dir, exist_ok=True)
+
+    existing = set(os.listdir(output_dir))
+
+    if archive_format and not args.overwrite:
+        existing |= get_archive_names(output, archive_format)
+
+    if args.input == '-':
+        fileobj = sys.stdin
+    else:
+        fileobj = open(args.input, newline='', encoding='utf-8')
+
+    progress = Progress(stream=None if args.quiet else sys.stderr)
+    # Entries of specs which are being rendered by indexes of specs.
+    pending = {}
+
+    with fileobj:
+        try:
+            rows = read_rows(fileobj, input_format)
+        except ValueError as e:
+            parser.error(str(e))
+
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            manifest = Manifest(f)
+
+            for result in generate_many(
+                read_specs(rows, args, existing, manifest, pending),
+                workers=args.workers,
+                chunksize=args.chunksize,
+                ordered=False,
+                output_dir=output_dir,
+                format=args.format,
+            ):
+                entry = pending.pop(result.index)
+
+                if result.error:
+                    entry.update(status='error', error=result.error)
+                else:
+                    entry['status'] = 'ok'
+
+                manifest.write(entry)
+                progress.update(result.error)
+
+    progress.finish()
+
+    if archive_format:
+        names = sorted([
+            name for name in os.listdir(output_dir)
+            if not name.endswith(TEMP_SUFFIX)
+        ])
+
+        if names:
+            write_archive(output, archive_format, output_dir, names)
+
+        shutil.rmtree(output_dir)
+
+    statuses = manifest.statuses
+
+    if not args.quiet:
+        sys.stderr.write(
+            '{ok} rendered, {skipped} skipped, {error} errors. '
+            'Manifest: {manifest}\n'.format(
+                ok=statuses['ok'],
+                skipped=statuses['skipped'],
+                error=statuses['error'],
+                manifest=manifest_path,
+            )
+        )
+
+    return 1 if statuses['error'] else 0
@@ -1,3 +1,6 @@
+from pyavagen.validators import compile_validator
+
+
 class AvatarField(object):
     """Avatar helper.
 
@@ -14,17 +17,18 @@ class AvatarField(object):
         self.validators = validators
         self.default = default
         self.name = None
+        self._clean = None
 
     def __set_name__(self, owner, name):
         self.name = name
+        self._clean = None
 
     def __get__(self, instance, owner):
         return instance.__dict__[self.name]
 
     def __set__(self, instance, value):
-        value = self.get_default() if value is None else value
-        self.run_validators(value)
-        instance.__dict__[self.name] = value
+        clean = self._clean or self.compile()
+        instance.__dict__[self.name] = clean(value)
 
     def get_default(self):
         """Returns the default value for this field."""
@@ -41,3 +45,73 @@ class AvatarField(object):
         if value and self.validators:
             for validator in self.validators:
                 validator(value, self.name)
+
+    def compile(self):
+        """
+        Compiles the default value and validators of the field to a single
+        function, which returns a cleaned value, and caches it.
+        It's the same as get_default and run_validators do.
+        """
+
+        default = self.default
+        get_default = self.get_default if callable(default) else None
+        checks = tuple([
+            compile_validator(validator, self.name)
+            for validator in self.validators or ()
+        ])
+
+        def clean(value):
+            if value is None:
+                value = get_default() if get_default else default
+            if value:
+                for check in checks:
+                    check(value)
+            return value
+
+        self._clean = clean
+
+        return clean
+
+    def clean(self, value):
+        """Returns a passed value or the default value if it's None.
+
+        Raises ValueError if the value is invalid.
+
+        """
+
+        return (self._clean or self.compile())(value)
+
+
+def compile_fields(fields):
+    """Compiles fields to a single function that cleans a dict of values.
+
+    Args:
+        fields: ordered dict of names and AvatarField objects.
+
+    The function takes a dict of values of fields, checks them in one pass
+    and returns a dict of cleaned values for all fields. Missing values
+    take default values.
+
+    """
+
+    cleaners = tuple([
+        (name, field._clean or field.compile())
+        for name, field in fields.items()
+    ])
+    names = frozenset(fields)
+
+    def clean_fields(values):
+        unknown = set(values) - names
+
+        if unknown:
+            raise TypeError(
+                'Unexpected arguments: {names}.'.format(
+                    names=', '.join(sorted(unknown)),
+                )
+            )
+
+        get = values.get
+
+        return dict([(name, clean(get(name))) for name, clean in cleaners])
+
+    return clean_fields
@@ -2,33 +2,38 @@ import abc
 import math
 import os
 import random
+from collections import OrderedDict
 
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from PIL import Image, ImageDraw, ImageFilter
 
-from pyavagen.fields import AvatarField
-from pyavagen.utils import get_random_hex_color
+from pyavagen.cache import font_cache, glyph_cache
+from pyavagen.fields import AvatarField, compile_fields
+from pyavagen.instrumentation import span
+from pyavagen.palettes import (  # noqa: F401
+    COLOR_LIST_FLAT,
+    COLOR_LIST_MATERIAL,
+    Palette
+)
+from pyavagen.utils import (
+    blend_colors,
+    encode_image,
+    get_format,
+    get_hex_color,
+    get_random_hex_color,
+    get_random_rgb_color,
+    make_svg,
+    write_png
+)
 from pyavagen.validators import (
+    ChoicesValidator,
+    ColorListValidator,
     ColorValidator,
     MinValueValidator,
-    TypeValidator
+    TypeValidator,
+    parse_color
 )
 
 
-COLOR_LIST_FLAT = [
-    '#1abc9c', '#2ecc71', '#3498db', '#9b59b6', '#34495e',
-    '#16a085', '#27ae60', '#2980b9', '#8e44ad', '#2c3e50',
-    '#f1c40f', '#e67e22', '#e74c3c', '#ecf0f1', '#95a5a6',
-    '#f39c12', '#d35400', '#c0392b', '#bdc3c7', '#7f8c8d',
-]
-
-COLOR_LIST_MATERIAL = [
-    '#D32F2F', '#C2185B', '#7B1FA2', '#512DA8', '#303F9F',
-    '#1976D2', '#0288D1', '#0097A7', '#00796B', '#388E3C',
-    '#689F38', '#AFB42B', '#FBC02D', '#FFA000', '#F57C00',
-    '#E64A19', '#5D4037', '#616161', '#455A64', '#333333',
-]
-
-
 class AvatarMeta(type):
     def __new__(mcs, name, bases, attributes):
         cls = super().__new__(mcs, name, bases, attributes)
@@ -37,6 +42,16 @@ class AvatarMeta(type):
             if isinstance(obj, AvatarField):
                 obj.__set_name__(cls, attr)
 
+        # All fields of a class including fields of base classes and mixins.
+        cls._fields = OrderedDict()
+
+        for klass in reversed(cls.__mro__):
+            for attr, obj in vars(klass).items():
+                if isinstance(obj, AvatarField):
+                    cls._fields[attr] = obj
+
+        cls._clean_fields = staticmethod(compile_fields(cls._fields))
+
         return cls
 
 
@@ -49,10 +64,19 @@ class BaseAvatar(object, metaclass=CombinedMetaClasses):
 
     Args:
         size: output image size.
+        seed: seed of the random number generator of an avatar.
+            Avatars with the same arguments and seed are identical.
+            If it's None that every avatar will be random.
 
     """
 
     SIZE_MIN = 1
+    # Fields without defaults. Templates can leave them for renders, but
+    # an avatar can't be created without them.
+    REQUIRED_FIELDS = ('size',)
+
+    # Optional pyavagen.pool.CanvasPool, which canvases are borrowed from.
+    canvas_pool = None
 
     size = AvatarField(
         validators=[
@@ -60,19 +84,115 @@ class BaseAvatar(object, metaclass=CombinedMetaClasses):
             MinValueValidator(SIZE_MIN),
         ]
     )
+    seed = AvatarField(
+        validators=[
+            TypeValidator((int, str)),
+        ]
+    )
 
-    def __init__(self, size):
+    def __init__(self, size, seed=None):
         self.size = size
-        self.img = self.get_initial_img()
+        self.seed = seed
+        self.check_required_fields(self.__dict__)
+        self.check_fields(self.__dict__)
+        self.prepare()
+
+    @classmethod
+    def from_clean_values(cls, values):
+        """Returns a new avatar with values of all fields.
+
+        Values must be cleaned by clean_fields and checked by check_fields,
+        they aren't validated again.
+
+        """
+
+        avatar = cls.__new__(cls)
+        avatar.__dict__.update(values)
+        avatar.prepare()
+
+        return avatar
+
+    def prepare(self):
+        """
+        Sets up an avatar after values of fields are set: the random number
+        generator and random defaults. Images aren't allocated until
+        generate is called.
+        """
+
+        # Seeding of a new generator from os.urandom is slow, so random
+        # avatars share the generator of the random module.
+        self.rng = (
+            random.Random(self.seed) if self.seed is not None else random
+        )
+        self.img = None
 
     def get_initial_img(self):
         """
-        Returns new PIL.Image.Image object for self.img from __init__ method.
+        Returns new PIL.Image.Image object for drawing by generate method.
         """
 
-        return Image.new(
-            mode='RGB',
-            size=tuple([self.size]) * 2,
+        return self.acquire_canvas(mode='RGB', size=tuple([self.size]) * 2)
+
+    def acquire_canvas(self, mode, size, color=0):
+        """
+        Returns a new image filled with color. It's borrowed from
+        canvas_pool if it's set.
+        """
+
+        if self.canvas_pool is None:
+            return Image.new(mode=mode, size=size, color=color)
+
+        return self.canvas_pool.acquire(mode, size, color)
+
+    def release_canvas(self, img):
+        """
+        Returns an image that is no longer used to canvas_pool if it's set.
+        """
+
+        if self.canvas_pool is not None:
+            self.canvas_pool.release(img)
+
+    @classmethod
+    def clean_fields(cls, values):
+        """Checks a dict of values of fields in one pass.
+
+        Returns a dict of cleaned values of all fields of the class, missing
+        values take default values. Raises ValueError if a value is invalid
+        and TypeError if a value isn't a field.
+
+        """
+
+        return cls._clean_fields(values)
+
+    @classmethod
+    def check_required_fields(cls, values):
+        """Raises TypeError if values of required fields are None."""
+
+        missing = [
+            name for name in cls.REQUIRED_FIELDS if values.get(name) is None
+        ]
+
+        if missing:
+            raise TypeError(
+                'Missing required arguments: {names}.'.format(
+                    names=', '.join(missing),
+                )
+            )
+
+    @classmethod
+    def check_fields(cls, values):
+        """
+        Raises ValueError if values of fields are valid separately
+        but don't fit each other.
+        """
+
+        pass
+
+    def get_field_values(self):
+        """Returns an ordered dict of values of all fields of an avatar."""
+
+        return OrderedDict(
+            [(name, getattr(self, name)) for name in self._fields]
         )
 
     @abc.abstractmethod
@@ -81,29 +201,205 @@ class BaseAvatar(object, metaclass=CombinedMetaClasses):
 
         pass
 
+    def get_svg_elements(self):
+        """Returns a list of SVG elements of the avatar."""
+
+        raise NotImplementedError
+
+    def generate_svg(self):
+        """Returns an SVG document of the avatar as a string.
+
+        It's drawn by the same random layout and colors as images with
+        the same seed, but rasterized by a client.
+
+        """
+
+        with span('generate_svg', self):
+            return make_svg(self.size, self.get_svg_elements())
+
+    def check_sizes(self, sizes):
+        """
+        Raises ValueError if passed sizes can't be derived from an image
+        of the avatar size.
+        """
+
+        if not sizes:
+            raise ValueError('sizes must not be empty')
+
+        for size in sizes:
+            if not self.SIZE_MIN <= size <= self.size:
+                raise ValueError(
+                    'sizes must be from {min} to size {size}'.format(
+                        min=self.SIZE_MIN,
+                        size=self.size,
+                    )
+                )
+
+    def resize_to_sizes(self, img, sizes, resample=Image.LANCZOS):
+        """
+        Returns a dict of passed sizes and images downsampled from passed
+        image. Every image is downsampled from the previous bigger one.
+        'P' images are converted to RGB unless resample is NEAREST.
+        """
+
+        images = {}
+
+        if img.mode == 'P' and resample != Image.NEAREST:
+            img = img.convert('RGB')
+
+        for size in sorted(set(sizes), reverse=True):
+            if img.size != (size, size):
+                img = img.resize((size, size), resample=resample)
+            images[size] = img
+
+        return images
+
+    def generate_sizes(self, sizes):
+        """Generates an image once and returns it in several sizes.
+
+        The image is generated in the avatar size, which must not be less
+        than passed sizes, and smaller images are downsampled from it.
+        So images of all sizes look the same.
+
+        Args:
+            sizes: list of sizes, e.g. [32, 64, 128, 256, 512].
+
+        Returns a dict of sizes and PIL.Image.Image objects.
+
+        """
+
+        self.check_sizes(sizes)
+
+        with span('generate_sizes', self):
+            img = self.generate()
+
+            with span('resize'):
+                return self.resize_to_sizes(img, sizes)
+
+    def generate_bytes(self, format='png', quality=None, optimize=None,
+                       **options):
+        """Generates an image and returns it encoded to passed format.
+
+        The image is dropped right after encoding, so its pixels are
+        released, and returned to canvas_pool if it's set. Every generate
+        allocates a new image, so the avatar can be encoded again.
+        See pyavagen.utils.encode_image for arguments. The 'svg' format
+        returns generate_svg encoded to UTF-8.
+
+        """
+
+        if get_format(format) == 'svg':
+            return self.generate_svg().encode('utf-8')
+
+        with span('generate_bytes', self):
+            img = self.generate()
+
+            try:
+                with span('encode'):
+                    return encode_image(
+                        img, format, quality, optimize, **options
+                    )
+            finally:
+                if self.canvas_pool is not None:
+                    self.canvas_pool.release(img)
+                self.img = None
+
+    def generate_to(self, fileobj, format='png', quality=None, optimize=None,
+                    **options):
+        """
+        Generates an image, writes it encoded to passed file object and
+        returns the number of written bytes.
+        """
+
+        data = self.generate_bytes(format, quality, optimize, **options)
+        fileobj.write(data)
+
+        return len(data)
+
+    def render_into(self, img, position):
+        """
+        Renders the avatar on an RGB image with the upper left corner
+        at passed position, e.g. on a sprite sheet. Subclasses draw
+        directly on the image where it's possible.
+        """
+
+        with span('render_into', self):
+            avatar_img = self.generate()
+            img.paste(avatar_img, position)
+
+            if self.canvas_pool is None:
+                avatar_img.close()
+            else:
+                self.canvas_pool.release(avatar_img)
+            self.img = None
+
 
 class ColorListMixin(object):
     """Mixin for assignment of color set.
 
     Args:
-        color_list: list of colors.
+        color_list: list of colors or Palette.
             If it's empty list that will be generates random color.
+        palette_mode: render an image in 'P' mode with attached palette
+            where it's possible. Such images take less memory and
+            are encoded to much smaller PNG.
 
     """
 
     COLOR_LIST_DEFAULT = COLOR_LIST_FLAT
+    PALETTE_MODE_DEFAULT = False
+
+    # Random number generator. Avatars replace it with their own instance.
+    rng = random
 
     color_list = AvatarField(
         default=COLOR_LIST_DEFAULT,
         validators=[
             TypeValidator((list, tuple)),
+            ColorListValidator(),
+        ]
+    )
+    palette_mode = AvatarField(
+        default=PALETTE_MODE_DEFAULT,
+        validators=[
+            TypeValidator(bool),
         ]
     )
 
-    def __init__(self, color_list=None, *args, **kwargs):
+    def __init__(self, color_list=None, palette_mode=None, *args, **kwargs):
         self.color_list = color_list
+        self.palette_mode = palette_mode
         super(ColorListMixin, self).__init__(*args, **kwargs)
 
+    @property
+    def palette(self):
+        """Palette of self.color_list."""
+
+        cached = self.__dict__.get('_palette')
+
+        if cached is None or cached[0] is not self.color_list:
+            cached = self._palette = (
+                self.color_list,
+                Palette.from_colors(self.color_list),
+            )
+
+        return cached[1]
+
+    def get_random_rgb_color(self):
+        """
+        Returns random color from self.color_list as RGB tuple.
+        If self.color_list passed as an empty list then it will
+        be generate random color.
+        """
+
+        palette = self.palette
+
+        return (
+            self.rng.choice(palette.rgb)
+            if palette
+            else get_random_rgb_color(self.rng)
+        )
+
     def get_random_color(self):
         """
         Returns random color from self.color_list.
@@ -113,9 +409,9 @@ class ColorListMixin(object):
 
         color_list = self.color_list
         color = (
-            random.choice(color_list)
+            self.rng.choice(color_list)
             if color_list
-            else get_random_hex_color()
+            else get_random_hex_color(self.rng)
         )
 
         return color
@@ -127,9 +423,32 @@ class SquareAvatar(ColorListMixin, BaseAvatar):
     Args:
         squares_on_axis: number of squares on axis. Has a default value.
         blur_radius: blur radius.
+        blur_method: the way of blur.
+            BLUR_METHOD_EXACT blurs an image in full resolution.
+            BLUR_METHOD_REDUCED downsamples an image, blurs it with
+            a proportionally smaller radius and upsamples it back. It's
+            used for blur radius from 8, where it's 2-4 times faster.
+            The mean difference of channels from the exact blur grows
+            with the radius relative to the size: it's less than 0.5 of
+            255 for radiuses up to 1/16 of the size, e.g. 0.2 for size
+            1024 and radius 32, but about 10 for size 64 and radius 32.
         rotate: background rotate. Has a default value.
         border_size: border size of square.
         border_color: color of border.
+        render_engine: the way an image is rendered.
+            RENDER_ENGINE_CLASSIC draws squares on a canvas twice the size
+            of an image, rotates and crops it.
+            RENDER_ENGINE_TRANSFORM draws squares at one pixel per square
+            and makes a rotated, cropped and upscaled image by a single
+            affine transform. It's several times faster for big sizes.
+            RENDER_ENGINE_NUMPY maps pixels onto squares with NumPy like
+            the transform engine does. Falls back to the classic engine
+            if NumPy isn't installed.
+        tile_size: if it's set that an image is rendered in square tiles
+            of this size like the transform engine does, and blurred tile
+            by tile with overlapping margins. Transient memory is
+            proportional to the tile size, so it's used for big sizes.
+            render_engine is ignored.
 
     """
 
@@ -138,9 +457,34 @@ class SquareAvatar(ColorListMixin, BaseAvatar):
     BORDER_SIZE_MIN = 0
     BLUR_RADIUS_MIN = 0
     BLUR_RADIUS_DEFAULT = 1
+    BLUR_METHOD_EXACT = 'exact'
+    BLUR_METHOD_REDUCED = 'reduced'
+    BLUR_METHODS = (BLUR_METHOD_EXACT, BLUR_METHOD_REDUCED)
+    BLUR_METHOD_DEFAULT = BLUR_METHOD_EXACT
+    # Blur radius in a downsampled image for BLUR_METHOD_REDUCED.
+    BLUR_REDUCED_RADIUS = 4
+    RENDER_ENGINE_CLASSIC = 'classic'
+    RENDER_ENGINE_TRANSFORM = 'transform'
+    RENDER_ENGINE_NUMPY = 'numpy'
+    RENDER_ENGINES = (
+        RENDER_ENGINE_CLASSIC,
+        RENDER_ENGINE_TRANSFORM,
+        RENDER_ENGINE_NUMPY,
+    )
+    RENDER_ENGINE_DEFAULT = RENDER_ENGINE_CLASSIC
+    TILE_SIZE_MIN = 16
+    TILE_SIZE_DEFAULT = 512
+    # Margin of a part of the grid drawn for a tile, in pixels of the grid.
+    # It covers the neighbours read by BICUBIC resampling.
+    TILE_GRID_MARGIN = 3
+    # Pillow transforms with NEAREST in 16.16 fixed point, so coefficients
+    # of a transform are rounded to it to be the same for any tile offset.
+    TRANSFORM_PRECISION = 1 << 16
+    SQUARE_COLOR_ATTEMPTS = 16
+    SQUARES_ON_AXIS_RANGE = (3, 4)
+    ROTATE_RANGE = (0, 360)
 
     squares_on_axis = AvatarField(
-        default=lambda: random.randint(3, 4),
         validators=[
             TypeValidator(int),
             MinValueValidator(1),
@@ -153,8 +497,14 @@ class SquareAvatar(ColorListMixin, BaseAvatar):
             MinValueValidator(BLUR_RADIUS_MIN),
         ]
     )
+    blur_method = AvatarField(
+        default=BLUR_METHOD_DEFAULT,
+        validators=[
+            TypeValidator(str),
+            ChoicesValidator(BLUR_METHODS),
+        ]
+    )
     rotate = AvatarField(
-        default=lambda: random.randint(0, 360),
         validators=[
             TypeValidator(int),
         ]
@@ -173,82 +523,695 @@ class SquareAvatar(ColorListMixin, BaseAvatar):
             MinValueValidator(0)
         ]
     )
+    render_engine = AvatarField(
+        default=RENDER_ENGINE_DEFAULT,
+        validators=[
+            TypeValidator(str),
+            ChoicesValidator(RENDER_ENGINES),
+        ]
+    )
+    tile_size = AvatarField(
+        validators=[
+            TypeValidator(int),
+            MinValueValidator(TILE_SIZE_MIN),
+        ]
+    )
 
     def __init__(self, squares_on_axis=None, blur_radius=None,
                  rotate=None, border_size=None,
-                 border_color=None, *args, **kwargs):
+                 border_color=None, render_engine=None, blur_method=None,
+                 tile_size=None, *args, **kwargs):
+        self.squares_on_axis = squares_on_axis
+        self.blur_radius = blur_radius
+        self.blur_method = blur_method
+        self.rotate = rotate
+        self.border_size = border_size
         self.border_color = border_color
+        self.render_engine = render_engine
+        self.tile_size = tile_size
         super(SquareAvatar, self).__init__(*args, **kwargs)
 
-        self.blur_radius = blur_radius
-        self.border_size = border_size
-        self.rotate = rotate
-        self.squares_on_axis = squares_on_axis
-        self._squares_colors = []
+    def prepare(self):
+        super(SquareAvatar, self).prepare()
+
+        if self.rotate is None:
+            self.rotate = self.rng.randint(*self.ROTATE_RANGE)
+
+        if self.squares_on_axis is None:
+            self.squares_on_axis = self.rng.randint(
+                *self.SQUARES_ON_AXIS_RANGE
+            )
+
+    @classmethod
+    def check_fields(cls, values):
+        """
+        Raises ValueError if adjacent squares can't have different colors
+        with the passed color list.
+        """
+
+        super(SquareAvatar, cls).check_fields(values)
+
+        squares_on_axis = values['squares_on_axis']
+        palette = Palette.from_colors(values['color_list'])
+
+        # A random number of squares on axis is always more than 1.
+        if squares_on_axis is None or squares_on_axis > 1:
+            if len(set(palette.rgb)) == 1:
+                raise ValueError(
+                    'color_list must contain at least 2 different colors '
+                    'to color adjacent squares differently.'
+                )
 
     def get_initial_img(self):
-        return Image.new(
-            mode='RGB',
-            color=self.border_color,
-            size=tuple([self.size * 2]) * 2,
-        )
+        """Canvases are created by render engines."""
+
+        return None
 
-    def _generate_square_color(self):
+    def is_palette_mode(self):
+        """
+        Returns True if an image is rendered in 'P' mode.
+        Blur makes too many colors, so only unblurred images can be.
+        """
+
+        return self.palette_mode and not self.blur_radius
+
+    def _get_square_color(self, adjacent_colors):
+        """Returns random color that differs from passed adjacent colors."""
+
+        color = self.get_random_rgb_color()
+
+        if color not in adjacent_colors:
+            return color
+
+        palette = self.palette
+
+        if palette:
+            return self.rng.choice([
+                c for c in palette.rgb if c not in adjacent_colors
+            ])
+
+        for _ in range(self.SQUARE_COLOR_ATTEMPTS):
+            color = get_random_rgb_color(self.rng)
+
+            if color not in adjacent_colors:
+                return color
+
+        raise RuntimeError('Unable to generate a color of square.')
+
+    def _generate_squares_colors(self, squares_count):
         """
         Generates colors of squares so that adjacent squares are different.
-        Every color saved to self._squares_colors.
-        After generation returns latest color from self._squares_colors.
+        Returns a list of columns of squares colors as RGB tuples.
+
+        Every square is compared only with the left and the upper squares,
+        so two different colors are always enough.
         """
 
-        squares_colors = self._squares_colors
-        squares_colors.append(self.get_random_color())
+        columns = []
 
-        if squares_colors and len(squares_colors) > 1:
-            if squares_colors[-1] == squares_colors[-2]:
-                self._squares_colors = squares_colors[:-1]
-                self._generate_square_color()
+        for i in range(squares_count):
+            column = []
 
-            if len(squares_colors) > self.squares_on_axis:
-                upper_adjacent_square = -(self.squares_on_axis + 1)
+            for j in range(squares_count):
+                column.append(self._get_square_color((
+                    column[j - 1] if j else None,
+                    columns[i - 1][j] if i else None,
+                )))
 
-                if squares_colors[-1] == squares_colors[upper_adjacent_square]:
-                    self._squares_colors = squares_colors[:-1]
-                    self._generate_square_color()
+            columns.append(column)
 
-        return self._squares_colors[-1]
+        return columns
+
+    def _get_squares_layout(self):
+        """
+        Returns the side length of a square on the canvas twice the size
+        of an image and the number of squares drawn on an axis.
+        """
 
-    def generate(self):
-        draw = ImageDraw.Draw(self.img)
         size2x = self.size * 2
         square_side_length = size2x // self.squares_on_axis
 
-        for i in range(size2x // square_side_length):
-            for j in range(size2x // square_side_length):
+        return square_side_length, size2x // square_side_length
+
+    def _new_canvas(self, size, squares_colors):
+        """
+        Returns a new canvas filled with border color and a dict of fills
+        of squares colors for _draw_squares.
+
+        In palette mode the canvas is a 'P' image with a palette of the
+        border color and squares colors, and fills are their indexes.
+        If there are more than 256 colors that the canvas is RGB.
+        """
+
+        border_color = parse_color(self.border_color)
+        colors = OrderedDict.fromkeys([border_color])
+
+        if self.is_palette_mode():
+            for column in squares_colors:
+                colors.update(OrderedDict.fromkeys(column))
+
+        if len(colors) == 1 or len(colors) > 256:
+            img = self.acquire_canvas(
+                mode='RGB',
+                size=size,
+                color=border_color,
+            )
+            return img, None
+
+        img = self.acquire_canvas(mode='P', size=size, color=0)
+        img.putpalette([channel for color in colors for channel in color])
+
+        return img, dict([(color, i) for i, color in enumerate(colors)])
+
+    def _draw_squares(self, img, square_side_length, squares_colors,
+                      fills=None, offset=(0, 0)):
+        """Draws colored squares with borders on a passed image.
+
+        offset is the position of the image on the grid of squares,
+        only squares that overlap the image are drawn.
+
+        """
+
+        draw = ImageDraw.Draw(img)
+        squares_count = len(squares_colors)
+        x, y = offset
+        width, height = img.size
+
+        for i in range(
+            x // square_side_length,
+            min(squares_count, (x + width) // square_side_length + 1),
+        ):
+            for j in range(
+                y // square_side_length,
+                min(squares_count, (y + height) // square_side_length + 1),
+            ):
                 draw.rectangle(
                     xy=(
-                        i * square_side_length + self.border_size,
-                        j * square_side_length + self.border_size,
-                        (i + 1) * square_side_length - self.border_size,
-                        (j + 1) * square_side_length - self.border_size,
+                        i * square_side_length + self.border_size - x,
+                        j * square_side_length + self.border_size - y,
+                        (i + 1) * square_side_length - self.border_size - x,
+                        (j + 1) * square_side_length - self.border_size - y,
+                    ),
+                    fill=(
+                        fills[squares_colors[i][j]]
+                        if fills
+                        else squares_colors[i][j]
                     ),
-                    fill=self._generate_square_color(),
                 )
 
-        self.img = self.img.rotate(self.rotate, resample=Image.BICUBIC)
+    def _get_crop_offset(self):
+        """
+        Returns random coordinates of the upper left corner of an image
+        on the rotated canvas twice the size of the image.
+        The image never goes out of the rotated canvas.
+        """
 
+        size2x = self.size * 2
         distance_a = math.sqrt(2) * self.size / 2
         distance_b = size2x - self.size - distance_a
-        x0 = random.uniform(distance_a, distance_b)
-        y0 = random.uniform(distance_a, distance_b)
+        x0 = self.rng.uniform(distance_a, distance_b)
+        y0 = self.rng.uniform(distance_a, distance_b)
+
+        return x0, y0
+
+    def _render_classic(self):
+        """Draws squares on the canvas twice the size, rotates and crops it."""
+
+        size2x = self.size * 2
+        square_side_length, squares_count = self._get_squares_layout()
+        squares_colors = self._generate_squares_colors(squares_count)
+
+        with span('draw_squares'):
+            canvas, fills = self._new_canvas(
+                (size2x, size2x),
+                squares_colors,
+            )
+            self._draw_squares(
+                canvas, square_side_length, squares_colors, fills
+            )
+
+        with span('rotate'):
+            # 'P' images are always rotated with NEAREST resampling.
+            img = canvas.rotate(self.rotate, resample=Image.BICUBIC)
+            self.release_canvas(canvas)
+
+        x0, y0 = self._get_crop_offset()
         x1 = size2x - (size2x - self.size - x0)
         y1 = size2x - (size2x - self.size - y0)
 
-        self.img = self.img.crop(box=(x0, y0, x1, y1))
+        with span('crop'):
+            return img.crop(box=(x0, y0, x1, y1))
+
+    def get_transform_matrix(self, scale=1):
+        """
+        Returns coefficients of an affine transform that maps coordinates
+        of an image to coordinates on the unrotated canvas twice the size,
+        multiplied by passed scale. Picks a random crop offset.
+
+        It's the same inverse mapping as PIL.Image.Image.rotate uses,
+        but shifted to the crop offset. Coefficients are rounded to
+        TRANSFORM_PRECISION, so offsets of tiles are exact and tiles sample
+        the same pixels as the whole image.
+        """
+
+        angle = -math.radians(self.rotate % 360.0)
+        cos, sin = math.cos(angle), math.sin(angle)
+        x0, y0 = [round(offset) for offset in self._get_crop_offset()]
+        dx, dy = x0 - self.size, y0 - self.size
+        precision = self.TRANSFORM_PRECISION
+
+        return tuple([
+            round(coefficient * precision) / precision
+            for coefficient in (
+                cos * scale,
+                sin * scale,
+                (cos * dx + sin * dy + self.size) * scale,
+                -sin * scale,
+                cos * scale,
+                (-sin * dx + cos * dy + self.size) * scale,
+            )
+        ])
+
+    def _render_transform(self):
+        """
+        Draws squares on a small grid image and maps it onto an image
+        of the final size by a single affine transform, which combines
+        rotation, crop and upscaling of the classic engine.
+
+        Without borders every square is a pixel of the grid and the grid is
+        upscaled with NEAREST resampling, so squares keep sharp edges.
+        Borders need real pixels, so with borders the grid is drawn in the
+        scale of the classic canvas and resampled with BICUBIC.
+        """
+
+        square_side_length, squares_count = self._get_squares_layout()
+        cell = square_side_length if self.border_size else 1
+        resample = Image.BICUBIC if self.border_size else Image.NEAREST
+
+        squares_colors = self._generate_squares_colors(squares_count)
+
+        with span('draw_squares'):
+            grid, fills = self._new_canvas(
+                tuple([squares_count * cell]) * 2,
+                squares_colors,
+            )
+            self._draw_squares(grid, cell, squares_colors, fills)
+
+        with span('transform'):
+            img = grid.transform(
+                size=tuple([self.size]) * 2,
+                method=Image.AFFINE,
+                data=self.get_transform_matrix(cell / square_side_length),
+                resample=resample,
+                fillcolor=0 if fills else parse_color(self.border_color),
+            )
+            self.release_canvas(grid)
+
+        return img
+
+    def _render_numpy(self):
+        """
+        Renders squares by pyavagen.vectorized.
+        In palette mode renders by the transform engine, which samples
+        squares the same way.
+        """
+
+        from pyavagen import vectorized
+
+        if self.is_palette_mode():
+            return self._render_transform()
+
+        if not vectorized.is_available():
+            return self._render_classic()
+
+        with span('numpy'):
+            return Image.fromarray(
+                vectorized.render_squares([self])[0],
+                'RGB',
+            )
+
+    def _render_squares(self):
+        """Renders squares by render_engine."""
+
+        if self.render_engine == self.RENDER_ENGINE_TRANSFORM:
+            return self._render_transform()
+
+        if self.render_engine == self.RENDER_ENGINE_NUMPY:
+            return self._render_numpy()
+
+        return self._render_classic()
+
+    def get_svg_squares(self):
+        """
+        Returns SVG elements of squares on the canvas twice the size,
+        which is rotated and shifted to the crop offset like the classic
+        engine does. Blur is an feGaussianBlur filter.
+        """
+
+        size2x = self.size * 2
+        square_side_length, squares_count = self._get_squares_layout()
+        squares_colors = self._generate_squares_colors(squares_count)
+        x0, y0 = self._get_crop_offset()
+        elements = []
+        attributes = ''
+
+        if self.blur_radius:
+            blur_id = 'pyavagen-blur-{radius}'.format(radius=self.blur_radius)
+            elements.append(
+                '<defs><filter id="{id}"><feGaussianBlur stdDeviation='
+                '"{radius}"/></filter></defs>'.format(
+                    id=blur_id,
+                    radius=self.blur_radius,
+                )
+            )
+            attributes = ' filter="url(#{id})"'.format(id=blur_id)
+
+        # PIL rotates counterclockwise, SVG rotates clockwise.
+        elements.append(
+            '<g{attributes}><g transform="translate({x} {y}) '
+            'rotate({angle} {size} {size})">'.format(
+                attributes=attributes,
+                x=round(-x0, 2),
+                y=round(-y0, 2),
+                angle=-self.rotate,
+                size=self.size,
+            )
+        )
+        elements.append(
+            '<rect width="{size}" height="{size}" fill="{color}"/>'.format(
+                size=size2x,
+                color=get_hex_color(parse_color(self.border_color)),
+            )
+        )
+
+        for i in range(squares_count):
+            for j in range(squares_count):
+                elements.append(
+                    '<rect x="{x}" y="{y}" width="{side}" height="{side}" '
+                    'fill="{color}"/>'.format(
+                        x=i * square_side_length + self.border_size,
+                        y=j * square_side_length + self.border_size,
+                        side=square_side_length - 2 * self.border_size,
+                        color=get_hex_color(squares_colors[i][j]),
+                    )
+                )
+
+        elements.append('</g></g>')
+
+        return elements
+
+    def get_svg_elements(self):
+        return self.get_svg_squares()
+
+    def get_tile_boxes(self, tile_size):
+        """Returns boxes of tiles of an image by rows from top to bottom."""
+
+        return [
+            (
+                x,
+                y,
+                min(x + tile_size, self.size),
+                min(y + tile_size, self.size),
+            )
+            for y in range(0, self.size, tile_size)
+            for x in range(0, self.size, tile_size)
+        ]
+
+    def _get_blur_margin(self):
+        """
+        Returns a margin of tiles that covers pixels read by apply_blur
+        and the alignment of tiles to pixels of a downsampled image of
+        BLUR_METHOD_REDUCED.
+
+        Pillow blurs by three passes of a box blur with a radius close to
+        the blur radius, so pixels are read no farther than three radiuses.
+        """
+
+        if not self.blur_radius:
+            return 0, 1
+
+        factor = self.blur_radius // self.BLUR_REDUCED_RADIUS
+
+        if self.blur_method == self.BLUR_METHOD_EXACT or factor < 2:
+            return 3 * self.blur_radius + 4, 1
+
+        # The downsampled image is upsampled with BILINEAR resampling,
+        # which reads one more pixel.
+        return (3 * math.ceil(self.blur_radius / factor) + 5) * factor, factor
+
+    def _blur_tile(self, tile, outer_box, box):
+        """
+        Blurs a tile of outer_box like apply_blur blurs the whole image
+        and returns its part of box.
+        """
+
+        x0, y0, x1, y1 = box
+        outer_x0, outer_y0 = outer_box[:2]
+        factor = self.blur_radius // self.BLUR_REDUCED_RADIUS
+
+        with span('blur'):
+            if self.blur_method == self.BLUR_METHOD_EXACT or factor < 2:
+                return tile.filter(
+                    ImageFilter.GaussianBlur(self.blur_radius)
+                ).crop((
+                    x0 - outer_x0,
+                    y0 - outer_y0,
+                    x1 - outer_x0,
+                    y1 - outer_y0,
+                ))
+
+            reduced_tile = tile.reduce(factor).filter(
+                ImageFilter.GaussianBlur(self.blur_radius / factor)
+            )
+            # apply_blur upsamples ceil(size / factor) pixels to size,
+            # so pixels of the tile are sampled in the same scale.
+            scale = -(-self.size // factor) / self.size
+
+            return reduced_tile.resize(
+                (x1 - x0, y1 - y0),
+                resample=Image.BILINEAR,
+                box=(
+                    x0 * scale - outer_x0 / factor,
+                    y0 * scale - outer_y0 / factor,
+                    x1 * scale - outer_x0 / factor,
+                    y1 * scale - outer_y0 / factor,
+                ),
+            )
+
+    def _render_tile(self, box, matrix, grid_size, cell, resample,
+                     squares_colors, grid=None, fills=None):
+        """
+        Returns an image of a box of the image rendered like the transform
+        engine does by passed matrix. If grid is None that only a part
+        of the grid of squares under the box is drawn.
+        """
+
+        x0, y0, x1, y1 = box
+        a, b, c, d, e, f = matrix
+        c, f = c + a * x0 + b * y0, f + d * x0 + e * y0
+        width, height = x1 - x0, y1 - y0
+        offset_x = offset_y = 0
+
+        if grid is None:
+            xs = [a * x + b * y + c for x in (0, width) for y in (0, height)]
+            ys = [d * x + e * y + f for x in (0, width) for y in (0, height)]
+            offset_x = max(0, int(math.floor(min(xs))) - self.TILE_GRID_MARGIN)
+            offset_y = max(0, int(math.floor(min(ys))) - self.TILE_GRID_MARGIN)
+            part_size = (
+                max(1, min(
+                    grid_size,
+                    int(math.ceil(max(xs))) + self.TILE_GRID_MARGIN,
+                ) - offset_x),
+                max(1, min(
+                    grid_size,
+                    int(math.ceil(max(ys))) + self.TILE_GRID_MARGIN,
+                ) - offset_y),
+            )
+            grid, fills = self._new_canvas(part_size, squares_colors)
+            self._draw_squares(
+                grid, cell, squares_colors, fills, (offset_x, offset_y)
+            )
+            part = grid
+        else:
+            part = None
+
+        img = grid.transform(
+            size=(width, height),
+            method=Image.AFFINE,
+            data=(a, b, c - offset_x, d, e, f - offset_y),
+            resample=resample,
+            fillcolor=0 if fills else parse_color(self.border_color),
+        )
+
+        if part is not None:
+            self.release_canvas(part)
+
+        return img
+
+    def generate_tiles(self, tile_size=None):
+        """Renders an image tile by tile.
+
+        Yields (box, image of the box) by rows of tiles from top to bottom.
+        Squares are sampled like the transform engine does, so tiles make
+        the same image as the transform engine with the same seed, except
+        the reduced blur, which can differ by a couple of levels.
+        Tiles are blurred with margins, so they join without seams.
+
+        Args:
+            tile_size: size of tiles. tile_size of the avatar or
+                TILE_SIZE_DEFAULT by default.
+
+        """
+
+        tile_size = tile_size or self.tile_size or self.TILE_SIZE_DEFAULT
+        square_side_length, squares_count = self._get_squares_layout()
+        cell = square_side_length if self.border_size else 1
+        resample = Image.BICUBIC if self.border_size else Image.NEAREST
+        squares_colors = self._generate_squares_colors(squares_count)
+        matrix = self.get_transform_matrix(cell / square_side_length)
+        grid = fills = None
+
+        # Without borders the grid has a pixel per square, so it's small
+        # enough to be drawn once.
+        if not self.border_size:
+            grid, fills = self._new_canvas(
+                (squares_count, squares_count),
+                squares_colors,
+            )
+            self._draw_squares(grid, cell, squares_colors, fills)
+
+        margin, alignment = self._get_blur_margin()
+
+        try:
+            for box in self.get_tile_boxes(tile_size):
+                x0, y0, x1, y1 = box
+                outer_box = (
+                    max(0, (x0 - margin) // alignment * alignment),
+                    max(0, (y0 - margin) // alignment * alignment),
+                    min(self.size, -(-(x1 + margin) // alignment) * alignment),
+                    min(self.size, -(-(y1 + margin) // alignment) * alignment),
+                )
+
+                with span('tile'):
+                    tile = self._render_tile(
+                        outer_box,
+                        matrix,
+                        squares_count * cell,
+                        cell,
+                        resample,
+                        squares_colors,
+                        grid,
+                        fills,
+                    )
+
+                    if margin:
+                        tile = self._blur_tile(tile, outer_box, box)
+
+                yield box, tile
+        finally:
+            if grid is not None:
+                self.release_canvas(grid)
+
+    def _render_tiled(self):
+        """Pastes tiles of generate_tiles on an image."""
+
+        img = None
+
+        for box, tile in self.generate_tiles():
+            if img is None:
+                img = self.acquire_canvas(tile.mode, (self.size, self.size))
+
+                if tile.mode == 'P':
+                    img.putpalette(tile.getpalette())
+
+            img.paste(tile, box[:2])
+
+        return img
+
+    def generate_strips(self, tile_size=None):
+        """
+        Renders an image by generate_tiles and yields horizontal strips
+        of rows of tiles from top to bottom.
+        """
+
+        strip = None
+
+        for (x0, y0, x1, y1), tile in self.generate_tiles(tile_size):
+            if x0 == 0:
+                if strip is not None:
+                    yield strip
+
+                strip = self.acquire_canvas(tile.mode, (self.size, y1 - y0))
+
+                if tile.mode == 'P':
+                    strip.putpalette(tile.getpalette())
+
+            strip.paste(tile, (x0, 0))
+
+        yield strip
+
+    def generate_to(self, fileobj, format='png', quality=None, optimize=None,
+                    **options):
+        """
+        Generates an image, writes it encoded to passed file object and
+        returns the number of written bytes.
+
+        If tile_size is set that PNG images are encoded by rows of tiles,
+        so the whole image is never kept in memory. Options which
+        write_png doesn't support, e.g. dpi, are passed to Pillow with
+        the whole image.
+        """
+
+        if (
+            not self.tile_size or
+            get_format(format) != 'png' or
+            optimize or
+            set(options) - {'compress_level'}
+        ):
+            return super(SquareAvatar, self).generate_to(
+                fileobj, format, quality, optimize, **options
+            )
+
+        with span('generate_to', self):
+            return write_png(
+                fileobj,
+                (self.size, self.size),
+                self.generate_strips(),
+                **options
+            )
+
+    def _render_background(self):
+        """Renders blurred squares."""
+
+        if self.tile_size:
+            return self._render_tiled()
 
-        self.img = self.img.filter(ImageFilter.GaussianBlur(self.blur_radius))
+        return self.apply_blur(self._render_squares())
+
+    def generate(self):
+        with span('generate', self):
+            self.img = self._render_background()
 
         return self.img
 
+    def apply_blur(self, img):
+        """Returns a blurred image by blur_method."""
+
+        if not self.blur_radius:
+            return img
+
+        factor = self.blur_radius // self.BLUR_REDUCED_RADIUS
+
+        with span('blur'):
+            if self.blur_method == self.BLUR_METHOD_EXACT or factor < 2:
+                return img.filter(ImageFilter.GaussianBlur(self.blur_radius))
+
+            reduced_img = img.reduce(factor).filter(
+                ImageFilter.GaussianBlur(self.blur_radius / factor)
+            )
+
+            return reduced_img.resize(img.size, resample=Image.BILINEAR)
+
 
 class CharAvatar(ColorListMixin, BaseAvatar):
     """Draws a character on background with single color.
@@ -271,6 +1234,9 @@ class CharAvatar(ColorListMixin, BaseAvatar):
     FONT_COLOR_DEFAULT = 'white'
     FONT_SIZE_MIN = 1
     FONT_OUTLINE_DEFAULT = False
+    FONT_OUTLINE_COLOR = (0, 0, 0)
+    TEXT_PALETTE_LEVELS = 16
+    REQUIRED_FIELDS = BaseAvatar.REQUIRED_FIELDS + ('string',)
 
     string = AvatarField(
         validators=[
@@ -311,19 +1277,32 @@ class CharAvatar(ColorListMixin, BaseAvatar):
 
     def __init__(self, string, font=None, font_color=None, font_outline=None,
                  background_color=None, font_size=None, *args, **kwargs):
-        self.background_color = background_color
-        super(CharAvatar, self).__init__(*args, **kwargs)
-        self.font_size = font_size if font_size else int(0.6 * self.size)
+        self.string = string
         self.font = font
+        self.background_color = background_color
         self.font_color = font_color
+        self.font_size = font_size
         self.font_outline = font_outline
-        self.string = string
+        super(CharAvatar, self).__init__(*args, **kwargs)
+
+    def prepare(self):
+        super(CharAvatar, self).prepare()
+
+        if not self.font_size:
+            self.font_size = int(0.6 * self.size)
 
     def get_initial_img(self):
         b_color = self.background_color
-        b_color = b_color if b_color else self.get_random_color()
+        b_color = (
+            parse_color(b_color) if b_color else self.get_random_rgb_color()
+        )
+
+        if self.palette_mode:
+            img = self.acquire_canvas(mode='P', size=tuple([self.size]) * 2)
+            img.putpalette(b_color)
+            return img
 
-        img = Image.new(
+        img = self.acquire_canvas(
             mode='RGB',
             size=tuple([self.size]) * 2,
             color=b_color,
@@ -343,33 +1322,304 @@ class CharAvatar(ColorListMixin, BaseAvatar):
 
         return ''.join([s[0] for s in self.string.split()[:2]]).upper()
 
-    def generate(self):
-        draw = ImageDraw.Draw(self.img)
-        img_width, img_height = self.img.size
-        font = ImageFont.truetype(font=self.font, size=self.font_size)
-        text = self.get_text_for_draw()
-        text_width, text_height = font.getsize(text)
-        text_height_offset = font.getoffset(text)[1]
+    def generate_background(self):
+        """Returns an image of background for draw_text."""
+
+        return self.get_initial_img()
+
+    def get_text_layout(self, img_size, font_size):
+        """
+        Returns GlyphMask of a text from get_text_for_draw and integer
+        coordinates of the text in the center of an image of passed size.
+        The mask is rendered at the fractional part of the position.
+        """
+
+        img_width, img_height = img_size
+
+        with span('glyph'):
+            glyph = glyph_cache.get(
+                self.font,
+                font_size,
+                self.get_text_for_draw(),
+                self.font_outline,
+            )
+
+        text_width, text_height = glyph.text_size
+        text_height_offset = glyph.text_offset[1]
 
         x, y = (
             (img_width - text_width) / 2,
             ((img_height - text_height) / 2) - text_height_offset / 2
         )
+        left, top = math.floor(x), math.floor(y)
+
+        if x != left or y != top:
+            with span('glyph'):
+                glyph = glyph_cache.get(
+                    self.font,
+                    font_size,
+                    self.get_text_for_draw(),
+                    self.font_outline,
+                    (x - left, y - top),
+                )
+
+        return glyph, left, top
+
+    def draw_text(self, img, font_size, position=(0, 0), size=None):
+        """Draws a text from get_text_for_draw in the center of an image.
+
+        position and size are the upper left corner and the size of
+        a square part of the image where the text is centered.
+        The whole image by default.
+
+        """
+
+        glyph, x, y = self.get_text_layout(
+            (size, size) if size else img.size,
+            font_size,
+        )
+        box = (
+            position[0] + x - glyph.padding,
+            position[1] + y - glyph.padding,
+        )
+
+        with span('paste_text'):
+            if img.mode == 'P':
+                self._paste_text_indexed(img, box, glyph)
+                return
+
+            if glyph.outline_mask:
+                img.paste(self.FONT_OUTLINE_COLOR, box, glyph.outline_mask)
+
+            img.paste(parse_color(self.font_color), box, glyph.mask)
+
+    def _paste_text_indexed(self, img, box, glyph):
+        """
+        Pastes a text on a 'P' image with a single background color.
+
+        Antialiased edges of the text are quantized to TEXT_PALETTE_LEVELS
+        colors between the background and the font colors (or the outline
+        color if it's drawn), which are appended to the palette.
+        """
+
+        background_color = tuple(img.getpalette()[:3])
+        font_color = parse_color(self.font_color)
+        levels = self.TEXT_PALETTE_LEVELS
+        colors = [background_color]
+        layers = []
+
+        if glyph.outline_mask:
+            layers.append(
+                (glyph.outline_mask, background_color, self.FONT_OUTLINE_COLOR)
+            )
+            layers.append((glyph.mask, self.FONT_OUTLINE_COLOR, font_color))
+        else:
+            layers.append((glyph.mask, background_color, font_color))
+
+        for mask, start_color, end_color in layers:
+            offset = len(colors)
+            colors.extend([
+                blend_colors(start_color, end_color, (level + 1) / levels)
+                for level in range(levels)
+            ])
+            indexes = mask.point([0] + [
+                offset + value * levels // 256 for value in range(1, 256)
+            ])
+            img.paste(indexes, box, mask.point([0] + [255] * 255))
+
+        img.putpalette([channel for color in colors for channel in color])
+
+    def render_into(self, img, position):
+        """
+        Fills the background and draws a text directly on an image.
+        A text that doesn't fit the avatar is drawn on a separate image,
+        which crops it.
+        """
+
+        glyph, x, y = self.get_text_layout(
+            (self.size, self.size),
+            self.font_size,
+        )
+        width, height = glyph.mask.size
+
+        if (
+            x - glyph.padding < 0 or
+            y - glyph.padding < 0 or
+            x - glyph.padding + width > self.size or
+            y - glyph.padding + height > self.size
+        ):
+            return super(CharAvatar, self).render_into(img, position)
+
+        b_color = self.background_color
+        b_color = (
+            parse_color(b_color) if b_color else self.get_random_rgb_color()
+        )
+
+        with span('render_into', self):
+            img.paste(
+                b_color,
+                position + (position[0] + self.size, position[1] + self.size),
+            )
+            self.draw_text(img, self.font_size, position, self.size)
+
+    def get_svg_background(self):
+        """Returns SVG elements of background for get_svg_text."""
+
+        b_color = self.background_color
+        b_color = (
+            parse_color(b_color) if b_color else self.get_random_rgb_color()
+        )
+
+        return ['<rect width="{size}" height="{size}" fill="{color}"/>'.format(
+            size=self.size,
+            color=get_hex_color(b_color),
+        )]
+
+    def get_svg_text(self):
+        """
+        Returns SVG text element placed like draw_text places a text.
+        The font is referenced by its family name, so a client uses
+        a generic sans-serif font if the font isn't installed.
+        """
+
+        # xml.sax imports urllib.request, which is slow to import.
+        from xml.sax.saxutils import escape, quoteattr
+
+        _, x, y = self.get_text_layout((self.size, self.size), self.font_size)
+        font = font_cache.get(self.font, self.font_size)
+        ascent = font.getmetrics()[0]
+        outline = ''
 
         if self.font_outline:
-            for xy_offset in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
-                draw.text(xy=xy_offset, text=text, font=font, fill='black')
+            # Outline of draw_text is a pixel wide, half of a stroke
+            # is hidden under the text.
+            outline = (
+                ' stroke="{color}" stroke-width="2" paint-order="stroke"'
+            ).format(color=get_hex_color(self.FONT_OUTLINE_COLOR))
+
+        return (
+            '<text x="{x}" y="{y}" font-family={family} font-size="{size}" '
+            'fill="{color}"{outline}>{text}</text>'.format(
+                x=x,
+                y=y + ascent,
+                family=quoteattr(font.getname()[0] + ', sans-serif'),
+                size=self.font_size,
+                color=get_hex_color(parse_color(self.font_color)),
+                outline=outline,
+                text=escape(self.get_text_for_draw()),
+            )
+        )
 
-        draw.text(xy=(x, y), text=text, font=font, fill=self.font_color)
+    def get_svg_elements(self):
+        return self.get_svg_background() + [self.get_svg_text()]
+
+    def generate(self):
+        with span('generate', self):
+            with span('background'):
+                self.img = self.generate_background()
+
+            self.draw_text(self.img, self.font_size)
 
         return self.img
 
+    def generate_sizes(self, sizes, redraw_text=False):
+        """Generates an image once and returns it in several sizes.
+
+        Args:
+            sizes: list of sizes.
+            redraw_text: if it's True that only a background is downsampled
+                and a text is drawn on every size in a proportional font
+                size, so chars stay crisp at small sizes.
+
+        """
+
+        if not redraw_text:
+            return super(CharAvatar, self).generate_sizes(sizes)
+
+        self.check_sizes(sizes)
+        background = self.generate_background()
+        # A background in 'P' mode has a single color.
+        backgrounds = self.resize_to_sizes(
+            background,
+            sizes,
+            resample=(
+                Image.NEAREST if background.mode == 'P' else Image.LANCZOS
+            ),
+        )
+        images = {}
+
+        for size, background in backgrounds.items():
+            img = background.copy()
+            font_size = max(
+                self.FONT_SIZE_MIN,
+                int(round(self.font_size * size / self.size)),
+            )
+            self.draw_text(img, font_size)
+            images[size] = img
+
+        return images
+
 
 class CharSquareAvatar(SquareAvatar, CharAvatar):
-    """Draws a character on background with squares with different colors."""
+    """Draws a character on background with squares with different colors.
 
-    def generate(self):
-        self.img = SquareAvatar.generate(self)
-        self.img = CharAvatar.generate(self)
+    Text is drawn over squares of several colors, so images are always
+    rendered in RGB mode and palette_mode is ignored.
+
+    If background_bank is set to pyavagen.backgrounds.BackgroundBank
+    that backgrounds are taken from it by a hash of the string and only
+    the text is drawn, seed doesn't change backgrounds then.
+
+    """
+
+    background_bank = None
+
+    def prepare(self):
+        # The key is taken before random arguments of squares are set.
+        self.background_key = (
+            self.background_bank.get_key(self.__dict__)
+            if self.background_bank is not None
+            else None
+        )
+        super(CharSquareAvatar, self).prepare()
+
+    def is_palette_mode(self):
+        return False
+
+    # A text is drawn over the whole background, so images aren't
+    # encoded by rows of tiles.
+    generate_to = BaseAvatar.generate_to
+
+    def get_svg_background(self):
+        if self.background_key is not None:
+            # Squares of the variant of the bank, which images have.
+            return self.background_bank.get_avatar(
+                self.background_key,
+                self.background_bank.get_index(self.string),
+            ).get_svg_squares()
+
+        return self.get_svg_squares()
+
+    def render_into(self, img, position):
+        # Squares are rendered on a separate image, so the whole avatar is.
+        return BaseAvatar.render_into(self, img, position)
+
+    def get_svg_elements(self):
+        return CharAvatar.get_svg_elements(self)
+
+    def generate_background(self):
+        if self.background_key is not None:
+            self.img = self.background_bank.get(
+                self.background_key,
+                self.string,
+            )
+            return self.img
+
+        # Squares are rendered as SquareAvatar.generate does, but without
+        # its span, so they are timed as the background stage.
+        self.img = self._render_background()
 
         return self.img
+
+    def generate(self):
+        return CharAvatar.generate(self)
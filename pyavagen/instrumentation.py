@@ -0,0 +1,214 @@
+"""Timing of stages of rendering.
+
+Generators wrap stages of rendering, e.g. drawing of squares, rotation,
+blur, font loading or drawing of text, in named spans. When a span ends
+every registered hook is called with it:
+
+    def hook(span):
+        statsd.timing('avatar.' + span.path, span.duration * 1000)
+
+    instrumentation.add_hook(hook)
+
+Spans are nested, span.path is a path of names of a span and its parents,
+e.g. 'generate_bytes/generate/blur'. Without hooks spans do nothing.
+With a sample rate below 1 only a part of renders is timed, a render is
+sampled or skipped with all its spans.
+
+"""
+
+import logging
+import random
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+_hooks = []
+_sample_rate = 1.0
+_local = threading.local()
+
+
+class Span(object):
+    """Timed stage of rendering.
+
+    name: name of the stage.
+    avatar: the avatar object or None.
+    parent: the parent span or None.
+    duration: duration in seconds, it's set when the span ends.
+    error: an exception raised in the stage or None.
+
+    """
+
+    __slots__ = ('name', 'avatar', 'parent', 'start', 'duration', 'error')
+
+    def __init__(self, name, avatar=None, parent=None):
+        self.name = name
+        self.avatar = avatar
+        self.parent = parent
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    @property
+    def path(self):
+        """Names of the span and its parents separated by '/'."""
+
+        names = []
+        span = self
+
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+
+        return '/'.join(reversed(names))
+
+    def __enter__(self):
+        _local.span = self
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        self.error = exc_value
+        _local.span = self.parent
+
+        for hook in list(_hooks):
+            try:
+                hook(self)
+            except Exception:
+                logger.exception('Instrumentation hook %r failed.', hook)
+
+
+class NullSpan(object):
+    """Span that does nothing. It's used when there are no hooks."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class SkippedSpan(object):
+    """Root span of a render that isn't sampled, its spans do nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        _local.span = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.span = None
+
+
+NULL_SPAN = NullSpan()
+SKIPPED_SPAN = SkippedSpan()
+
+
+def span(name, avatar=None):
+    """Returns a context manager timing a stage of rendering.
+
+    Args:
+        name: name of the stage.
+        avatar: the avatar object. Nested spans take it from a parent.
+
+    """
+
+    if not _hooks:
+        return NULL_SPAN
+
+    parent = getattr(_local, 'span', None)
+
+    if parent is None:
+        if _sample_rate < 1.0 and random.random() >= _sample_rate:
+            return SKIPPED_SPAN
+    elif parent is SKIPPED_SPAN:
+        return NULL_SPAN
+    elif avatar is None:
+        avatar = parent.avatar
+
+    return Span(name, avatar, parent)
+
+
+def add_hook(hook):
+    """Registers a callable that is called with every ended Span."""
+
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """Unregisters a hook."""
+
+    _hooks.remove(hook)
+
+
+def clear_hooks():
+    """Unregisters all hooks."""
+
+    del _hooks[:]
+
+
+def set_sample_rate(rate):
+    """Sets a part of renders that are timed, from 0 to 1. Default 1."""
+
+    global _sample_rate
+
+    if not 0 <= rate <= 1:
+        raise ValueError('rate must be from 0 to 1')
+
+    _sample_rate = rate
+
+
+class StageTimer(object):
+    """Hook that aggregates durations of spans by paths.
+
+        timer = StageTimer()
+        instrumentation.add_hook(timer)
+        ...
+        timer.stats()  # {'generate/blur': {'count': 1, ...}, ...}
+
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        path = span.path
+        duration = span.duration
+
+        with self._lock:
+            stats = self._stats.get(path)
+
+            if stats is None:
+                stats = self._stats[path] = {
+                    'count': 0,
+                    'total': 0.0,
+                    'max': 0.0,
+                    'errors': 0,
+                }
+
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+            stats['errors'] += span.error is not None
+
+    def stats(self):
+        """
+        Returns a dict of paths and dicts with the count of spans, total
+        and max durations in seconds and the count of errors.
+        """
+
+        with self._lock:
+            return dict([
+                (path, dict(stats)) for path, stats in self._stats.items()
+            ])
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
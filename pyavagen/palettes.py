@@ -0,0 +1,57 @@
+from pyavagen.validators import parse_color
+
+
+class Palette(tuple):
+    """Immutable list of colors.
+
+    Colors are resolved to RGB tuples once, on first access to rgb.
+    Palettes can be concatenated with lists and tuples of colors like
+    lists, the result is a new palette.
+
+    Args:
+        colors: list of color strings.
+
+    """
+
+    @classmethod
+    def from_colors(cls, colors):
+        """Returns passed colors if it's a Palette else a new Palette."""
+
+        return colors if isinstance(colors, cls) else cls(colors)
+
+    def __add__(self, other):
+        if not isinstance(other, (list, tuple)):
+            return NotImplemented
+
+        return type(self)(tuple(self) + tuple(other))
+
+    def __radd__(self, other):
+        if not isinstance(other, (list, tuple)):
+            return NotImplemented
+
+        return type(self)(tuple(other) + tuple(self))
+
+    @property
+    def rgb(self):
+        """Tuple of RGB tuples of colors."""
+
+        try:
+            return self._rgb
+        except AttributeError:
+            self._rgb = tuple([parse_color(color) for color in self])
+            return self._rgb
+
+
+COLOR_LIST_FLAT = Palette([
+    '#1abc9c', '#2ecc71', '#3498db', '#9b59b6', '#34495e',
+    '#16a085', '#27ae60', '#2980b9', '#8e44ad', '#2c3e50',
+    '#f1c40f', '#e67e22', '#e74c3c', '#ecf0f1', '#95a5a6',
+    '#f39c12', '#d35400', '#c0392b', '#bdc3c7', '#7f8c8d',
+])
+
+COLOR_LIST_MATERIAL = Palette([
+    '#D32F2F', '#C2185B', '#7B1FA2', '#512DA8', '#303F9F',
+    '#1976D2', '#0288D1', '#0097A7', '#00796B', '#388E3C',
+    '#689F38', '#AFB42B', '#FBC02D', '#FFA000', '#F57C00',
+    '#E64A19', '#5D4037', '#616161', '#455A64', '#333333',
+])
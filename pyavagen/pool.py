@@ -0,0 +1,139 @@
+import threading
+
+from PIL import Image
+
+
+class CanvasPool(object):
+    """Bounded thread-safe pool of reusable images.
+
+    Images are kept by (mode, size). A borrowed image is filled with
+    a passed color, so it looks like a new one. If retained images
+    exceed max_bytes that the least recently released images are dropped.
+
+    Avatars borrow canvases from a pool set to the canvas_pool class
+    attribute of BaseAvatar or of an avatar class:
+
+        BaseAvatar.canvas_pool = CanvasPool()
+
+    Args:
+        max_bytes: maximum total size of retained images in bytes.
+
+    """
+
+    MAX_BYTES_DEFAULT = 64 * 1024 * 1024
+    # Pillow stores every pixel of multiband images in 4 bytes.
+    MODE_BYTES = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2}
+    MODE_BYTES_DEFAULT = 4
+
+    def __init__(self, max_bytes=MAX_BYTES_DEFAULT):
+        if max_bytes < 0:
+            raise ValueError('max_bytes must not be less 0')
+
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.releases = 0
+        self.discards = 0
+        self._size = 0
+        # Lists of (release number, image) by (mode, size).
+        self._images = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum([len(images) for images in self._images.values()])
+
+    def get_nbytes(self, mode, size):
+        """Returns the size of pixels of an image in bytes."""
+
+        width, height = size
+        bytes_per_pixel = self.MODE_BYTES.get(mode, self.MODE_BYTES_DEFAULT)
+
+        return width * height * bytes_per_pixel
+
+    def acquire(self, mode, size, color=0):
+        """
+        Returns an image of passed mode and size filled with color.
+        The image is taken from the pool or created.
+        """
+
+        key = (mode, tuple(size))
+
+        with self._lock:
+            images = self._images.get(key)
+            img = images.pop()[1] if images else None
+
+            if img is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._size -= self.get_nbytes(*key)
+
+                if not images:
+                    del self._images[key]
+
+        if img is None:
+            return Image.new(mode=mode, size=key[1], color=color)
+
+        img.info.clear()
+        img.paste(color, (0, 0) + key[1])
+
+        return img
+
+    def release(self, img):
+        """
+        Returns an image to the pool. The image must not be used after that.
+        """
+
+        key = (img.mode, img.size)
+        nbytes = self.get_nbytes(*key)
+
+        with self._lock:
+            self.releases += 1
+
+            if nbytes > self.max_bytes:
+                self.discards += 1
+                return
+
+            self._images.setdefault(key, []).append((self.releases, img))
+            self._size += nbytes
+
+            while self._size > self.max_bytes:
+                oldest_key = min(
+                    self._images,
+                    key=lambda k: self._images[k][0][0],
+                )
+                images = self._images[oldest_key]
+                images.pop(0)
+                self._size -= self.get_nbytes(*oldest_key)
+                self.discards += 1
+
+                if not images:
+                    del self._images[oldest_key]
+
+    def clear(self):
+        """Drops all retained images and resets counters."""
+
+        with self._lock:
+            self._images.clear()
+            self._size = 0
+            self.hits = self.misses = self.releases = self.discards = 0
+
+    def stats(self):
+        """
+        Returns a dict with counters, the reuse rate of acquired images and
+        the current size of retained images.
+        """
+
+        with self._lock:
+            acquires = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'releases': self.releases,
+                'discards': self.discards,
+                'reuse_rate': self.hits / acquires if acquires else 0.0,
+                'size': self._size,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,482 @@
+"""WSGI application serving avatars.
+
+    GET /avatar/<type>/<string>?size=128&fmt=webp&font_outline=true
+
+Query parameters are arguments of avatars, fmt is an image format.
+string is also a seed, unless seed is passed, so the same URL always
+gives the same image. Run a development server:
+
+    python -m pyavagen.server --port 8000
+
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import pyavagen
+from pyavagen.utils import LIST_SEPARATOR, get_format, parse_argument
+from pyavagen.version import __version__
+
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+    'svg': 'image/svg+xml',
+}
+# Arguments that can be passed in a query string. font is a path of a file
+# on the server, so it isn't accepted from clients.
+QUERY_ARGUMENTS = (
+    'size',
+    'seed',
+    'background_color',
+    'font_color',
+    'font_size',
+    'font_outline',
+    'color_list',
+    'palette_mode',
+    'squares_on_axis',
+    'blur_radius',
+    'blur_method',
+    'rotate',
+    'border_size',
+    'border_color',
+)
+# Maximum values of arguments relative to the size of an avatar, larger
+# values make renders slow or fail.
+SIZE_RATIO_LIMITS = {
+    'squares_on_axis': 1,
+    'font_size': 2,
+    'blur_radius': 1,
+    'border_size': 1,
+}
+# Arguments which must be positive. Validators of fields skip zero values,
+# which fail renders.
+POSITIVE_ARGUMENTS = ('size', 'squares_on_axis', 'font_size')
+FORMAT_PARAMETER = 'fmt'
+
+
+class HTTPError(Exception):
+    """Error that is sent to a client with a status and a message."""
+
+    def __init__(self, status, message):
+        super(HTTPError, self).__init__(message)
+        self.status = status
+
+
+class ResponseCache(object):
+    """Thread-safe LRU cache of encoded images bounded by total size.
+
+    Args:
+        max_bytes: maximum total size of cached images in bytes.
+
+    """
+
+    MAX_BYTES_DEFAULT = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes=MAX_BYTES_DEFAULT):
+        if max_bytes < 0:
+            raise ValueError('max_bytes must not be less 0')
+
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        """Returns cached bytes of a key or None."""
+
+        with self._lock:
+            data = self._values.get(key)
+
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+
+            return data
+
+    def set(self, key, data):
+        """Caches bytes of a key, removing the least recently used ones."""
+
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            old_data = self._values.pop(key, None)
+
+            if old_data is not None:
+                self._size -= len(old_data)
+
+            self._values[key] = data
+            self._size += len(data)
+
+            while self._size > self.max_bytes:
+                _, evicted = self._values.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        """Removes all values from the cache and resets counters."""
+
+        with self._lock:
+            self._values.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns a dict with hits, misses and the current size."""
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def render(avatar_type, kwargs, format):
+    """Renders an avatar and returns it encoded to passed format.
+
+    It's a module function, so it can be run in a process pool.
+
+    """
+
+    return pyavagen.Avatar(avatar_type, **kwargs).generate_bytes(format)
+
+
+class AvatarApplication(object):
+    """WSGI application serving avatars.
+
+    Responses have an ETag made from the avatar arguments, so a request
+    with a matching If-None-Match header is answered with 304 without
+    rendering. Rendered images are kept in ResponseCache, and concurrent
+    requests of the same avatar share a single render.
+
+    Args:
+        executor: concurrent.futures executor for rendering. By default
+            a thread pool with max_workers threads.
+        max_workers: number of threads of the default executor.
+        cache: ResponseCache of images. A new one by default,
+            ResponseCache(max_bytes=0) disables caching.
+        max_age: max-age of the Cache-Control header in seconds.
+        size: size of avatars without size parameter.
+        max_size: maximum size of avatars.
+        max_squares_on_axis: maximum squares_on_axis, the time of a render
+            grows with the number of squares.
+        format: format of avatars without fmt parameter.
+        prefix: path prefix of avatar URLs.
+
+    """
+
+    MAX_WORKERS_DEFAULT = 4
+    MAX_AGE_DEFAULT = 24 * 60 * 60
+    SIZE_DEFAULT = 128
+    MAX_SIZE_DEFAULT = 1024
+    MAX_SQUARES_ON_AXIS_DEFAULT = 64
+    FORMAT_DEFAULT = 'png'
+    PREFIX_DEFAULT = '/avatar/'
+
+    def __init__(self, executor=None, max_workers=MAX_WORKERS_DEFAULT,
+                 cache=None, max_age=MAX_AGE_DEFAULT, size=SIZE_DEFAULT,
+                 max_size=MAX_SIZE_DEFAULT,
+                 max_squares_on_axis=MAX_SQUARES_ON_AXIS_DEFAULT,
+                 format=FORMAT_DEFAULT, prefix=PREFIX_DEFAULT):
+        self.executor = (
+            executor
+            if executor is not None
+            else ThreadPoolExecutor(max_workers=max_workers)
+        )
+        self.cache = cache if cache is not None else ResponseCache()
+        self.max_age = max_age
+        self.size = size
+        self.max_size = max_size
+        self.max_squares_on_axis = max_squares_on_axis
+        self.format = format
+        self.prefix = prefix
+        self.renders = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        try:
+            status, headers, body = self.handle(environ)
+        except HTTPError as e:
+            status = e.status
+            body = str(e).encode('utf-8')
+            headers = [('Content-Type', 'text/plain; charset=utf-8')]
+
+            if status.startswith('405'):
+                headers.append(('Allow', 'GET, HEAD'))
+
+        if not status.startswith('304'):
+            headers.append(('Content-Length', str(len(body))))
+
+        start_response(status, headers)
+
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return [b'']
+
+        return [body]
+
+    def parse_path(self, path):
+        """Returns (avatar type, string) of a path."""
+
+        if not path.startswith(self.prefix):
+            raise HTTPError('404 Not Found', 'Not found.')
+
+        parts = path[len(self.prefix):].split('/', 1)
+
+        if len(parts) != 2 or not parts[1]:
+            raise HTTPError('404 Not Found', 'Not found.')
+
+        avatar_type, string = parts
+
+        if avatar_type not in pyavagen.Avatar.AVATAR_MAP:
+            raise HTTPError('404 Not Found', 'Unknown avatar type.')
+
+        return avatar_type, string
+
+    def parse_query(self, query_string):
+        """Returns (kwargs of an avatar, format) of a query string."""
+
+        kwargs = {}
+        format = self.format
+
+        for name, values in parse_qs(query_string).items():
+            if name == FORMAT_PARAMETER:
+                format = get_format(values[-1])
+                continue
+
+            if name not in QUERY_ARGUMENTS:
+                raise HTTPError(
+                    '400 Bad Request',
+                    'Unknown parameter {name}.'.format(name=name),
+                )
+
+            value = LIST_SEPARATOR.join(values) if len(values) > 1 else (
+                values[0]
+            )
+
+            try:
+                kwargs[name] = parse_argument(name, value)
+            except ValueError as e:
+                raise HTTPError('400 Bad Request', str(e))
+
+        if format not in CONTENT_TYPES:
+            raise HTTPError(
+                '400 Bad Request',
+                '{name} must be one of {formats}.'.format(
+                    name=FORMAT_PARAMETER,
+                    formats=', '.join(sorted(CONTENT_TYPES)),
+                ),
+            )
+
+        return kwargs, format
+
+    def get_kwargs(self, avatar_type, string, kwargs):
+        """Returns validated kwargs of an avatar."""
+
+        avatar_class = pyavagen.Avatar.AVATAR_MAP[avatar_type]
+        kwargs = dict(kwargs)
+        kwargs.setdefault('size', self.size)
+        kwargs.setdefault('seed', string)
+
+        if 'string' in avatar_class._fields:
+            kwargs['string'] = string
+
+        self.check_limits(kwargs)
+
+        try:
+            pyavagen.AvatarTemplate(avatar_type, **kwargs)
+        except (TypeError, ValueError) as e:
+            raise HTTPError('400 Bad Request', str(e))
+
+        return kwargs
+
+    def get_limits(self, size):
+        """
+        Returns an ordered list of names and maximum values of arguments
+        of avatars of a size.
+        """
+
+        limits = [('size', self.max_size)]
+
+        for name, ratio in sorted(SIZE_RATIO_LIMITS.items()):
+            limit = int(size * ratio)
+
+            if name == 'squares_on_axis':
+                limit = min(limit, self.max_squares_on_axis)
+
+            limits.append((name, limit))
+
+        return limits
+
+    def check_limits(self, kwargs):
+        """
+        Raises HTTPError if arguments are greater than their limits or
+        positive arguments are less 1.
+        """
+
+        for name in POSITIVE_ARGUMENTS:
+            value = kwargs.get(name)
+
+            if value is not None and value < 1:
+                raise HTTPError(
+                    '400 Bad Request',
+                    '{name} must not be less 1.'.format(name=name),
+                )
+
+        for name, limit in self.get_limits(kwargs['size']):
+            value = kwargs.get(name)
+
+            if value is not None and value > limit:
+                raise HTTPError(
+                    '400 Bad Request',
+                    '{name} must not be greater {limit}.'.format(
+                        name=name,
+                        limit=limit,
+                    ),
+                )
+
+    def get_etag(self, avatar_type, kwargs, format):
+        """Returns an ETag of an avatar, which is the same for equal args."""
+
+        normalized = json.dumps(
+            [avatar_type, kwargs, format, __version__],
+            sort_keys=True,
+        )
+
+        return '"{digest}"'.format(
+            digest=hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32],
+        )
+
+    def is_not_modified(self, environ, etag):
+        """Returns True if If-None-Match header matches an ETag."""
+
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+
+        if not if_none_match:
+            return False
+
+        if if_none_match.strip() == '*':
+            return True
+
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+
+        # Comparison is weak, W/ prefixes are ignored.
+        return etag in [
+            tag[2:] if tag.startswith('W/') else tag for tag in tags
+        ]
+
+    def get_image(self, etag, avatar_type, kwargs, format):
+        """
+        Returns an encoded image from the cache or renders it in the
+        executor. Concurrent calls for the same ETag share a single render.
+        """
+
+        data = self.cache.get(etag)
+
+        if data is not None:
+            return data
+
+        with self._lock:
+            future = self._pending.get(etag)
+
+            if future is None:
+                future = self.executor.submit(
+                    render,
+                    avatar_type,
+                    kwargs,
+                    format,
+                )
+                self._pending[etag] = future
+                self.renders += 1
+                owner = True
+            else:
+                owner = False
+
+        try:
+            data = future.result()
+        except ValueError as e:
+            raise HTTPError('400 Bad Request', str(e))
+        finally:
+            if owner:
+                with self._lock:
+                    self._pending.pop(etag, None)
+
+        if owner:
+            self.cache.set(etag, data)
+
+        return data
+
+    def handle(self, environ):
+        """Returns (status, headers, body) of a request."""
+
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            raise HTTPError('405 Method Not Allowed', 'Method not allowed.')
+
+        # WSGI servers decode paths as latin-1.
+        try:
+            path = environ.get('PATH_INFO', '').encode('latin-1').decode(
+                'utf-8',
+            )
+        except UnicodeError:
+            raise HTTPError('400 Bad Request', 'Path must be UTF-8.')
+
+        avatar_type, string = self.parse_path(path)
+        kwargs, format = self.parse_query(environ.get('QUERY_STRING', ''))
+        kwargs = self.get_kwargs(avatar_type, string, kwargs)
+        etag = self.get_etag(avatar_type, kwargs, format)
+        headers = [
+            ('ETag', etag),
+            ('Cache-Control', 'public, max-age={max_age}'.format(
+                max_age=self.max_age,
+            )),
+        ]
+
+        if self.is_not_modified(environ, etag):
+            return '304 Not Modified', headers, b''
+
+        data = self.get_image(etag, avatar_type, kwargs, format)
+        headers.append(('Content-Type', CONTENT_TYPES[format]))
+
+        return '200 OK', headers, data
+
+
+def main(argv=None):
+    """Runs a development server of AvatarApplication."""
+
+    from wsgiref.simple_server import make_server
+
+    parser = argparse.ArgumentParser(
+        prog='python -m pyavagen.server',
+        description='Runs a development server of avatars.',
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    with make_server(args.host, args.port, AvatarApplication()) as server:
+        print('Serving on http://{host}:{port}{prefix}'.format(
+            host=args.host,
+            port=args.port,
+            prefix=AvatarApplication.PREFIX_DEFAULT,
+        ))
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,276 @@
-from random import randint
+import io
+import itertools
+import random
+import struct
+import zlib
 
+from PIL import Image, ImageChops
 
-def get_random_hex_color():
-    """Generates and returns a random hex color."""
 
-    color = '#' + ''.join(['{:02X}'.format(randint(0, 255)) for _ in range(3)])
+def get_random_hex_color(rng=random):
+    """Generates and returns a random hex color.
+
+    Args:
+        rng: random number generator. The random module by default.
+
+    """
+
+    color = '#' + ''.join(
+        ['{:02X}'.format(rng.randint(0, 255)) for _ in range(3)]
+    )
     return color
+
+
+def get_random_rgb_color(rng=random):
+    """Generates and returns a random color as RGB tuple.
+
+    Args:
+        rng: random number generator. The random module by default.
+
+    """
+
+    return rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)
+
+
+def get_hex_color(color):
+    """Returns a hex color of RGB tuple, e.g. '#ff0000' of (255, 0, 0)."""
+
+    return '#{:02x}{:02x}{:02x}'.format(*color)
+
+
+def blend_colors(color_a, color_b, alpha):
+    """
+    Returns RGB tuple of a color between two RGB tuples,
+    alpha is from 0 (color_a) to 1 (color_b).
+    """
+
+    return tuple([
+        int(round(a + (b - a) * alpha)) for a, b in zip(color_a, color_b)
+    ])
+
+
+# Options of encoders that are much faster than defaults of Pillow
+# at the cost of a slightly bigger output for avatars:
+# PNG is 1.7 times faster and 25% bigger, WebP is 2.5 times faster
+# and 10% bigger. JPEG defaults are already fast.
+ENCODER_OPTIONS = {
+    'png': {'compress_level': 3},
+    'webp': {'quality': 80, 'method': 2},
+    'jpeg': {'quality': 75},
+}
+
+FORMAT_ALIASES = {
+    'jpg': 'jpeg',
+}
+
+
+def get_format(format):
+    """Returns a normalized name of an image format."""
+
+    format = format.lower()
+    return FORMAT_ALIASES.get(format, format)
+
+
+def encode_image(img, format, quality=None, optimize=None, **options):
+    """Encodes an image to passed format and returns bytes.
+
+    Args:
+        img: PIL.Image.Image object.
+        format: image format, e.g. 'png', 'webp' or 'jpeg'.
+        quality: quality of lossy formats.
+        optimize: makes output smaller but encoding slower.
+        options: other options of a Pillow encoder.
+
+    """
+
+    format = get_format(format)
+    encoder_options = dict(ENCODER_OPTIONS.get(format, {}))
+
+    if quality is not None:
+        encoder_options['quality'] = quality
+
+    if optimize:
+        encoder_options['optimize'] = True
+
+        if format == 'png':
+            encoder_options.pop('compress_level', None)
+        elif format == 'webp':
+            encoder_options['method'] = 6
+
+    encoder_options.update(options)
+
+    if format == 'jpeg' and img.mode not in ('RGB', 'L', 'CMYK'):
+        img = img.convert('RGB')
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=format, **encoder_options)
+
+    return buffer.getvalue()
+
+
+SVG_TEMPLATE = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+    'viewBox="0 0 {size} {size}">{elements}</svg>'
+)
+
+
+def make_svg(size, elements):
+    """Returns an SVG document of a square image with passed elements."""
+
+    return SVG_TEMPLATE.format(size=size, elements=''.join(elements))
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_COLOR_TYPES = {'L': 0, 'RGB': 2, 'P': 3}
+# Compressed data is written in IDAT chunks of at least this size.
+PNG_CHUNK_SIZE = 64 * 1024
+
+
+def write_png_chunk(fileobj, chunk_type, data):
+    """Writes a PNG chunk and returns the number of written bytes."""
+
+    fileobj.write(struct.pack('>I', len(data)))
+    fileobj.write(chunk_type)
+    fileobj.write(data)
+    fileobj.write(struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+    return len(data) + 12
+
+
+def write_png(fileobj, size, strips,
+              compress_level=ENCODER_OPTIONS['png']['compress_level']):
+    """Encodes an image from horizontal strips to PNG.
+
+    Only a strip is kept in memory, so a big image is encoded in memory
+    proportional to the size of strips. Rows of 'L' and RGB images are
+    filtered by the Up filter of PNG, rows of 'P' images aren't filtered.
+
+    Args:
+        fileobj: file object opened for writing in binary mode.
+        size: (width, height) of the image.
+        strips: iterable of 'L', RGB or 'P' images of the image width from
+            top to bottom. 'P' strips must have the same palette.
+        compress_level: zlib compression level from 0 to 9.
+
+    Returns the number of written bytes.
+
+    """
+
+    width, height = size
+    strips = iter(strips)
+    first_strip = next(strips)
+    mode = first_strip.mode
+
+    if mode not in PNG_COLOR_TYPES:
+        raise ValueError('Mode {mode} is not supported.'.format(mode=mode))
+
+    fileobj.write(PNG_SIGNATURE)
+    written = len(PNG_SIGNATURE)
+    written += write_png_chunk(fileobj, b'IHDR', struct.pack(
+        '>IIBBBBB', width, height, 8, PNG_COLOR_TYPES[mode], 0, 0, 0,
+    ))
+
+    if mode == 'P':
+        palette = first_strip.getpalette()[:3 * 256]
+        written += write_png_chunk(fileobj, b'PLTE', bytes(palette))
+
+    compressor = zlib.compressobj(compress_level)
+    compressed = []
+    compressed_size = 0
+    previous_row = None
+
+    for strip in itertools.chain([first_strip], strips):
+        strip_width, strip_height = strip.size
+
+        if mode == 'P':
+            filter_type = b'\x00'
+            filtered = strip
+        else:
+            # The Up filter subtracts the previous row from every row,
+            # it's the difference of the strip and the strip shifted down.
+            filter_type = b'\x02'
+            shifted = Image.new(mode, strip.size)
+
+            if previous_row is not None:
+                shifted.paste(previous_row, (0, 0))
+
+            shifted.paste(
+                strip.crop((0, 0, strip_width, strip_height - 1)),
+                (0, 1),
+            )
+            filtered = ImageChops.subtract_modulo(strip, shifted)
+            previous_row = strip.crop(
+                (0, strip_height - 1, strip_width, strip_height)
+            )
+
+        raw = filtered.tobytes()
+        stride = len(raw) // strip_height
+        data = compressor.compress(b''.join([
+            filter_type + raw[i * stride:(i + 1) * stride]
+            for i in range(strip_height)
+        ]))
+
+        if data:
+            compressed.append(data)
+            compressed_size += len(data)
+
+        if compressed_size >= PNG_CHUNK_SIZE:
+            written += write_png_chunk(fileobj, b'IDAT', b''.join(compressed))
+            compressed, compressed_size = [], 0
+
+    compressed.append(compressor.flush())
+    written += write_png_chunk(fileobj, b'IDAT', b''.join(compressed))
+    written += write_png_chunk(fileobj, b'IEND', b'')
+
+    return written
+
+
+INT_ARGUMENTS = (
+    'size',
+    'font_size',
+    'blur_radius',
+    'border_size',
+    'rotate',
+    'squares_on_axis',
+    'tile_size',
+)
+BOOL_ARGUMENTS = ('font_outline', 'palette_mode')
+BOOL_VALUES = {
+    'true': True, '1': True, 'yes': True,
+    'false': False, '0': False, 'no': False,
+}
+LIST_ARGUMENTS = ('color_list',)
+LIST_SEPARATOR = ';'
+
+
+def parse_argument(name, value):
+    """
+    Converts a string value of an avatar argument from text input,
+    e.g. CSV or a query string, to the argument type. Items of lists are
+    separated by LIST_SEPARATOR. Values of other types are returned as is.
+
+    Raises ValueError if the value can't be converted.
+    """
+
+    if not isinstance(value, str):
+        return value
+
+    if name in INT_ARGUMENTS:
+        return int(value)
+
+    if name in BOOL_ARGUMENTS:
+        try:
+            return BOOL_VALUES[value.lower()]
+        except KeyError:
+            raise ValueError(
+                '{name} must be true or false.'.format(name=name)
+            )
+
+    if name in LIST_ARGUMENTS:
+        return [
+            item.strip()
+            for item in value.split(LIST_SEPARATOR)
+            if item.strip()
+        ]
+
+    return value
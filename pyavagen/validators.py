@@ -1,4 +1,31 @@
-from PIL import ImageColor
+import functools
+
+
+COLOR_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=COLOR_CACHE_SIZE)
+def parse_color(value):
+    """
+    Returns RGB tuple of a color string or an RGB(A) tuple of integers.
+    Results are memoized.
+    """
+
+    if isinstance(value, tuple) and len(value) in (3, 4) and all([
+        isinstance(c, int) and 0 <= c <= 255 for c in value
+    ]):
+        return value[:3]
+
+    if not isinstance(value, str):
+        raise ValueError(
+            'must be a color string or a tuple of 3 or 4 integers '
+            'from 0 to 255.'
+        )
+
+    # Pillow is imported on first use, so importing the package is fast.
+    from PIL import ImageColor
+
+    return ImageColor.getcolor(value, 'RGB')
 
 
 class MinValueValidator(object):
@@ -15,6 +42,15 @@ class MinValueValidator(object):
                 )
             )
 
+    def compile(self, field_name):
+        limit_value = self.limit_value
+
+        def check(value):
+            if value < limit_value:
+                self(value, field_name)
+
+        return check
+
 
 class TypeValidator(object):
 
@@ -35,14 +71,78 @@ class TypeValidator(object):
                 )
             )
 
+    def compile(self, field_name):
+        required_type = self.required_type
+
+        def check(value):
+            if not isinstance(value, required_type):
+                self(value, field_name)
+
+        return check
+
 
 class ColorValidator(object):
 
     def __call__(self, value, field_name):
         if value:
             try:
-                ImageColor.getcolor(value, 'RGB')
+                parse_color(value)
+            except Exception as e:
+                raise ValueError(
+                    '{field_name} {e}'.format(field_name=field_name, e=e)
+                )
+
+    def compile(self, field_name):
+        return functools.partial(self, field_name=field_name)
+
+
+class ColorListValidator(object):
+
+    def __call__(self, value, field_name):
+        for color in value:
+            try:
+                parse_color(color)
             except Exception as e:
                 raise ValueError(
                     '{field_name} {e}'.format(field_name=field_name, e=e)
                 )
+
+    def compile(self, field_name):
+        return functools.partial(self, field_name=field_name)
+
+
+class ChoicesValidator(object):
+
+    def __init__(self, choices):
+        self.choices = choices
+
+    def __call__(self, value, field_name):
+        if value not in self.choices:
+            raise ValueError(
+                '{field_name} must be one of {choices}.'.format(
+                    field_name=field_name,
+                    choices=', '.join([str(c) for c in self.choices]),
+                )
+            )
+
+    def compile(self, field_name):
+        choices = tuple(self.choices)
+
+        def check(value):
+            if value not in choices:
+                self(value, field_name)
+
+        return check
+
+
+def compile_validator(validator, field_name):
+    """Returns a function of a value that runs a validator for a field.
+
+    Validators with a compile method return a specialized function
+    that calls the validator only to raise an error.
+
+    """
+
+    if hasattr(validator, 'compile'):
+        return validator.compile(field_name)
+    return functools.partial(validator, field_name=field_name)
@@ -0,0 +1,130 @@
+from PIL import Image
+
+from pyavagen.validators import parse_color
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def is_available():
+    """
+    Returns True if NumPy is installed.
+    It's an optional dependency: pip install pyavagen[numpy].
+    """
+
+    return numpy is not None
+
+
+def render_squares(avatars):
+    """Renders unblurred squares of SquareAvatar objects of the same size.
+
+    Colors of every avatar are collected to a small array of squares,
+    coordinates of all pixels of all images are mapped onto canvases
+    by affine transforms of avatars at once, and pixels take colors of
+    squares they fall into. Pixels that fall into borders take a border
+    color. So squares are sampled as NEAREST resampling does.
+
+    Returns numpy.ndarray of uint8 with N x size x size x 3 shape.
+
+    """
+
+    if numpy is None:
+        raise ImportError('NumPy is required for vectorized rendering.')
+
+    sizes = set([avatar.size for avatar in avatars])
+
+    if len(sizes) != 1:
+        raise ValueError('avatars must have the same size')
+
+    size = sizes.pop()
+    squares_counts, side_lengths, borders, matrices = [], [], [], []
+
+    for avatar in avatars:
+        square_side_length, squares_count = avatar._get_squares_layout()
+        squares_counts.append(squares_count)
+        side_lengths.append(square_side_length)
+        borders.append(avatar.border_size)
+
+    # Squares of avatars are padded to the same count, a padding square
+    # and every border take index 0 of colors of an avatar.
+    max_count = max(squares_counts)
+    colors = numpy.zeros(
+        (len(avatars), max_count * max_count + 1, 3),
+        dtype=numpy.uint8,
+    )
+
+    for n, avatar in enumerate(avatars):
+        columns = avatar._generate_squares_colors(squares_counts[n])
+        colors[n, 0] = parse_color(avatar.border_color)
+
+        for i, column in enumerate(columns):
+            for j, color in enumerate(column):
+                colors[n, 1 + i * max_count + j] = color
+
+        matrices.append(avatar.get_transform_matrix())
+
+    matrices = numpy.array(matrices, dtype=numpy.float32)[:, :, None, None]
+    side_lengths = numpy.array(side_lengths, dtype=numpy.int32)[:, None, None]
+    squares_counts = numpy.array(squares_counts)[:, None, None]
+    borders = numpy.array(borders)[:, None, None]
+
+    # Centers of pixels as PIL.Image.Image.transform samples them.
+    # The transform is separable: a row term plus a column term.
+    centers = numpy.arange(size, dtype=numpy.float32) + 0.5
+    x, y = centers[None, None, :], centers[None, :, None]
+    canvas_x = numpy.floor(
+        matrices[:, 0] * x + (matrices[:, 1] * y + matrices[:, 2])
+    ).astype(numpy.int32)
+    canvas_y = numpy.floor(
+        matrices[:, 3] * x + (matrices[:, 4] * y + matrices[:, 5])
+    ).astype(numpy.int32)
+
+    i = canvas_x // side_lengths
+    j = canvas_y // side_lengths
+    local_x = canvas_x - i * side_lengths
+    local_y = canvas_y - j * side_lengths
+    is_square = (
+        (i >= 0) & (i < squares_counts) &
+        (j >= 0) & (j < squares_counts) &
+        (local_x >= borders) & (local_x <= side_lengths - borders) &
+        (local_y >= borders) & (local_y <= side_lengths - borders)
+    )
+    index = numpy.where(is_square, 1 + i * max_count + j, 0)
+
+    return colors[numpy.arange(len(avatars))[:, None, None], index]
+
+
+def render_square_backgrounds(avatars, as_array=False):
+    """Renders images of SquareAvatar objects of the same size in a batch.
+
+    Without NumPy images are rendered by generate methods of avatars.
+
+    Args:
+        avatars: list of SquareAvatar objects.
+        as_array: return numpy.ndarray of uint8 with N x size x size x 3
+            shape instead of a list of PIL.Image.Image objects.
+
+    """
+
+    if not avatars:
+        raise ValueError('avatars must not be empty')
+
+    if numpy is None:
+        if as_array:
+            raise ImportError('NumPy is required for as_array.')
+        return [avatar.generate() for avatar in avatars]
+
+    images = []
+
+    for avatar, squares in zip(avatars, render_squares(avatars)):
+        img = Image.fromarray(squares, mode='RGB')
+        avatar.img = avatar.apply_blur(img)
+        images.append(avatar.img)
+
+    if as_array:
+        return numpy.stack([numpy.asarray(img) for img in images])
+
+    return images
@@ -19,23 +19,32 @@ setup(
     description='Generation of customizable avatars',
     long_description=open(os.path.join(cur_dir, 'README.rst')).read(),
     license='MIT',
-    requires=['python (>= 3.3)', ],
+    python_requires='>=3.7',
     tests_require=['pytest'],
     install_requires=[
-        'Pillow',
+        'Pillow>=8.0',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     packages=[
         'pyavagen',
     ],
+    entry_points={
+        'console_scripts': [
+            'pyavagen = pyavagen.cli:main',
+        ],
+    },
     include_package_data=True,
     keywords=['image', 'avatar', 'picture', 'generator'],
     classifiers=[
         'Development Status :: 4 - Beta',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         "Topic :: Multimedia :: Graphics",
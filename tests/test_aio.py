@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import pyavagen
+from pyavagen import aio
+
+
+class TestAvatarAgenerate:
+    def test_agenerate(self):
+        avatar = pyavagen.Avatar(pyavagen.SQUARE_AVATAR, size=4)
+
+        assert isinstance(asyncio.run(avatar.agenerate()), Image.Image)
+
+    def test_agenerate_of_avatar_object(self):
+        avatar = pyavagen.SquareAvatar(size=4)
+
+        assert isinstance(asyncio.run(aio.agenerate(avatar)), Image.Image)
+
+
+class TestAsyncAvatarRenderer:
+    @pytest.fixture
+    def calls(self, monkeypatch):
+        calls = []
+        generate = aio.generate
+
+        def counted_generate(avatar_type, kwargs):
+            calls.append(avatar_type)
+            return generate(avatar_type, kwargs)
+
+        monkeypatch.setattr(aio, 'generate', counted_generate)
+
+        return calls
+
+    def test_get_spec_key(self):
+        """Should return the same key for equal arguments in any order."""
+
+        assert aio.get_spec_key('square', {'a': [1], 'b': 2}) == (
+            aio.get_spec_key('square', {'b': 2, 'a': (1,)})
+        )
+
+    def test_render(self, calls):
+        renderer = aio.AsyncAvatarRenderer()
+        img = asyncio.run(
+            renderer.render(pyavagen.CHAR_AVATAR, size=4, string='A')
+        )
+
+        assert isinstance(img, Image.Image)
+        assert len(renderer) == 0
+
+    def test_coalesce_same_specs(self, calls):
+        """Concurrent renders of the same spec should share a single render."""
+
+        renderer = aio.AsyncAvatarRenderer()
+
+        async def render_many():
+            return await asyncio.gather(
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=1),
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=1),
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=2),
+            )
+
+        images = asyncio.run(render_many())
+
+        assert images[0] is images[1]
+        assert images[0] is not images[2]
+        assert len(calls) == 2
+
+    def test_full_queue(self, calls):
+        """Should raise RendererOverloaded if the queue is full."""
+
+        renderer = aio.AsyncAvatarRenderer(max_concurrency=1, max_queue=1)
+
+        async def render_many():
+            return await asyncio.gather(*[
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=seed)
+                for seed in range(3)
+            ])
+
+        with pytest.raises(aio.RendererOverloaded):
+            asyncio.run(render_many())
+
+    def test_cancel_one_of_callers(self, calls):
+        """Cancellation of a caller shouldn't cancel a shared render."""
+
+        renderer = aio.AsyncAvatarRenderer()
+
+        async def render_and_cancel():
+            first = asyncio.ensure_future(
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=1)
+            )
+            second = asyncio.ensure_future(
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=1)
+            )
+            await asyncio.sleep(0)
+            first.cancel()
+
+            return await second
+
+        assert isinstance(asyncio.run(render_and_cancel()), Image.Image)
+
+    def test_cancel_all_callers(self, calls):
+        """The render should be cancelled when all its callers are."""
+
+        renderer = aio.AsyncAvatarRenderer(max_concurrency=1)
+
+        async def render_and_cancel():
+            running = asyncio.ensure_future(
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=1)
+            )
+            queued = asyncio.ensure_future(
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=2)
+            )
+            await asyncio.sleep(0)
+            queued.cancel()
+            await running
+
+            with pytest.raises(asyncio.CancelledError):
+                await queued
+
+        asyncio.run(render_and_cancel())
+
+        assert len(renderer) == 0
+        assert len(calls) == 1
+
+    def test_cancelled_render_holds_slot(self, monkeypatch):
+        """
+        A cancelled render should hold its slot until the executor finishes
+        it, so renders don't run beyond max_concurrency.
+        """
+
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def slow_generate(avatar_type, kwargs):
+            with lock:
+                running.append(avatar_type)
+                max_running.append(len(running))
+
+            time.sleep(0.05)
+
+            with lock:
+                running.pop()
+
+        monkeypatch.setattr(aio, 'generate', slow_generate)
+        renderer = aio.AsyncAvatarRenderer(max_concurrency=1)
+
+        async def render_and_cancel():
+            cancelled = asyncio.ensure_future(
+                renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=1)
+            )
+            await asyncio.sleep(0.01)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            await renderer.render(pyavagen.SQUARE_AVATAR, size=4, seed=2)
+
+        asyncio.run(render_and_cancel())
+
+        assert max(max_running) == 1
@@ -0,0 +1,104 @@
+import io
+import json
+
+import pytest
+from PIL import Image, ImageChops
+
+import pyavagen
+from pyavagen import atlas, generators
+
+
+class TestAtlas:
+    @pytest.mark.parametrize(
+        argnames="sizes,columns,padding,expected",
+        argvalues=[
+            (
+                [8, 8, 8, 8],
+                None,
+                0,
+                (16, 16, [(0, 0), (8, 0), (0, 8), (8, 8)]),
+            ),
+            ([8, 8, 8], 3, 2, (28, 8, [(0, 0), (10, 0), (20, 0)])),
+            ([4, 8, 6], 2, 1, (13, 15, [(0, 0), (5, 0), (0, 9)])),
+        ]
+    )
+    def test_get_layout(self, sizes, columns, padding, expected):
+        assert atlas.get_layout(sizes, columns, padding) == expected
+
+    @pytest.mark.parametrize(
+        argnames="avatar_class,avatar_kwargs",
+        argvalues=[
+            (generators.SquareAvatar, {}),
+            (generators.CharAvatar, {'string': 'John Paul'}),
+            (generators.CharAvatar, {'string': 'W', 'font_size': 100}),
+            (generators.CharSquareAvatar, {'string': 'Paul'}),
+        ]
+    )
+    def test_render_into(self, avatar_class, avatar_kwargs):
+        """Should render the same image as generate on a part of a sheet."""
+
+        img = Image.new('RGB', (64, 64))
+        avatar_class(size=32, seed=1, **avatar_kwargs).render_into(
+            img,
+            (16, 8),
+        )
+        expected_img = avatar_class(
+            size=32,
+            seed=1,
+            **avatar_kwargs
+        ).generate()
+
+        assert ImageChops.difference(
+            img.crop((16, 8, 48, 40)),
+            expected_img,
+        ).getbbox() is None
+        assert img.crop((0, 0, 16, 64)).getbbox() is None
+
+    def test_generate_sheet(self):
+        names = ['Paul', 'John', 'Jack']
+        avatars = [
+            pyavagen.Avatar(pyavagen.CHAR_AVATAR, size=16, string=name)
+            for name in names
+        ] + [generators.SquareAvatar(size=24)]
+        sheet = atlas.generate_sheet(
+            avatars,
+            names=names + ['square'],
+            columns=2,
+            format='webp',
+        )
+        img = Image.open(io.BytesIO(sheet.data))
+        sprites = json.loads(atlas.get_sprites_json(sheet))
+
+        assert img.format == 'WEBP'
+        assert img.size == (sheet.width, sheet.height) == (40, 40)
+        assert list(sheet.sprites) == names + ['square']
+        assert sprites['sprites']['square'] == {
+            'x': 16, 'y': 16, 'width': 24, 'height': 24,
+        }
+        assert sprites['format'] == 'webp'
+
+    def test_default_names(self):
+        _, sprites = atlas.render_sheet([
+            generators.SquareAvatar(size=4) for _ in range(2)
+        ])
+
+        assert list(sprites) == ['0', '1']
+
+    @pytest.mark.parametrize(
+        argnames="avatars_count,names,columns,padding",
+        argvalues=[
+            (0, None, None, 0),
+            (2, ['a'], None, 0),
+            (2, ['a', 'a'], None, 0),
+            (2, None, 0, 0),
+            (2, None, None, -1),
+        ]
+    )
+    def test_wrong_arguments(self, avatars_count, names, columns, padding):
+        with pytest.raises(ValueError):
+            atlas.render_sheet(
+                [generators.SquareAvatar(size=4)] * avatars_count,
+                names,
+                columns,
+                padding,
+            )
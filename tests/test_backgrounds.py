@@ -0,0 +1,163 @@
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+from pyavagen import backgrounds, generators
+
+
+class PendingExecutor(object):
+    """Executor which never runs submitted functions."""
+
+    def submit(self, fn, *args):
+        return Future()
+
+
+class TestBackgroundBank:
+    def setup_method(self):
+        self.bank = backgrounds.BackgroundBank(variants=4)
+        generators.CharSquareAvatar.background_bank = self.bank
+
+    def teardown_method(self):
+        generators.CharSquareAvatar.background_bank = None
+
+    def test_background_is_selected_by_string(self):
+        """The same string should get the same background with any seed."""
+
+        images = [
+            generators.CharSquareAvatar(size=16, string='Paul', seed=seed)
+            .generate_background()
+            for seed in (1, 2)
+        ]
+
+        assert images[0].tobytes() == images[1].tobytes()
+        assert images[0] is not images[1]
+        assert self.bank.stats()['misses'] == 1
+        assert self.bank.stats()['hits'] == 1
+
+    def test_background_is_a_square_avatar(self):
+        key = self.bank.prefill(size=16, blur_radius=0, palette_mode=True)
+        index = self.bank.get_index('Paul')
+        img = generators.CharSquareAvatar(
+            size=16,
+            string='Paul',
+            blur_radius=0,
+        ).generate_background()
+        expected_img = generators.SquareAvatar(
+            size=16,
+            seed=index,
+            blur_radius=0,
+        ).generate()
+
+        assert dict(key)['blur_radius'] == 0
+        assert img.tobytes() == expected_img.tobytes()
+        assert self.bank.stats()['misses'] == 0
+
+    def test_svg_has_background_of_bank(self):
+        """SVG should have the same squares as images with the bank."""
+
+        elements = generators.CharSquareAvatar(
+            size=16,
+            string='Paul',
+            seed=self.bank.get_index('Paul') + 1,
+        ).get_svg_elements()
+        expected_elements = generators.SquareAvatar(
+            size=16,
+            seed=self.bank.get_index('Paul'),
+        ).get_svg_elements()
+
+        assert elements[:-1] == expected_elements
+
+    def test_prefill(self):
+        self.bank.prefill(size=16)
+
+        assert len(self.bank) == 4
+        assert self.bank.stats()['size'] == 4 * 16 * 16 * 4
+
+    def test_missing_key_is_filled_in_background(self):
+        avatar = generators.CharSquareAvatar(size=16, string='Paul')
+        avatar.generate()
+        self.bank.fill_async(avatar.background_key).result()
+
+        assert len(self.bank) == 4
+
+    def test_different_arguments_have_different_backgrounds(self):
+        keys = [
+            generators.CharSquareAvatar(
+                size=16,
+                string='Paul',
+                **kwargs
+            ).background_key
+            for kwargs in ({}, {'blur_radius': 2}, {'color_list': []})
+        ]
+
+        assert len(set(keys)) == 3
+
+    def test_least_recently_used_backgrounds_are_dropped(self):
+        self.bank.max_bytes = 4 * 16 * 16 * 4
+        first_key = self.bank.prefill(size=16)
+        second_key = self.bank.prefill(size=16, blur_radius=0)
+
+        assert len(self.bank) == 4
+        assert self.bank.stats()['evictions'] == 4
+        assert self.bank.get(second_key, 'Paul')
+
+        self.bank.get(first_key, 'Paul')
+
+        assert self.bank.stats()['misses'] == 1
+
+    def test_too_big_background(self):
+        self.bank.max_bytes = 16
+
+        assert not self.bank.set(('key',), 0, Image.new('RGB', (4, 4)))
+        assert len(self.bank) == 0
+
+    def test_variants_which_do_not_fit(self):
+        """
+        Variants of a key shouldn't replace each other and shouldn't be
+        filled if they don't fit max_bytes together.
+        """
+
+        self.bank.max_bytes = 2 * 16 * 16 * 4
+        self.bank.executor = PendingExecutor()
+
+        for i in range(8):
+            generators.CharSquareAvatar(
+                size=16,
+                string='User {i}'.format(i=i),
+            ).generate()
+
+        assert self.bank.stats()['renders'] == self.bank.stats()['misses']
+        assert self.bank.stats()['evictions'] == 0
+        assert len(self.bank) == 2
+        assert not self.bank._filling
+
+    def test_max_pending(self):
+        bank = backgrounds.BackgroundBank(
+            variants=4,
+            executor=PendingExecutor(),
+            max_pending=1,
+        )
+        future = bank.fill_async(('first',))
+
+        assert bank.fill_async(('first',)) is future
+        assert bank.fill_async(('second',)) is None
+
+    def test_clear(self):
+        self.bank.prefill(size=16)
+        self.bank.clear()
+
+        assert len(self.bank) == 0
+        assert self.bank.stats()['size'] == 0
+
+    @pytest.mark.parametrize(
+        argnames="bank_kwargs",
+        argvalues=[
+            {'variants': 0},
+            {'max_bytes': -1},
+            {'max_pending': -1},
+        ]
+    )
+    def test_wrong_arguments(self, bank_kwargs):
+        with pytest.raises(ValueError):
+            backgrounds.BackgroundBank(**bank_kwargs)
@@ -0,0 +1,88 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import pyavagen
+from pyavagen import batch
+
+
+class TestGenerateMany:
+    @pytest.fixture
+    def specs(self):
+        return [
+            {'avatar_type': pyavagen.SQUARE_AVATAR, 'size': 8, 'seed': 1},
+            {'avatar_type': pyavagen.CHAR_AVATAR, 'size': 8, 'string': 'A'},
+            {'avatar_type': 'unknown', 'size': 8},
+        ]
+
+    @pytest.mark.parametrize(argnames="workers", argvalues=[1, 2])
+    def test_results_in_order(self, specs, workers):
+        """
+        Should return results in order of specs with an error for a bad spec
+        and encoded images for the rest.
+        """
+
+        results = list(pyavagen.Avatar.generate_many(specs, workers=workers))
+
+        assert [r.index for r in results] == [0, 1, 2]
+        assert [r.spec for r in results] == specs
+
+        for result in results[:2]:
+            assert result.error is None
+            assert Image.open(io.BytesIO(result.data)).size == (8, 8)
+
+        assert results[2].data is None
+        assert results[2].error.startswith('AttributeError')
+
+    def test_unordered_results(self, specs):
+        results = pyavagen.Avatar.generate_many(
+            specs,
+            workers=2,
+            ordered=False,
+        )
+
+        assert sorted([r.index for r in results]) == [0, 1, 2]
+
+    def test_output_dir(self, specs, tmpdir):
+        """Should write images to files instead of returning them."""
+
+        specs[0]['filename'] = 'square.png'
+        output_dir = str(tmpdir)
+        results = list(batch.generate_many(
+            specs[:2],
+            workers=1,
+            output_dir=output_dir,
+        ))
+
+        assert [r.path for r in results] == [
+            os.path.join(output_dir, 'square.png'),
+            os.path.join(output_dir, '1.png'),
+        ]
+        assert all(r.data is None for r in results)
+        assert all(os.path.exists(r.path) for r in results)
+
+    @pytest.mark.parametrize(
+        argnames="filename",
+        argvalues=['../square.png', 'dir/square.png', '/tmp/square.png', '..'],
+    )
+    def test_filename_with_directories(self, specs, tmpdir, filename):
+        """Images shouldn't be written outside of the output directory."""
+
+        specs[0]['filename'] = filename
+        output_dir = tmpdir.mkdir('avatars')
+        result, = batch.generate_many(
+            specs[:1],
+            workers=1,
+            output_dir=str(output_dir),
+        )
+
+        assert result.path is None
+        assert result.error.startswith('ValueError')
+        assert tmpdir.listdir() == [output_dir]
+        assert output_dir.listdir() == []
+
+    def test_wrong_workers(self, specs):
+        with pytest.raises(ValueError):
+            list(batch.generate_many(specs, workers=0))
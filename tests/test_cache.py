@@ -0,0 +1,214 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import pyavagen
+from pyavagen import cache, generators
+
+
+class TestFontCache:
+    def setup_method(self):
+        self.font_cache = cache.FontCache(maxsize=2)
+        self.font = generators.CharAvatar.DEFAULT_FONT
+
+    def test_get_returns_same_object_for_same_key(self):
+        """Should load a font once and return it from cache after that."""
+
+        font = self.font_cache.get(self.font, 10)
+
+        assert self.font_cache.get(self.font, 10) is font
+        assert self.font_cache.stats()['hits'] == 1
+        assert self.font_cache.stats()['misses'] == 1
+
+    def test_least_recently_used_font_is_evicted(self):
+        """Should keep no more than maxsize fonts, dropping the oldest one."""
+
+        font_10 = self.font_cache.get(self.font, 10)
+        self.font_cache.get(self.font, 20)
+        self.font_cache.get(self.font, 10)
+        self.font_cache.get(self.font, 30)
+
+        assert len(self.font_cache) == 2
+        assert self.font_cache.get(self.font, 10) is font_10
+        assert self.font_cache.stats()['misses'] == 3
+
+    def test_preload(self):
+        """Should load the font in all passed sizes."""
+
+        self.font_cache.preload(self.font, [10, 20])
+
+        assert self.font_cache.stats()['misses'] == 2
+        assert len(self.font_cache) == 2
+
+    def test_clear(self):
+        """Should remove fonts and reset counters."""
+
+        self.font_cache.get(self.font, 10)
+        self.font_cache.clear()
+
+        assert self.font_cache.stats() == {
+            'hits': 0,
+            'misses': 0,
+            'size': 0,
+            'maxsize': 2,
+        }
+
+    def test_wrong_maxsize(self):
+        """Should raise ValueError if maxsize is less than 1."""
+
+        with pytest.raises(ValueError):
+            cache.FontCache(maxsize=0)
+
+
+class TestGlyphMaskCache:
+    def setup_method(self):
+        self.glyph_cache = cache.GlyphMaskCache(
+            fonts=cache.FontCache(),
+        )
+        self.font = generators.CharAvatar.DEFAULT_FONT
+
+    def test_get_returns_same_mask_for_same_key(self):
+        glyph = self.glyph_cache.get(self.font, 20, 'JP', False)
+
+        assert self.glyph_cache.get(self.font, 20, 'JP', False) is glyph
+        assert self.glyph_cache.stats()['hits'] == 1
+        assert self.glyph_cache.fonts.stats()['misses'] == 1
+
+    def test_mask_without_outline(self):
+        glyph = self.glyph_cache.get(self.font, 20, 'JP', False)
+
+        assert glyph.outline_mask is None
+        assert glyph.padding == 0
+        assert glyph.mask.mode == 'L'
+        assert glyph.mask.size == glyph.text_size
+
+    def test_mask_with_outline(self):
+        """
+        The outline mask should cover the text mask and be bigger than it.
+        """
+
+        glyph = self.glyph_cache.get(self.font, 20, 'JP', True)
+        mask_pixels = glyph.mask.point(lambda v: v > 0).histogram()[1]
+        outline_pixels = (
+            glyph.outline_mask.point(lambda v: v > 0).histogram()[1]
+        )
+
+        assert glyph.padding == 1
+        assert glyph.outline_mask.size == glyph.mask.size
+        assert outline_pixels > mask_pixels
+
+
+class TestRenderCache:
+    @pytest.fixture
+    def render_cache(self, tmpdir):
+        return cache.RenderCache(directory=str(tmpdir))
+
+    def get_avatar(self, **kwargs):
+        kwargs.setdefault('seed', 1)
+        return pyavagen.Avatar(pyavagen.SQUARE_AVATAR, size=8, **kwargs)
+
+    def test_get_key(self, render_cache):
+        """
+        Should return the same key for avatars with the same fields and
+        different keys for different ones.
+        """
+
+        key = render_cache.get_key(self.get_avatar())
+
+        assert key == render_cache.get_key(self.get_avatar().avatar_class)
+        assert key != render_cache.get_key(self.get_avatar(seed=2))
+        assert key != render_cache.get_key(self.get_avatar(blur_radius=2))
+
+    def test_get_key_without_seed(self, render_cache):
+        """Random avatars should not be cached."""
+
+        assert render_cache.get_key(self.get_avatar(seed=None)) is None
+
+    def test_fetch(self, render_cache):
+        """Should generate an image once and read it from disk after that."""
+
+        data = render_cache.fetch(self.get_avatar())
+
+        assert render_cache.fetch(self.get_avatar()) == data
+        assert Image.open(io.BytesIO(data)).size == (8, 8)
+        assert render_cache.stats()['hits'] == 1
+        assert render_cache.stats()['misses'] == 1
+        assert render_cache.stats()['size'] == len(data)
+
+    def test_fetch_without_seed(self, render_cache):
+        render_cache.fetch(self.get_avatar(seed=None))
+
+        assert render_cache.stats()['bypasses'] == 1
+        assert render_cache.stats()['size'] == 0
+
+    def test_persistence(self, render_cache):
+        """Another cache object with the same directory should see files."""
+
+        render_cache.fetch(self.get_avatar())
+        other_cache = cache.RenderCache(directory=render_cache.directory)
+        other_cache.fetch(self.get_avatar())
+
+        assert other_cache.stats()['hits'] == 1
+
+    def test_least_recently_used_files_are_evicted(self, render_cache):
+        keys = [str(i) * 64 for i in range(3)]
+        render_cache.max_size = 25
+
+        for i, key in enumerate(keys):
+            render_cache.set(key, b'0' * 10)
+            # Distinct access times regardless of filesystem resolution.
+            os.utime(render_cache.get_path(key), (i, i))
+
+        assert render_cache.get(keys[0]) is None
+        assert render_cache.get(keys[1]) is not None
+        assert render_cache.stats()['evictions'] == 1
+        assert render_cache.stats()['size'] == 20
+
+    def test_eviction_to_low_water_mark(self, render_cache):
+        """
+        A full cache should be cleaned to LOW_WATER_RATIO of max_size,
+        so the next writes don't scan the directory.
+        """
+
+        render_cache.max_size = 100
+
+        for i in range(11):
+            render_cache.set('{i:064}'.format(i=i), b'0' * 10)
+
+        assert render_cache.stats()['evictions'] == 2
+        assert render_cache.stats()['size'] == 90
+
+        render_cache.set('1' * 64, b'0' * 10)
+
+        assert render_cache.stats()['evictions'] == 2
+
+    def test_overwritten_key_is_counted_once(self, render_cache):
+        render_cache.set('0' * 64, b'0' * 10)
+        render_cache.set('0' * 64, b'0' * 5)
+
+        assert render_cache.stats()['size'] == 5
+
+    def test_old_temporary_files_are_removed(self, render_cache):
+        old_path = os.path.join(render_cache.directory, 'old.tmp')
+        new_path = os.path.join(render_cache.directory, 'new.tmp')
+
+        for path in (old_path, new_path):
+            with open(path, 'wb') as f:
+                f.write(b'0')
+
+        os.utime(old_path, (0, 0))
+        cache.RenderCache(directory=render_cache.directory)
+
+        assert not os.path.exists(old_path)
+        assert os.path.exists(new_path)
+
+    def test_clear(self, render_cache):
+        render_cache.fetch(self.get_avatar())
+        render_cache.clear()
+
+        key = render_cache.get_key(self.get_avatar())
+
+        assert render_cache.stats()['size'] == 0
+        assert render_cache.get(key) is None
@@ -0,0 +1,186 @@
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+from PIL import Image
+
+from pyavagen import cli
+
+
+class TestCli:
+    @pytest.fixture
+    def csv_path(self, tmpdir):
+        path = tmpdir.join('users.csv')
+        path.write(
+            'name,type,size,color_list,font_outline\n'
+            'John Paul,char,16,#000000;#ffffff,true\n'
+            'Jack,square,8,,\n'
+            'Bad,char,big,,\n'
+        )
+
+        return str(path)
+
+    def read_manifest(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_make_spec(self):
+        """Should convert CSV values and seed an avatar by its name."""
+
+        spec = cli.make_spec(
+            {'name': 'Paul', 'size': '32', 'color_list': '#000; #fff'},
+            avatar_type='char',
+            size=128,
+        )
+
+        assert spec == {
+            'avatar_type': 'char',
+            'size': 32,
+            'string': 'Paul',
+            'seed': 'Paul',
+            'color_list': ['#000', '#fff'],
+        }
+
+    def test_get_filename(self):
+        spec = {'avatar_type': 'char', 'string': 'John Paul', 'seed': 1}
+        filename = cli.get_filename(spec, 'png')
+
+        assert filename.startswith('John_Paul-')
+        assert filename.endswith('.png')
+        assert cli.get_filename(dict(spec), 'png') == filename
+        assert cli.get_filename(dict(spec, seed=2), 'png') != filename
+
+    def test_get_filename_with_directories(self):
+        with pytest.raises(ValueError):
+            cli.get_filename({'filename': '../avatar.png'}, 'png')
+
+    def test_output_dir(self, csv_path, tmpdir):
+        """
+        Should render valid specs, report bad ones in the manifest and
+        return 1.
+        """
+
+        output = str(tmpdir.join('avatars'))
+        status = cli.main([csv_path, '-o', output, '-w', '1', '-q'])
+        manifest = self.read_manifest(output + '.manifest.jsonl')
+
+        assert status == 1
+        assert [entry['status'] for entry in manifest] == [
+            'ok', 'ok', 'error',
+        ]
+        assert manifest[2]['error'].startswith('ValueError')
+
+        for entry in manifest[:2]:
+            with Image.open(os.path.join(output, entry['file'])) as img:
+                assert img.size in ((16, 16), (8, 8))
+
+    def test_resume(self, csv_path, tmpdir):
+        """Should skip specs with existing images."""
+
+        output = str(tmpdir.join('avatars'))
+        cli.main([csv_path, '-o', output, '-w', '1', '-q'])
+        cli.main([csv_path, '-o', output, '-w', '1', '-q'])
+        manifest = self.read_manifest(output + '.manifest.jsonl')
+
+        assert [entry['status'] for entry in manifest] == [
+            'skipped', 'skipped', 'error',
+        ]
+
+    @pytest.mark.parametrize(
+        argnames="archive_name",
+        argvalues=['avatars.zip', 'avatars.tar', 'avatars.tar.gz'],
+    )
+    def test_archive(self, csv_path, tmpdir, archive_name):
+        """
+        Should write images to an archive, and add only new images to it
+        in the next run.
+        """
+
+        output = str(tmpdir.join(archive_name))
+        cli.main([csv_path, '-o', output, '-w', '2', '-q'])
+
+        with open(csv_path, 'a') as f:
+            f.write('Paul,char,8,,\n')
+
+        cli.main([csv_path, '-o', output, '-w', '1', '-q'])
+        manifest = self.read_manifest(output + '.manifest.jsonl')
+
+        if archive_name.endswith('.zip'):
+            with zipfile.ZipFile(output) as archive:
+                names = archive.namelist()
+        else:
+            with tarfile.open(output) as archive:
+                names = archive.getnames()
+
+        assert [entry['status'] for entry in manifest] == [
+            'skipped', 'skipped', 'error', 'ok',
+        ]
+        assert sorted(names) == sorted([
+            entry['file'] for entry in manifest if 'file' in entry
+        ])
+        assert not os.path.exists(output + '.parts')
+
+    def test_jsonl(self, tmpdir):
+        path = tmpdir.join('users.jsonl')
+        path.write(
+            '{"name": "Paul", "size": 8, "palette_mode": true}\n'
+            'not json\n'
+            '\n'
+            '{"type": "square", "size": 8, "seed": 1, "filename": "a.png"}\n'
+        )
+        output = str(tmpdir.join('avatars'))
+        status = cli.main([str(path), '-o', output, '-w', '1', '-q'])
+        manifest = self.read_manifest(output + '.manifest.jsonl')
+
+        assert status == 1
+        assert [entry['line'] for entry in manifest] == [1, 2, 4]
+        assert [entry['status'] for entry in manifest] == [
+            'ok', 'error', 'ok',
+        ]
+        assert os.path.exists(os.path.join(output, 'a.png'))
+
+    def test_manifest_is_written_incrementally(
+            self,
+            csv_path,
+            tmpdir,
+            monkeypatch):
+        """Entries of processed specs should be kept if a run crashes."""
+
+        generate_many = cli.generate_many
+
+        def crashing_generate_many(specs, **kwargs):
+            for result in generate_many(specs, **kwargs):
+                yield result
+                raise KeyboardInterrupt
+
+        monkeypatch.setattr(cli, 'generate_many', crashing_generate_many)
+        output = str(tmpdir.join('avatars'))
+
+        with pytest.raises(KeyboardInterrupt):
+            cli.main([csv_path, '-o', output, '-w', '1', '-q'])
+
+        manifest = self.read_manifest(output + '.manifest.jsonl')
+
+        assert [entry['status'] for entry in manifest] == ['ok']
+        assert os.path.exists(os.path.join(output, manifest[0]['file']))
+
+    def test_unknown_columns(self, tmpdir, capsys):
+        """Unknown columns should be rejected once before rendering."""
+
+        path = tmpdir.join('users.csv')
+        path.write('name,colour,font_colour\nPaul,red,red\n')
+        output = str(tmpdir.join('avatars'))
+
+        with pytest.raises(SystemExit):
+            cli.main([str(path), '-o', output, '-w', '1', '-q'])
+
+        assert 'Unknown columns: colour, font_colour.' in (
+            capsys.readouterr().err
+        )
+        assert not os.path.exists(output + '.manifest.jsonl')
+
+    def test_unknown_input_format(self, tmpdir):
+        with pytest.raises(SystemExit):
+            cli.main([str(tmpdir.join('users.txt')), '-o', str(tmpdir)])
@@ -4,7 +4,7 @@ from pyavagen import fields, validators
 
 
 class TestAvatarField:
-    def setup(self):
+    def setup_method(self):
         self.avatar_field = fields.AvatarField()
 
     @pytest.mark.parametrize(
@@ -58,3 +58,63 @@ class TestAvatarField:
         avatar.field = value
 
         assert avatar.field == result
+
+    @pytest.mark.parametrize(
+        argnames="value,result",
+        argvalues=[
+            (None, 1),
+            (0, 0),
+            (3, 3),
+        ]
+    )
+    def test_clean(self, value, result):
+        """
+        Should return a passed value or a default value if it's None.
+        Falsy values are not validated.
+        """
+
+        avatar_field = fields.AvatarField(
+            default=1,
+            validators=[
+                validators.TypeValidator(int),
+                validators.MinValueValidator(limit_value=1),
+            ],
+        )
+
+        assert avatar_field.clean(value) == result
+
+    @pytest.mark.parametrize(argnames="value", argvalues=['1', -1])
+    def test_clean_with_wrong_value(self, value):
+        avatar_field = fields.AvatarField(
+            validators=[
+                validators.TypeValidator(int),
+                validators.MinValueValidator(limit_value=1),
+            ],
+        )
+
+        with pytest.raises(ValueError):
+            avatar_field.clean(value)
+
+
+class TestCompileFields:
+    def setup_method(self):
+        self.clean_fields = fields.compile_fields({
+            'size': fields.AvatarField(
+                validators=[validators.TypeValidator(int)],
+            ),
+            'color': fields.AvatarField(
+                default='red',
+                validators=[validators.ColorValidator()],
+            ),
+        })
+
+    def test_values_and_defaults(self):
+        assert self.clean_fields({'size': 2}) == {'size': 2, 'color': 'red'}
+
+    def test_wrong_value(self):
+        with pytest.raises(ValueError):
+            self.clean_fields({'size': 2, 'color': 'not a color'})
+
+    def test_unknown_field(self):
+        with pytest.raises(TypeError):
+            self.clean_fields({'size': 2, 'unknown': 1})
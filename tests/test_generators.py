@@ -1,8 +1,14 @@
+import io
+import os
+import subprocess
+import sys
+from xml.etree import ElementTree
+
 import pytest
-from PIL import Image
+from PIL import Image, ImageChops, ImageDraw, ImageStat
 
 import pyavagen
-from pyavagen import generators, validators
+from pyavagen import cache, generators, validators
 
 
 class TestAvatar:
@@ -62,6 +68,281 @@ class TestAvatar:
 
         assert isinstance(avatar.generate(), Image.Image)
 
+    @pytest.mark.parametrize(
+        argnames="avatar_type,avatar_kwargs",
+        argvalues=[
+            (pyavagen.CHAR_AVATAR, {'string': 'string', 'color_list': []}),
+            (pyavagen.SQUARE_AVATAR, {}),
+            (pyavagen.CHAR_SQUARE_AVATAR, {'string': 'string'}),
+        ]
+    )
+    def test_generate_with_seed(self, avatar_type, avatar_kwargs):
+        """
+        Avatars with the same arguments and seed should be byte-identical.
+        """
+
+        images = []
+
+        for seed in (1, 1, 'other'):
+            buffer = io.BytesIO()
+            avatar = pyavagen.Avatar(
+                avatar_type=avatar_type,
+                size=32,
+                seed=seed,
+                **avatar_kwargs
+            )
+            avatar.generate().save(buffer, format='PNG')
+            images.append(buffer.getvalue())
+
+        assert images[0] == images[1]
+        assert images[0] != images[2]
+
+    def test_generate_bytes(self):
+        """
+        Should return an encoded image and release the generated one,
+        so that the avatar can still be encoded again.
+        """
+
+        avatar = pyavagen.Avatar(pyavagen.SQUARE_AVATAR, size=4)
+        data = avatar.generate_bytes(format='webp', quality=50)
+
+        assert Image.open(io.BytesIO(data)).format == 'WEBP'
+        assert avatar.avatar_class.img is None
+        assert Image.open(io.BytesIO(avatar.generate_bytes())).size == (4, 4)
+
+    def test_generate_to(self):
+        """Should write an encoded image and return its size."""
+
+        avatar = pyavagen.Avatar(pyavagen.CHAR_AVATAR, size=4, string='A')
+        buffer = io.BytesIO()
+        size = avatar.generate_to(buffer, format='jpeg')
+
+        assert size == len(buffer.getvalue())
+        assert Image.open(buffer).format == 'JPEG'
+
+    @pytest.mark.parametrize(
+        argnames="avatar_type,avatar_kwargs",
+        argvalues=[
+            (pyavagen.SQUARE_AVATAR, {}),
+            (pyavagen.CHAR_AVATAR, {'string': 'John Paul'}),
+            (pyavagen.CHAR_SQUARE_AVATAR, {'string': 'Paul'}),
+        ]
+    )
+    def test_generate_svg(self, avatar_type, avatar_kwargs):
+        avatars = [
+            pyavagen.Avatar(avatar_type, size=64, seed=1, **avatar_kwargs)
+            for _ in range(2)
+        ]
+        svg = avatars[0].generate_svg()
+        root = ElementTree.fromstring(svg)
+
+        assert root.tag == '{http://www.w3.org/2000/svg}svg'
+        assert root.get('viewBox') == '0 0 64 64'
+        assert avatars[1].generate_bytes('svg') == svg.encode('utf-8')
+
+    def test_lazy_import(self):
+        """
+        Importing the package shouldn't import generators and Pillow until
+        avatar classes are accessed.
+        """
+
+        code = (
+            'import sys, pyavagen\n'
+            'modules = {"PIL", "pyavagen.generators", "xml.sax"}\n'
+            'assert not modules & set(sys.modules), sys.modules\n'
+            'assert pyavagen.SQUARE_AVATAR in pyavagen.Avatar.AVATAR_MAP\n'
+            'assert "SquareAvatar" in dir(pyavagen)\n'
+            'assert not modules & set(sys.modules), sys.modules\n'
+            'pyavagen.Avatar(pyavagen.CHAR_AVATAR, size=4, string="A")\n'
+            'assert "PIL.Image" in sys.modules\n'
+        )
+        subprocess.check_call(
+            [sys.executable, '-c', code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+
+    def test_avatar_map(self):
+        avatar_map = pyavagen.LazyAvatarMap({
+            'square': 'pyavagen.generators:SquareAvatar',
+            'char': pyavagen.CharAvatar,
+        })
+
+        assert sorted(avatar_map) == ['char', 'square']
+        assert avatar_map['square'] is pyavagen.SquareAvatar
+        assert avatar_map.get('char') is pyavagen.CharAvatar
+        assert avatar_map.get('char_square') is None
+
+    def test_unknown_attribute(self):
+        with pytest.raises(AttributeError):
+            pyavagen.UnknownAvatar
+
+    @pytest.mark.parametrize(
+        argnames="avatar_type,avatar_kwargs,message",
+        argvalues=[
+            (pyavagen.SQUARE_AVATAR, {}, 'size'),
+            (pyavagen.CHAR_AVATAR, {'size': 8}, 'string'),
+            (pyavagen.CHAR_SQUARE_AVATAR, {}, 'size, string'),
+        ]
+    )
+    def test_missing_arguments(self, avatar_type, avatar_kwargs, message):
+        """Required arguments should be checked before rendering."""
+
+        with pytest.raises(TypeError) as excinfo:
+            pyavagen.Avatar(avatar_type, **avatar_kwargs)
+
+        assert str(excinfo.value) == (
+            'Missing required arguments: {message}.'.format(message=message)
+        )
+
+
+class TestAvatarTemplate:
+    @pytest.mark.parametrize(
+        argnames="avatar_type,avatar_kwargs,render_kwargs",
+        argvalues=[
+            (
+                pyavagen.CHAR_AVATAR,
+                {'color_list': ['#000000', '#ffffff']},
+                [{'string': 'Paul', 'seed': 1}, {'string': 'Jack'}],
+            ),
+            (
+                pyavagen.SQUARE_AVATAR,
+                {'blur_radius': 0},
+                [{'seed': 1}, {'seed': 'Jack'}],
+            ),
+            (
+                pyavagen.CHAR_SQUARE_AVATAR,
+                {'font_outline': True},
+                [{'string': 'Paul', 'seed': 1}, {'string': 'Jack', 'seed': 2}],
+            ),
+        ]
+    )
+    def test_render(self, avatar_type, avatar_kwargs, render_kwargs):
+        """Should render the same image as Avatar with the same arguments."""
+
+        template = pyavagen.AvatarTemplate(
+            avatar_type,
+            size=32,
+            **avatar_kwargs
+        )
+
+        for kwargs in render_kwargs:
+            kwargs.setdefault('seed', 'seed')
+            avatar = pyavagen.Avatar(
+                avatar_type,
+                size=32,
+                **dict(avatar_kwargs, **kwargs)
+            )
+            difference = ImageChops.difference(
+                template.render(**kwargs),
+                avatar.generate(),
+            )
+
+            assert difference.getbbox() is None
+
+    def test_template_is_immutable(self):
+        color_list = ['#000000', '#ffffff']
+        template = pyavagen.AvatarTemplate(
+            pyavagen.SQUARE_AVATAR,
+            size=4,
+            color_list=color_list,
+        )
+        color_list.append('#ff0000')
+
+        assert template.values['color_list'] == ('#000000', '#ffffff')
+
+        with pytest.raises(AttributeError):
+            template.avatar_type = pyavagen.CHAR_AVATAR
+
+        with pytest.raises(TypeError):
+            template.values['size'] = 8
+
+    @pytest.mark.parametrize(
+        argnames="avatar_kwargs,exception",
+        argvalues=[
+            ({'size': -1}, ValueError),
+            ({'color_list': ['#000000']}, ValueError),
+            ({'unknown': 1}, TypeError),
+        ]
+    )
+    def test_wrong_arguments(self, avatar_kwargs, exception):
+        """Should validate arguments of the template and of a render."""
+
+        with pytest.raises(exception):
+            pyavagen.AvatarTemplate(pyavagen.SQUARE_AVATAR, **avatar_kwargs)
+
+        template = pyavagen.AvatarTemplate(pyavagen.SQUARE_AVATAR, size=4)
+
+        with pytest.raises(exception):
+            template.render(**avatar_kwargs)
+
+    def test_string_is_left_for_render(self):
+        template = pyavagen.AvatarTemplate(pyavagen.CHAR_AVATAR, size=4)
+
+        assert template.render(string='Paul').size == (4, 4)
+
+        with pytest.raises(TypeError):
+            template.render()
+
+    def test_avatar_is_created_lazily(self):
+        avatar = pyavagen.Avatar(pyavagen.SQUARE_AVATAR, size=4)
+
+        assert avatar._avatar is None
+        assert avatar.avatar_class is avatar.avatar_class
+        assert avatar.avatar_class.img is None
+
+
+class TestBaseAvatar:
+    @pytest.mark.parametrize(
+        argnames="avatar_class,avatar_kwargs",
+        argvalues=[
+            (generators.SquareAvatar, {}),
+            (generators.CharAvatar, {'string': 'string'}),
+            (generators.CharSquareAvatar, {'string': 'string'}),
+        ]
+    )
+    def test_generate_sizes(self, avatar_class, avatar_kwargs):
+        """Should return images of all passed sizes."""
+
+        avatar = avatar_class(size=64, **avatar_kwargs)
+        images = avatar.generate_sizes([16, 64, 32, 16])
+
+        assert sorted(images) == [16, 32, 64]
+
+        for size, img in images.items():
+            assert img.size == (size, size)
+
+    @pytest.mark.parametrize(argnames="sizes", argvalues=[[], [0], [128]])
+    def test_generate_sizes_with_wrong_sizes(self, sizes):
+        """
+        Should raise ValueError if sizes are empty or can't be derived from
+        the avatar size.
+        """
+
+        avatar = generators.SquareAvatar(size=64)
+
+        with pytest.raises(ValueError):
+            avatar.generate_sizes(sizes)
+
+
+class TestAvatarMeta:
+    def test_clean_fields(self):
+        """
+        Should check values of fields of the class including base classes.
+        """
+
+        values = generators.CharSquareAvatar.clean_fields({
+            'size': 4,
+            'string': 'A',
+        })
+
+        assert values['size'] == 4
+        assert values['font_color'] == 'white'
+        assert values['blur_radius'] == 1
+
+    def test_clean_fields_with_wrong_value(self):
+        with pytest.raises(ValueError):
+            generators.SquareAvatar.clean_fields({'size': -1})
+
 
 class TestColorListMixin:
     @pytest.mark.parametrize(
@@ -83,6 +364,58 @@ class TestColorListMixin:
 
         assert color_validator is None
 
+    def test_palette(self):
+        """Should wrap a color list in a Palette once."""
+
+        color_list_object = generators.ColorListMixin(
+            color_list=['#ff0000', '#00ff00'],
+        )
+        palette = color_list_object.palette
+
+        assert palette.rgb == ((255, 0, 0), (0, 255, 0))
+        assert color_list_object.palette is palette
+        assert color_list_object.get_random_rgb_color() in palette.rgb
+
+    @pytest.mark.parametrize(
+        argnames="avatar_type,avatar_kwargs",
+        argvalues=[
+            (pyavagen.SQUARE_AVATAR, {'blur_radius': 0}),
+            (pyavagen.CHAR_AVATAR, {'string': 'Paul'}),
+            (pyavagen.SQUARE_AVATAR, {'blur_radius': 0, 'palette_mode': True}),
+        ]
+    )
+    def test_rgb_tuples(self, avatar_type, avatar_kwargs):
+        """Colors of a color list can be RGB and RGBA tuples."""
+
+        img = pyavagen.Avatar(
+            avatar_type,
+            size=8,
+            color_list=[(255, 0, 0), (0, 0, 255, 128), '#00ff00'],
+            **avatar_kwargs
+        ).generate()
+
+        # Edges of rotated squares are interpolated.
+        _, color = max(img.convert('RGB').getcolors())
+
+        assert color in [(255, 0, 0), (0, 0, 255), (0, 255, 0)]
+
+    @pytest.mark.parametrize(
+        argnames="color_list",
+        argvalues=[
+            ['#ff0000', 'nocolor'],
+            [(255, 0)],
+            [(255, 0, 256)],
+            [1],
+        ]
+    )
+    def test_wrong_colors(self, color_list):
+        with pytest.raises(ValueError):
+            pyavagen.Avatar(
+                pyavagen.SQUARE_AVATAR,
+                size=8,
+                color_list=color_list,
+            )
+
 
 class TestSquareAvatar:
     @pytest.fixture(scope="module")
@@ -116,6 +449,270 @@ class TestSquareAvatar:
     def test_generate_with_full_set(self, avatar_object):
         assert isinstance(avatar_object.generate(), Image.Image)
 
+    @pytest.mark.parametrize(
+        argnames="border_size,max_difference",
+        argvalues=[
+            (0, 2),
+            (3, 0.5),
+        ]
+    )
+    def test_transform_engine_is_equivalent_to_classic(
+            self,
+            border_size,
+            max_difference):
+        """
+        The transform engine should render the same image as the classic one
+        with small differences on edges of squares.
+        """
+
+        images = []
+
+        for render_engine in ('classic', 'transform'):
+            avatar = generators.SquareAvatar(
+                size=64,
+                seed=1,
+                border_size=border_size,
+                render_engine=render_engine,
+            )
+            images.append(avatar.generate())
+
+        classic_img, transform_img = images
+        difference = ImageChops.difference(classic_img, transform_img)
+
+        assert transform_img.size == classic_img.size
+        assert max(ImageStat.Stat(difference).mean) < max_difference
+
+    @pytest.mark.parametrize(
+        argnames="color_list,squares_count",
+        argvalues=[
+            (['#000000', '#ffffff'], 8),
+            (pyavagen.COLOR_LIST_FLAT, 128),
+            ([], 8),
+        ]
+    )
+    def test_adjacent_squares_colors_are_different(
+            self,
+            color_list,
+            squares_count):
+        avatar = generators.SquareAvatar(
+            size=4,
+            squares_on_axis=2,
+            color_list=color_list,
+        )
+        columns = avatar._generate_squares_colors(squares_count)
+
+        for i in range(squares_count):
+            for j in range(squares_count):
+                if i:
+                    assert columns[i][j] != columns[i - 1][j]
+                if j:
+                    assert columns[i][j] != columns[i][j - 1]
+
+    def test_color_list_with_single_color(self):
+        """
+        Should raise ValueError if adjacent squares can't have different
+        colors.
+        """
+
+        with pytest.raises(ValueError):
+            generators.SquareAvatar(
+                size=4,
+                squares_on_axis=2,
+                color_list=['#000000', '#000000'],
+            )
+
+    def test_color_list_with_single_color_and_single_square(self):
+        avatar = generators.SquareAvatar(
+            size=4,
+            squares_on_axis=1,
+            color_list=['#000000'],
+        )
+
+        assert isinstance(avatar.generate(), Image.Image)
+
+    @pytest.mark.parametrize(argnames="blur_radius", argvalues=[1, 8, 16])
+    def test_reduced_blur_is_close_to_exact(self, blur_radius):
+        images = []
+
+        for blur_method in generators.SquareAvatar.BLUR_METHODS:
+            avatar = generators.SquareAvatar(
+                size=128,
+                seed=1,
+                blur_radius=blur_radius,
+                blur_method=blur_method,
+            )
+            images.append(avatar.generate())
+
+        difference = ImageChops.difference(*images)
+
+        assert images[1].size == (128, 128)
+        assert max(ImageStat.Stat(difference).mean) < 1
+
+    def test_wrong_render_engine(self):
+        with pytest.raises(ValueError):
+            generators.SquareAvatar(size=4, render_engine='unknown')
+
+    @pytest.mark.parametrize(
+        argnames="render_engine",
+        argvalues=generators.SquareAvatar.RENDER_ENGINES,
+    )
+    @pytest.mark.parametrize(argnames="border_size", argvalues=[0, 2])
+    def test_palette_mode(self, render_engine, border_size):
+        """
+        Should render a 'P' image with colors of squares and the border.
+        """
+
+        avatar = generators.SquareAvatar(
+            size=64,
+            seed=1,
+            blur_radius=0,
+            border_size=border_size,
+            render_engine=render_engine,
+            palette_mode=True,
+        )
+        img = avatar.generate()
+        colors = set([
+            color for _, color in img.convert('RGB').getcolors()
+        ])
+
+        assert img.mode == 'P'
+        assert colors <= set(avatar.palette.rgb) | {(0, 0, 0)}
+
+    def test_palette_mode_with_blur(self):
+        """Blurred images should be rendered in RGB mode."""
+
+        avatar = generators.SquareAvatar(
+            size=16,
+            blur_radius=1,
+            palette_mode=True,
+        )
+
+        assert avatar.generate().mode == 'RGB'
+
+    @pytest.mark.parametrize(
+        argnames="avatar_kwargs,max_difference,max_changed",
+        argvalues=[
+            ({'blur_radius': 0, 'border_size': 2}, 0, 0),
+            ({'blur_radius': 3, 'border_size': 2}, 0, 0),
+            ({'blur_radius': 12, 'blur_method': 'reduced'}, 2, 1),
+            ({'blur_radius': 0}, 0, 0),
+            ({'blur_radius': 1}, 0, 0),
+            ({'blur_radius': 8}, 0, 0),
+            ({'blur_radius': 0, 'palette_mode': True}, 0, 0),
+        ]
+    )
+    def test_tiles_are_equivalent_to_transform_engine(
+            self,
+            avatar_kwargs,
+            max_difference,
+            max_changed):
+        """
+        Tiles should make the image of the transform engine, only
+        the reduced blur can differ by 2 levels.
+        """
+
+        transform_img = generators.SquareAvatar(
+            size=150,
+            seed=1,
+            render_engine='transform',
+            **avatar_kwargs
+        ).generate()
+        tiled_img = generators.SquareAvatar(
+            size=150,
+            seed=1,
+            tile_size=32,
+            **avatar_kwargs
+        ).generate()
+        difference = ImageChops.difference(
+            transform_img.convert('RGB'),
+            tiled_img.convert('RGB'),
+        ).convert('L')
+        changed = 1 - difference.histogram()[0] / 150 ** 2
+
+        assert tiled_img.mode == transform_img.mode
+        assert difference.getextrema()[1] <= max_difference
+        assert changed <= max_changed
+
+    def test_generate_tiles(self):
+        avatar = generators.SquareAvatar(size=40, seed=1, tile_size=16)
+        tiles = list(avatar.generate_tiles())
+
+        assert [box for box, _ in tiles] == avatar.get_tile_boxes(16)
+        assert tiles[-1][0] == (32, 32, 40, 40)
+        assert tiles[-1][1].size == (8, 8)
+
+    @pytest.mark.parametrize(argnames="palette_mode", argvalues=[False, True])
+    def test_generate_to_with_tile_size(self, palette_mode):
+        """PNG should be encoded by strips of tiles."""
+
+        avatar_kwargs = dict(
+            size=100,
+            seed=1,
+            blur_radius=0,
+            tile_size=16,
+            palette_mode=palette_mode,
+        )
+        fileobj = io.BytesIO()
+        written = generators.SquareAvatar(**avatar_kwargs).generate_to(
+            fileobj,
+        )
+        img = Image.open(io.BytesIO(fileobj.getvalue()))
+        expected_img = generators.SquareAvatar(**avatar_kwargs).generate()
+
+        assert written == len(fileobj.getvalue())
+        assert img.mode == expected_img.mode
+        assert ImageChops.difference(
+            img.convert('RGB'),
+            expected_img.convert('RGB'),
+        ).getbbox() is None
+
+    def test_generate_to_with_tile_size_and_pillow_options(self):
+        """Options which write_png doesn't support should go to Pillow."""
+
+        fileobj = io.BytesIO()
+        generators.SquareAvatar(size=40, seed=1, tile_size=16).generate_to(
+            fileobj,
+            dpi=(72, 72),
+        )
+        img = Image.open(io.BytesIO(fileobj.getvalue()))
+
+        assert img.size == (40, 40)
+        assert round(img.info['dpi'][0]) == 72
+
+    @pytest.mark.parametrize(argnames="blur_radius", argvalues=[0, 3])
+    def test_generate_svg(self, blur_radius):
+        """
+        SVG should have the squares and colors of an image with the same
+        seed.
+        """
+
+        avatar_kwargs = dict(
+            size=64,
+            seed=1,
+            squares_on_axis=4,
+            blur_radius=blur_radius,
+        )
+        root = ElementTree.fromstring(
+            generators.SquareAvatar(**avatar_kwargs).generate_svg()
+        )
+        avatar = generators.SquareAvatar(**avatar_kwargs)
+        _, squares_count = avatar._get_squares_layout()
+        columns = avatar._generate_squares_colors(squares_count)
+        rects = root.findall('.//{http://www.w3.org/2000/svg}rect')
+        blur = root.find('.//{http://www.w3.org/2000/svg}feGaussianBlur')
+
+        assert len(rects) == squares_count ** 2 + 1
+        assert [rect.get('fill') for rect in rects[1:]] == [
+            '#{:02x}{:02x}{:02x}'.format(*color)
+            for column in columns
+            for color in column
+        ]
+        assert (blur is not None) == bool(blur_radius)
+
+    def test_wrong_tile_size(self):
+        with pytest.raises(ValueError):
+            generators.SquareAvatar(size=64, tile_size=1)
+
 
 class TestCharAvatar:
     @pytest.fixture(scope="module")
@@ -134,6 +731,46 @@ class TestCharAvatar:
     def avatar_object(self, avatar_data):
         return generators.CharAvatar(**avatar_data)
 
+    @pytest.mark.parametrize(
+        argnames="size,string,font_size",
+        argvalues=[
+            (33, 'John Paul', None),
+            (64, 'W', None),
+            (100, 'gq', None),
+            (48, 'ij', 96),
+        ]
+    )
+    def test_text_is_drawn_like_image_draw(self, size, string, font_size):
+        """
+        A text without an outline should be the same as ImageDraw.text
+        draws at the fractional center of the image.
+        """
+
+        avatar = generators.CharAvatar(
+            size=size,
+            string=string,
+            font_size=font_size,
+            background_color='#336699',
+        )
+        font = cache.font_cache.get(avatar.font, avatar.font_size)
+        text = avatar.get_text_for_draw()
+        _, offset_y, text_width, text_height = font.getbbox(text)
+        expected_img = Image.new('RGB', (size, size), '#336699')
+        ImageDraw.Draw(expected_img).text(
+            xy=(
+                (size - text_width) / 2,
+                (size - text_height) / 2 - offset_y / 2,
+            ),
+            text=text,
+            font=font,
+            fill=avatar.font_color,
+        )
+
+        assert ImageChops.difference(
+            avatar.generate(),
+            expected_img,
+        ).getbbox() is None
+
     def test_compare_attributes_with_passed_values(
             self,
             avatar_object,
@@ -151,6 +788,74 @@ class TestCharAvatar:
     def test_generate_with_full_set(self, avatar_object):
         assert isinstance(avatar_object.generate(), Image.Image)
 
+    @pytest.mark.parametrize(
+        argnames="avatar_class",
+        argvalues=[generators.CharAvatar, generators.CharSquareAvatar],
+    )
+    def test_generate_sizes_with_redraw_text(self, avatar_class):
+        """
+        Images should differ from downsampled ones, because text is drawn
+        on every size.
+        """
+
+        sizes = [32, 128]
+        images = []
+
+        for redraw_text in (False, True):
+            avatar = avatar_class(size=128, string='A', seed=1)
+            images.append(avatar.generate_sizes(sizes, redraw_text))
+
+        downsampled, redrawn = images
+        difference = ImageChops.difference(downsampled[32], redrawn[32])
+
+        assert redrawn[32].size == (32, 32)
+        assert difference.getbbox() is not None
+
+    @pytest.mark.parametrize(argnames="font_outline", argvalues=[False, True])
+    def test_palette_mode(self, font_outline):
+        """A 'P' image should look like the RGB one."""
+
+        images = []
+
+        for palette_mode in (False, True):
+            avatar = generators.CharAvatar(
+                size=64,
+                string='A',
+                seed=1,
+                font_outline=font_outline,
+                palette_mode=palette_mode,
+            )
+            images.append(avatar.generate())
+
+        difference = ImageChops.difference(images[0], images[1].convert('RGB'))
+
+        assert images[1].mode == 'P'
+        assert max(ImageStat.Stat(difference).mean) < 1
+
+    def test_generate_sizes_in_palette_mode(self):
+        avatar = generators.CharAvatar(size=64, string='A', palette_mode=True)
+        images = avatar.generate_sizes([16, 64], redraw_text=True)
+
+        assert images[16].mode == 'P'
+        assert images[16].size == (16, 16)
+
+    @pytest.mark.parametrize(argnames="font_outline", argvalues=[False, True])
+    def test_generate_svg(self, font_outline):
+        avatar = generators.CharAvatar(
+            size=64,
+            string='<b> & c',
+            background_color='#ff0000',
+            font_outline=font_outline,
+        )
+        root = ElementTree.fromstring(avatar.generate_svg())
+        rect, text = list(root)
+
+        assert rect.get('fill') == '#ff0000'
+        assert text.text == '<&'
+        assert text.get('fill') == '#ffffff'
+        assert text.get('font-size') == str(avatar.font_size)
+        assert (text.get('stroke') is not None) == font_outline
+
     def test_get_text_for_draw_with_one_word(self, avatar_object):
         avatar_object.string = 'One'
         assert avatar_object.get_text_for_draw() == 'O'
@@ -207,3 +912,13 @@ class TestCharSquareAvatar:
 
     def test_generate_with_full_set(self, avatar_object):
         assert isinstance(avatar_object.generate(), Image.Image)
+
+    def test_palette_mode_is_ignored(self):
+        avatar = generators.CharSquareAvatar(
+            size=16,
+            string='A',
+            blur_radius=0,
+            palette_mode=True,
+        )
+
+        assert avatar.generate().mode == 'RGB'
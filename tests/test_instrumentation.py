@@ -0,0 +1,145 @@
+import pytest
+
+from pyavagen import generators, instrumentation
+from pyavagen.cache import glyph_cache
+
+
+class TestInstrumentation:
+    def setup_method(self):
+        self.timer = instrumentation.StageTimer()
+        self.spans = []
+        instrumentation.add_hook(self.timer)
+        instrumentation.add_hook(self.spans.append)
+
+    def teardown_method(self):
+        instrumentation.clear_hooks()
+        instrumentation.set_sample_rate(1)
+
+    def test_square_avatar_stages(self):
+        avatar = generators.SquareAvatar(size=32, seed=1, blur_radius=1)
+        avatar.generate()
+
+        assert sorted(self.timer.stats()) == [
+            'generate',
+            'generate/blur',
+            'generate/crop',
+            'generate/draw_squares',
+            'generate/rotate',
+        ]
+        assert self.spans[-1].name == 'generate'
+        assert [span.avatar for span in self.spans] == [avatar] * 5
+
+    def test_transform_engine_stages(self):
+        generators.SquareAvatar(
+            size=32,
+            seed=1,
+            render_engine='transform',
+        ).generate()
+
+        assert sorted(self.timer.stats()) == [
+            'generate',
+            'generate/blur',
+            'generate/draw_squares',
+            'generate/transform',
+        ]
+
+    def test_char_avatar_stages(self):
+        glyph_cache.clear()
+        generators.CharAvatar(
+            size=32,
+            string='Span',
+            seed=1,
+            font_outline=True,
+        ).generate_bytes()
+
+        assert sorted(self.timer.stats()) == [
+            'generate_bytes',
+            'generate_bytes/encode',
+            'generate_bytes/generate',
+            'generate_bytes/generate/background',
+            'generate_bytes/generate/glyph',
+            'generate_bytes/generate/glyph/draw_text',
+            'generate_bytes/generate/glyph/font',
+            'generate_bytes/generate/glyph/measure',
+            'generate_bytes/generate/glyph/outline',
+            'generate_bytes/generate/paste_text',
+        ]
+
+    def test_char_square_avatar_background(self):
+        generators.CharSquareAvatar(size=32, string='S', seed=1).generate()
+
+        assert 'generate/background/rotate' in self.timer.stats()
+
+    def test_generate_sizes_stages(self):
+        generators.SquareAvatar(size=32, seed=1).generate_sizes([16, 32])
+
+        assert 'generate_sizes/resize' in self.timer.stats()
+        assert 'generate_sizes/generate' in self.timer.stats()
+
+    def test_timer_stats(self):
+        for seed in range(3):
+            generators.SquareAvatar(size=32, seed=seed).generate()
+
+        stats = self.timer.stats()['generate']
+
+        assert stats['count'] == 3
+        assert stats['errors'] == 0
+        assert 0 < stats['max'] <= stats['total']
+
+        self.timer.clear()
+
+        assert self.timer.stats() == {}
+
+    def test_error_is_recorded(self):
+        with pytest.raises(ZeroDivisionError):
+            with instrumentation.span('stage'):
+                1 / 0
+
+        assert isinstance(self.spans[0].error, ZeroDivisionError)
+        assert self.timer.stats()['stage']['errors'] == 1
+
+    def test_failed_hook_does_not_break_rendering(self):
+        def hook(span):
+            raise RuntimeError
+
+        instrumentation.add_hook(hook)
+
+        assert generators.SquareAvatar(size=32, seed=1).generate()
+        assert self.timer.stats()['generate']['count'] == 1
+
+    def test_sample_rate(self):
+        """Should skip not sampled renders with all their spans."""
+
+        instrumentation.set_sample_rate(0)
+        generators.SquareAvatar(size=32, seed=1).generate()
+
+        assert self.spans == []
+
+        instrumentation.set_sample_rate(1)
+        generators.SquareAvatar(size=32, seed=1).generate()
+
+        assert len(self.spans) == 5
+
+    @pytest.mark.parametrize(
+        argnames='rate',
+        argvalues=[-0.1, 1.1],
+    )
+    def test_wrong_sample_rate(self, rate):
+        with pytest.raises(ValueError):
+            instrumentation.set_sample_rate(rate)
+
+    def test_no_hooks(self):
+        instrumentation.clear_hooks()
+
+        assert instrumentation.span('stage') is instrumentation.NULL_SPAN
+
+        generators.SquareAvatar(size=32, seed=1).generate()
+
+        assert self.spans == []
+
+    def test_remove_hook(self):
+        instrumentation.remove_hook(self.spans.append)
+        generators.SquareAvatar(size=32, seed=1).generate()
+
+        assert self.spans == []
+        assert self.timer.stats()['generate']['count'] == 1
@@ -0,0 +1,41 @@
+import pytest
+
+from pyavagen import palettes
+
+
+class TestPalette:
+    def test_rgb(self):
+        palette = palettes.Palette(['#ff0000', 'white'])
+
+        assert palette.rgb == ((255, 0, 0), (255, 255, 255))
+        assert palette.rgb is palette.rgb
+
+    @pytest.mark.parametrize(
+        argnames="colors",
+        argvalues=[['#ffffff'], ('#ffffff',), palettes.Palette(['#ffffff'])],
+    )
+    def test_concatenation(self, colors):
+        """Palettes should be concatenated with lists like lists."""
+
+        palette = palettes.Palette(['#ff0000'])
+
+        assert palette + colors == ('#ff0000', '#ffffff')
+        assert colors + palette == ('#ffffff', '#ff0000')
+        assert isinstance(palette + colors, palettes.Palette)
+        assert isinstance(colors + palette, palettes.Palette)
+        assert (palette + colors).rgb == ((255, 0, 0), (255, 255, 255))
+
+    def test_palette_is_immutable(self):
+        with pytest.raises(AttributeError):
+            palettes.Palette(['#ff0000']).append('#ffffff')
+
+    @pytest.mark.parametrize(
+        argnames="colors",
+        argvalues=[['#ff0000'], ('#ff0000',)],
+    )
+    def test_from_colors(self, colors):
+        palette = palettes.Palette.from_colors(colors)
+
+        assert isinstance(palette, palettes.Palette)
+        assert palettes.Palette.from_colors(palette) is palette
+        assert palette == ('#ff0000',)
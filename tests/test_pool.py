@@ -0,0 +1,114 @@
+import pytest
+from PIL import Image
+
+import pyavagen
+from pyavagen import generators, pool
+
+
+class TestCanvasPool:
+    def setup_method(self):
+        self.canvas_pool = pool.CanvasPool()
+
+    def test_acquire_reuses_released_image(self):
+        img = self.canvas_pool.acquire('RGB', (4, 4), (255, 0, 0))
+        self.canvas_pool.release(img)
+        reused = self.canvas_pool.acquire('RGB', (4, 4), (0, 0, 255))
+
+        assert reused is img
+        assert reused.getcolors() == [(16, (0, 0, 255))]
+        assert self.canvas_pool.stats()['hits'] == 1
+        assert self.canvas_pool.stats()['misses'] == 1
+        assert self.canvas_pool.stats()['reuse_rate'] == 0.5
+        assert len(self.canvas_pool) == 0
+
+    def test_acquire_other_mode_or_size(self):
+        img = self.canvas_pool.acquire('RGB', (4, 4))
+        self.canvas_pool.release(img)
+
+        assert self.canvas_pool.acquire('L', (4, 4)) is not img
+        assert self.canvas_pool.acquire('RGB', (8, 8)) is not img
+        assert self.canvas_pool.stats()['hits'] == 0
+
+    def test_least_recently_released_images_are_dropped(self):
+        """Should retain no more than max_bytes of images."""
+
+        self.canvas_pool.max_bytes = 2 * 16 * 4
+        images = [Image.new('RGB', (4, 4)) for _ in range(2)]
+        small = Image.new('L', (4, 4))
+
+        for img in images + [small]:
+            self.canvas_pool.release(img)
+
+        assert self.canvas_pool.stats()['discards'] == 1
+        assert self.canvas_pool.stats()['size'] == 16 * 4 + 16
+        assert self.canvas_pool.acquire('RGB', (4, 4)) is images[1]
+        assert self.canvas_pool.acquire('L', (4, 4)) is small
+
+    def test_clear(self):
+        self.canvas_pool.release(Image.new('RGB', (4, 4)))
+        self.canvas_pool.clear()
+
+        assert len(self.canvas_pool) == 0
+        assert self.canvas_pool.stats()['size'] == 0
+        assert self.canvas_pool.stats()['releases'] == 0
+
+    def test_wrong_max_bytes(self):
+        with pytest.raises(ValueError):
+            pool.CanvasPool(max_bytes=-1)
+
+
+class TestAvatarCanvasPool:
+    @pytest.fixture
+    def canvas_pool(self, monkeypatch):
+        canvas_pool = pool.CanvasPool()
+        monkeypatch.setattr(
+            generators.BaseAvatar,
+            'canvas_pool',
+            canvas_pool,
+        )
+
+        return canvas_pool
+
+    @pytest.mark.parametrize(
+        argnames="avatar_type,avatar_kwargs",
+        argvalues=[
+            (pyavagen.CHAR_AVATAR, {'string': 'A'}),
+            (pyavagen.CHAR_AVATAR, {'string': 'A', 'palette_mode': True}),
+            (pyavagen.SQUARE_AVATAR, {}),
+            (pyavagen.SQUARE_AVATAR, {
+                'render_engine': 'transform',
+                'squares_on_axis': 3,
+            }),
+            (pyavagen.CHAR_SQUARE_AVATAR, {'string': 'A'}),
+        ]
+    )
+    def test_images_are_the_same(self, canvas_pool, monkeypatch,
+                                 avatar_type, avatar_kwargs):
+        """
+        Reused canvases should give the same images as new ones, and
+        repeated renders should borrow canvases from the pool.
+        """
+
+        template = pyavagen.AvatarTemplate(
+            avatar_type,
+            size=16,
+            **avatar_kwargs
+        )
+        pooled = [template.create(seed=seed).generate_bytes()
+                  for seed in range(3)]
+
+        monkeypatch.setattr(generators.BaseAvatar, 'canvas_pool', None)
+        unpooled = [template.create(seed=seed).generate_bytes()
+                    for seed in range(3)]
+
+        assert pooled == unpooled
+        assert canvas_pool.stats()['hits'] >= 2
+
+    def test_generate_bytes_releases_image(self, canvas_pool):
+        """The image should be returned to the pool after encoding."""
+
+        avatar = generators.SquareAvatar(size=16)
+        avatar.generate_bytes()
+
+        assert avatar.img is None
+        assert canvas_pool.stats()['releases'] >= 1
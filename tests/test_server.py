@@ -0,0 +1,223 @@
+import io
+import threading
+import time
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+from PIL import Image
+
+from pyavagen import server
+
+
+class Client(object):
+    """Calls a WSGI application without a server."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, path, query='', method='GET', headers=None):
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': query,
+        }
+        environ.update(headers or {})
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, response_headers):
+            response['status'] = status
+            response['headers'] = dict(response_headers)
+
+        response['body'] = b''.join(self.app(environ, start_response))
+
+        return response
+
+
+class TestAvatarApplication:
+    @pytest.fixture
+    def app(self):
+        return server.AvatarApplication(size=16, max_size=64)
+
+    @pytest.fixture
+    def client(self, app):
+        return Client(app)
+
+    def test_avatar(self, client):
+        response = client.request('/avatar/char/John Paul')
+        img = Image.open(io.BytesIO(response['body']))
+
+        assert response['status'] == '200 OK'
+        assert response['headers']['Content-Type'] == 'image/png'
+        assert response['headers']['Cache-Control'] == (
+            'public, max-age=86400'
+        )
+        assert img.size == (16, 16)
+
+    @pytest.mark.parametrize(
+        argnames="path,query,content_type",
+        argvalues=[
+            ('/avatar/square/Paul', 'size=8&fmt=jpg', 'image/jpeg'),
+            ('/avatar/char_square/Пётр', 'fmt=webp&blur_radius=0',
+             'image/webp'),
+            ('/avatar/char/Paul',
+             'color_list=%23000000&color_list=%23ffffff&font_outline=true',
+             'image/png'),
+            ('/avatar/square/Paul', 'fmt=svg', 'image/svg+xml'),
+        ]
+    )
+    def test_query_parameters(self, client, path, query, content_type):
+        response = client.request(path, query)
+
+        assert response['status'] == '200 OK'
+        assert response['headers']['Content-Type'] == content_type
+
+    def test_same_image_is_rendered_once(self, app, client):
+        first = client.request('/avatar/char/Paul')
+        second = client.request('/avatar/char/Paul')
+
+        assert first['body'] == second['body']
+        assert first['headers']['ETag'] == second['headers']['ETag']
+        assert app.renders == 1
+        assert app.cache.stats()['hits'] == 1
+
+    def test_different_avatars_have_different_etags(self, client):
+        etags = [
+            client.request('/avatar/char/Paul', query)['headers']['ETag']
+            for query in ('', 'size=32', 'fmt=webp')
+        ]
+
+        assert len(set(etags)) == 3
+
+    @pytest.mark.parametrize(
+        argnames="if_none_match",
+        argvalues=['{etag}', 'W/{etag}', '"other", {etag}', '*'],
+    )
+    def test_not_modified(self, app, client, if_none_match):
+        """Should answer 304 without rendering."""
+
+        etag = client.request('/avatar/char/Paul')['headers']['ETag']
+        app.cache.clear()
+        response = client.request(
+            '/avatar/char/Paul',
+            headers={
+                'HTTP_IF_NONE_MATCH': if_none_match.format(etag=etag),
+            },
+        )
+
+        assert response['status'] == '304 Not Modified'
+        assert response['body'] == b''
+        assert response['headers']['ETag'] == etag
+        assert app.renders == 1
+
+    def test_head(self, client):
+        response = client.request('/avatar/char/Paul', method='HEAD')
+
+        assert response['status'] == '200 OK'
+        assert response['body'] == b''
+        assert int(response['headers']['Content-Length']) > 0
+
+    @pytest.mark.parametrize(
+        argnames="path,query,method,status",
+        argvalues=[
+            ('/other/char/Paul', '', 'GET', '404 Not Found'),
+            ('/avatar/unknown/Paul', '', 'GET', '404 Not Found'),
+            ('/avatar/char/', '', 'GET', '404 Not Found'),
+            ('/avatar/char/Paul', 'size=big', 'GET', '400 Bad Request'),
+            ('/avatar/char/Paul', 'size=128', 'GET', '400 Bad Request'),
+            ('/avatar/char/Paul', 'size=-1', 'GET', '400 Bad Request'),
+            ('/avatar/char/Paul', 'size=0', 'GET', '400 Bad Request'),
+            ('/avatar/square/Paul', 'squares_on_axis=0', 'GET',
+             '400 Bad Request'),
+            ('/avatar/char/Paul', 'font_size=0', 'GET', '400 Bad Request'),
+            ('/avatar/char/Paul', 'font=/etc/passwd', 'GET',
+             '400 Bad Request'),
+            ('/avatar/char/Paul', 'fmt=gif', 'GET', '400 Bad Request'),
+            ('/avatar/char/Paul', 'font_color=nocolor', 'GET',
+             '400 Bad Request'),
+            ('/avatar/square/Paul', 'font_color=red', 'GET',
+             '400 Bad Request'),
+            ('/avatar/square/Paul', 'squares_on_axis=5000', 'GET',
+             '400 Bad Request'),
+            ('/avatar/square/Paul', 'size=64&squares_on_axis=65', 'GET',
+             '400 Bad Request'),
+            ('/avatar/char/Paul', 'font_size=33', 'GET', '400 Bad Request'),
+            ('/avatar/square/Paul', 'blur_radius=17', 'GET',
+             '400 Bad Request'),
+            ('/avatar/square/Paul', 'border_size=17', 'GET',
+             '400 Bad Request'),
+            ('/avatar/char/Paul', '', 'POST', '405 Method Not Allowed'),
+        ]
+    )
+    def test_errors(self, app, client, path, query, method, status):
+        response = client.request(path, query, method)
+
+        assert response['status'] == status
+        assert response['headers']['Content-Type'].startswith('text/plain')
+        assert app.renders == 0
+
+    def test_squares_on_axis_limit(self):
+        client = Client(server.AvatarApplication(max_squares_on_axis=8))
+        response = client.request('/avatar/square/Paul', 'squares_on_axis=9')
+
+        assert response['status'] == '400 Bad Request'
+        assert response['body'] == b'squares_on_axis must not be greater 8.'
+
+    def test_render_error(self, client, monkeypatch):
+        def failed_render(*args):
+            raise ValueError('wrong arguments')
+
+        monkeypatch.setattr(server, 'render', failed_render)
+        response = client.request('/avatar/char/Paul')
+
+        assert response['status'] == '400 Bad Request'
+        assert response['body'] == b'wrong arguments'
+
+    def test_concurrent_requests_share_render(self, app, monkeypatch):
+        """Concurrent requests of the same avatar should share a render."""
+
+        render = server.render
+
+        def slow_render(*args):
+            time.sleep(0.1)
+            return render(*args)
+
+        monkeypatch.setattr(server, 'render', slow_render)
+        client = Client(app)
+        responses = []
+        threads = [
+            threading.Thread(
+                target=lambda: responses.append(
+                    client.request('/avatar/char/Paul')
+                ),
+            )
+            for _ in range(4)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert [r['status'] for r in responses] == ['200 OK'] * 4
+        assert app.renders == 1
+
+
+class TestResponseCache:
+    def test_least_recently_used_values_are_evicted(self):
+        cache = server.ResponseCache(max_bytes=20)
+        cache.set('a', b'0' * 10)
+        cache.set('b', b'0' * 10)
+        cache.get('a')
+        cache.set('c', b'0' * 10)
+
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.stats()['size'] == 20
+
+    def test_too_big_value(self):
+        cache = server.ResponseCache(max_bytes=5)
+        cache.set('a', b'0' * 10)
+
+        assert len(cache) == 0
@@ -1,4 +1,8 @@
+import io
+import random
+
 import pytest
+from PIL import Image, ImageChops
 
 from pyavagen import utils, validators
 
@@ -12,3 +16,89 @@ def test_get_random_hex_color():
         validators.ColorValidator()(value=color, field_name='color')
     except ValueError:
         pytest.fail("A passed value to ColorValidator is not color.")
+
+
+def test_get_random_hex_color_with_rng():
+    """Should use a passed random number generator."""
+
+    colors = [utils.get_random_hex_color(random.Random(1)) for _ in range(2)]
+
+    assert colors[0] == colors[1]
+
+
+def test_get_random_rgb_color():
+    color = utils.get_random_rgb_color(random.Random(1))
+
+    assert len(color) == 3
+    assert all([0 <= channel <= 255 for channel in color])
+
+
+def test_blend_colors():
+    assert utils.blend_colors((0, 0, 0), (255, 100, 10), 0.5) == (128, 50, 5)
+
+
+@pytest.mark.parametrize(
+    argnames="format,pil_format",
+    argvalues=[
+        ('png', 'PNG'),
+        ('webp', 'WEBP'),
+        ('jpeg', 'JPEG'),
+        ('JPG', 'JPEG'),
+    ]
+)
+def test_encode_image(format, pil_format):
+    """Should return an image encoded to passed format."""
+
+    img = Image.new(mode='RGB', size=(4, 4), color='red')
+    data = utils.encode_image(img, format)
+
+    assert Image.open(io.BytesIO(data)).format == pil_format
+
+
+def test_encode_image_with_optimize():
+    """Optimized PNG should not be bigger than the fast one."""
+
+    img = Image.new(mode='RGB', size=(64, 64), color='red')
+
+    assert (
+        len(utils.encode_image(img, 'png', optimize=True)) <=
+        len(utils.encode_image(img, 'png'))
+    )
+
+
+def test_encode_image_to_jpeg_from_palette_mode():
+    img = Image.new(mode='P', size=(4, 4))
+
+    assert utils.encode_image(img, 'jpeg')
+
+
+@pytest.mark.parametrize(argnames="mode", argvalues=['L', 'RGB', 'P'])
+def test_write_png(mode):
+    """Should encode strips to a PNG image of the whole image."""
+
+    img = Image.linear_gradient('L').resize((64, 48))
+
+    if mode == 'P':
+        img = img.convert('RGB').quantize(colors=16)
+    else:
+        img = img.convert(mode)
+
+    fileobj = io.BytesIO()
+    written = utils.write_png(
+        fileobj,
+        img.size,
+        [img.crop((0, y, 64, min(y + 20, 48))) for y in range(0, 48, 20)],
+    )
+    decoded = Image.open(io.BytesIO(fileobj.getvalue()))
+
+    assert written == len(fileobj.getvalue())
+    assert decoded.mode == mode
+    assert ImageChops.difference(
+        decoded.convert('RGB'),
+        img.convert('RGB'),
+    ).getbbox() is None
+
+
+def test_write_png_with_wrong_mode():
+    with pytest.raises(ValueError):
+        utils.write_png(io.BytesIO(), (4, 4), [Image.new('RGBA', (4, 4))])
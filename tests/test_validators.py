@@ -4,7 +4,7 @@ from pyavagen import validators
 
 
 class TestMinValueValidator:
-    def setup(self):
+    def setup_method(self):
         self.validator = validators.MinValueValidator
         self.field_name = 'Field'
         self.min_value = 2
@@ -63,7 +63,7 @@ class TestMinValueValidator:
 
 
 class TestTypeValidator:
-    def setup(self):
+    def setup_method(self):
         self.validator = validators.TypeValidator
         self.field_name = 'Field'
 
@@ -102,7 +102,7 @@ class TestTypeValidator:
 
 
 class TestColorValidator:
-    def setup(self):
+    def setup_method(self):
         self.validator = validators.ColorValidator()
         self.field_name = 'Field'
         self.color = '#000000'
@@ -123,3 +123,87 @@ class TestColorValidator:
 
         with pytest.raises(ValueError):
             self.validator(value=-1, field_name=self.field_name)
+
+
+class TestColorListValidator:
+    def setup_method(self):
+        self.validator = validators.ColorListValidator()
+        self.field_name = 'Field'
+
+    def test_right_colors(self):
+        result = self.validator(
+            value=['#000000', (0, 0, 0), (0, 0, 0, 0)],
+            field_name=self.field_name,
+        )
+
+        assert result is None
+
+    @pytest.mark.parametrize(
+        argnames="color",
+        argvalues=['not a color', (0, 0), (0, 0, -1), (0, 0, 0.5), None],
+    )
+    def test_wrong_color(self, color):
+        with pytest.raises(ValueError):
+            self.validator(value=['#000000', color], field_name='Field')
+
+
+class TestChoicesValidator:
+    def setup_method(self):
+        self.validator = validators.ChoicesValidator(choices=('a', 'b'))
+        self.field_name = 'Field'
+
+    def test_value_from_choices(self):
+        """
+        Should return None if a passed value is one of choices.
+        """
+
+        result = self.validator(value='a', field_name=self.field_name)
+
+        assert result is None
+
+    def test_value_not_from_choices(self):
+        """
+        Should raise ValueError if a passed value is not one of choices.
+        """
+
+        with pytest.raises(ValueError):
+            self.validator(value='c', field_name=self.field_name)
+
+
+def test_parse_color_is_memoized():
+    validators.parse_color.cache_clear()
+    validators.parse_color('#000000')
+    validators.parse_color('#000000')
+
+    assert validators.parse_color.cache_info().hits == 1
+
+
+def test_parse_color_of_tuple():
+    assert validators.parse_color((1, 2, 3)) == (1, 2, 3)
+    assert validators.parse_color((1, 2, 3, 4)) == (1, 2, 3)
+
+
+@pytest.mark.parametrize(
+    argnames="validator,value",
+    argvalues=[
+        (validators.TypeValidator(int), '1'),
+        (validators.MinValueValidator(2), 1),
+        (validators.ChoicesValidator(('a',)), 'b'),
+        (validators.ColorValidator(), 'not a color'),
+        (validators.ColorListValidator(), ['not a color']),
+    ]
+)
+def test_compile_validator(validator, value):
+    """
+    A compiled validator should raise the same error as the validator.
+    """
+
+    check = validators.compile_validator(validator, 'Field')
+
+    with pytest.raises(ValueError) as e:
+        check(value)
+
+    with pytest.raises(ValueError) as expected:
+        validator(value, 'Field')
+
+    assert str(e.value) == str(expected.value)
@@ -0,0 +1,97 @@
+import pytest
+from PIL import Image, ImageChops, ImageStat
+
+from pyavagen import generators, vectorized
+
+
+numpy = pytest.importorskip('numpy')
+
+
+def get_avatars(count=3, **kwargs):
+    return [
+        generators.SquareAvatar(size=16, seed=seed, **kwargs)
+        for seed in range(count)
+    ]
+
+
+class TestRenderSquareBackgrounds:
+    def test_images(self):
+        images = vectorized.render_square_backgrounds(get_avatars())
+
+        assert len(images) == 3
+        assert all(img.size == (16, 16) for img in images)
+
+    def test_array(self):
+        array = vectorized.render_square_backgrounds(
+            get_avatars(border_size=1),
+            as_array=True,
+        )
+
+        assert array.shape == (3, 16, 16, 3)
+        assert array.dtype == numpy.uint8
+
+    def test_different_sizes(self):
+        avatars = get_avatars() + [generators.SquareAvatar(size=8)]
+
+        with pytest.raises(ValueError):
+            vectorized.render_squares(avatars)
+
+    def test_empty_avatars(self):
+        with pytest.raises(ValueError):
+            vectorized.render_square_backgrounds([])
+
+    @pytest.mark.parametrize(
+        argnames="border_size,max_difference",
+        argvalues=[
+            (0, 0.5),
+            (2, 2),
+        ]
+    )
+    def test_equivalent_to_transform_engine(self, border_size,
+                                            max_difference):
+        """
+        The numpy engine should render the same image as the transform one.
+        Borders are not antialiased, so they differ more.
+        """
+
+        images = []
+
+        for render_engine in ('transform', 'numpy'):
+            avatar = generators.SquareAvatar(
+                size=64,
+                seed=1,
+                border_size=border_size,
+                render_engine=render_engine,
+            )
+            images.append(avatar.generate())
+
+        difference = ImageChops.difference(*images)
+
+        assert max(ImageStat.Stat(difference).mean) < max_difference
+
+    def test_without_numpy(self, monkeypatch):
+        """Should render images by generate methods of avatars."""
+
+        monkeypatch.setattr(vectorized, 'numpy', None)
+        images = vectorized.render_square_backgrounds(get_avatars())
+
+        assert all(isinstance(img, Image.Image) for img in images)
+
+        with pytest.raises(ImportError):
+            vectorized.render_square_backgrounds(get_avatars(), as_array=True)
+
+    def test_numpy_engine_without_numpy(self, monkeypatch):
+        """The numpy engine should fall back to the classic one."""
+
+        monkeypatch.setattr(vectorized, 'numpy', None)
+        images = []
+
+        for render_engine in ('classic', 'numpy'):
+            avatar = generators.SquareAvatar(
+                size=16,
+                seed=1,
+                render_engine=render_engine,
+            )
+            images.append(avatar.generate())
+
+        assert ImageChops.difference(*images).getbbox() is None